@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+
+# Audio2Face clips (a2f_export_bsweight-*.json / a2f_export_emotionkey-*.json) as NumPy arrays,
+# shared by the clip pipeline scripts (clip_*.py). Runs outside of Blender.
+# A clip is a dict with the same keys as Audio2FaceExportData in src/audio2face.ts,
+# weightMat/rotations/translations being arrays instead of nested lists.
+
+
+def load_clip(path):
+    """
+    Load an A2F blendshape weights export.
+
+    Returns:
+        dict: exportFps, trackPath, numPoses, numFrames, facsNames, joints, plus arrays:
+            weightMat (F, P) float32, rotations (F, J, 4) float32 (x, y, z, w quaternions),
+            translations (F, J, 3) float32.
+    """
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    return clip_from_json(data)
+
+
+def clip_from_json(data):
+    clip = dict(data)
+    weights = np.asarray(data["weightMat"], dtype=np.float32)
+    clip["weightMat"] = weights.reshape(len(weights), len(data["facsNames"]))
+    clip["joints"] = list(data.get("joints", []))
+    joint_count = len(clip["joints"])
+    clip["rotations"] = np.asarray(data.get("rotations", []), dtype=np.float32).reshape(
+        len(weights) if joint_count else 0, joint_count, 4
+    )
+    clip["translations"] = np.asarray(data.get("translations", []), dtype=np.float32).reshape(
+        len(weights) if joint_count else 0, joint_count, 3
+    )
+    clip["numFrames"] = len(weights)
+    clip["numPoses"] = len(data["facsNames"])
+    return clip
+
+
+def clip_to_json(clip):
+    """Clip as plain JSON data (Audio2FaceExportData), e.g. to save or send to the client."""
+    data = {}
+    for key, value in clip.items():
+        data[key] = value.tolist() if isinstance(value, np.ndarray) else value
+    data["numFrames"] = len(clip["weightMat"])
+    data["numPoses"] = len(clip["facsNames"])
+    return data
+
+
+def save_clip(clip, path):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(clip_to_json(clip), file)
+
+
+def load_emotion_keys(path):
+    """
+    Load an A2F emotion keys export.
+
+    Returns:
+        dict: exportFps, trackPath, numFrames, emotionNames, plus arrays:
+            emotionFrames (E,) float32 frame of every key, emotionKeys (E, 10) float32.
+    """
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    emotion = dict(data)
+    emotion["emotionFrames"] = np.asarray(data["emotionFrames"], dtype=np.float32)
+    emotion["emotionKeys"] = np.asarray(data["emotionKeys"], dtype=np.float32).reshape(
+        len(emotion["emotionFrames"]), len(data["emotionNames"])
+    )
+    return emotion
+
+
+def save_emotion_keys(emotion, path):
+    data = {}
+    for key, value in emotion.items():
+        data[key] = value.tolist() if isinstance(value, np.ndarray) else value
+    data["numFrames"] = int(emotion["numFrames"])
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+
+
+def emotion_weights(emotion, frame_count=None):
+    """(F, E) per-frame emotion weights, linearly interpolated between emotion keys."""
+    frame_count = emotion["numFrames"] if frame_count is None else frame_count
+    frames = np.arange(frame_count, dtype=np.float32)
+    key_frames = emotion["emotionFrames"]
+    keys = emotion["emotionKeys"]
+    columns = [np.interp(frames, key_frames, keys[:, index]) for index in range(keys.shape[1])]
+    return np.stack(columns, axis=1).astype(np.float32)
@@ -0,0 +1,147 @@
+import re
+
+import numpy as np
+
+# Bulk (vectorized) reading and sampling of action fcurves.
+# Keyframes are read with `foreach_get` into NumPy arrays and sampled with np.interp where that
+# is exact (keys on every sampled frame, or linear interpolation), instead of calling
+# `fcurve.evaluate` per frame. Rotations are converted to Euler angles for all frames at once.
+# This module doesn't import bpy, so it can be imported and tested outside of Blender.
+
+BONE_PATH_PATTERN = re.compile(r'^pose\.bones\["(.+)"\]\.(\w+)$')
+ROTATION_PATHS = ("rotation_quaternion", "rotation_euler")
+
+
+def action_fcurves(action):
+    """All fcurves of an action (legacy or layered actions of Blender 4.4+)."""
+    if getattr(action, "is_action_layered", False):
+        return [
+            fcurve
+            for layer in action.layers
+            for strip in layer.strips
+            for channelbag in strip.channelbags
+            for fcurve in channelbag.fcurves
+        ]
+    return list(action.fcurves)
+
+
+def read_keyframes(fcurve):
+    """(K, 2) float32 (frame, value) of all keyframe points of an fcurve."""
+    points = fcurve.keyframe_points
+    coordinates = np.empty(len(points) * 2, dtype=np.float32)
+    points.foreach_get("co", coordinates)
+    return coordinates.reshape(-1, 2)
+
+
+def enum_value(points, property_name, identifier):
+    """Integer value of an enum item of keyframe points (as used by foreach_get/set)."""
+    return points[0].bl_rna.properties[property_name].enum_items[identifier].value
+
+
+def write_keyframes(fcurve, keys, interpolation="LINEAR"):
+    """Replace all keyframe points of an fcurve with (K, 2) (frame, value) keys in one pass."""
+    points = fcurve.keyframe_points
+    interpolation_value = enum_value(points, "interpolation", interpolation) if len(points) else 0
+    points.clear()
+    points.add(len(keys))
+    coordinates = np.ascontiguousarray(keys, dtype=np.float32).reshape(-1)
+    points.foreach_set("co", coordinates)
+    # Handles on the keys, so switching to Bezier later doesn't overshoot
+    points.foreach_set("handle_left", coordinates)
+    points.foreach_set("handle_right", coordinates)
+    points.foreach_set("interpolation", np.full(len(keys), interpolation_value, np.int32))
+    fcurve.update()
+
+
+def remove_fcurve(action, fcurve):
+    """Remove an fcurve from its action (legacy) or channelbag (layered actions)."""
+    if not getattr(action, "is_action_layered", False):
+        action.fcurves.remove(fcurve)
+        return
+    for layer in action.layers:
+        for strip in layer.strips:
+            for channelbag in strip.channelbags:
+                if fcurve in channelbag.fcurves.values():
+                    channelbag.fcurves.remove(fcurve)
+                    return
+
+
+def sample_fcurve(fcurve, frames):
+    """
+    Values of an fcurve at `frames`, vectorized when linear interpolation of the keys is exact.
+
+    Returns:
+        np.ndarray: (F,) float64 values.
+    """
+    points = fcurve.keyframe_points
+    if not len(points):
+        return np.zeros(len(frames))
+    keys = read_keyframes(fcurve)
+    interpolation = np.empty(len(points), dtype=np.int32)
+    points.foreach_get("interpolation", interpolation)
+    linear = np.all(interpolation[:-1] == enum_value(points, "interpolation", "LINEAR"))
+    if linear or np.isin(frames, keys[:, 0]).all():
+        return np.interp(frames, keys[:, 0], keys[:, 1])
+    return np.array([fcurve.evaluate(frame) for frame in frames])
+
+
+def bone_rotation_fcurves(fcurves):
+    """
+    Rotation fcurves by bone.
+
+    Returns:
+        dict: bone name -> (data path name, {array index: fcurve}).
+    """
+    bones = {}
+    for fcurve in fcurves:
+        match = BONE_PATH_PATTERN.match(fcurve.data_path)
+        if match and match.group(2) in ROTATION_PATHS:
+            _, channels = bones.setdefault(match.group(1), (match.group(2), {}))
+            channels[fcurve.array_index] = fcurve
+    return bones
+
+
+def quaternion_to_euler(quaternions):
+    """(F, 4) w-first quaternions to (F, 3) XYZ Euler angles (radians, Blender's XYZ order)."""
+    w, x, y, z = np.moveaxis(np.asarray(quaternions, dtype=np.float64), -1, 0)
+    norm = np.sqrt(w * w + x * x + y * y + z * z)
+    w, x, y, z = (component / np.maximum(norm, 1e-12) for component in (w, x, y, z))
+    return np.stack(
+        [
+            np.arctan2(2.0 * (w * x + y * z), 1.0 - 2.0 * (x * x + y * y)),
+            np.arcsin(np.clip(2.0 * (w * y - z * x), -1.0, 1.0)),
+            np.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z)),
+        ],
+        axis=-1,
+    )
+
+
+def action_frames(action):
+    """Every whole frame of the action's frame range."""
+    start, end = action.frame_range
+    return np.arange(np.floor(start), np.ceil(end) + 1.0)
+
+
+def sample_bone_rotations(action, frames=None):
+    """
+    Euler rotation (XYZ, degrees) of every animated bone of an action, at every frame.
+
+    Returns:
+        dict: bone name -> (F, 3) float64 angles.
+    """
+    frames = action_frames(action) if frames is None else frames
+    rotations = {}
+    for bone, (path, channels) in bone_rotation_fcurves(action_fcurves(action)).items():
+        if path == "rotation_quaternion":
+            # Channels without fcurve keep the identity value
+            values = np.zeros((len(frames), 4))
+            values[:, 0] = 1.0
+            for index, fcurve in channels.items():
+                values[:, index] = sample_fcurve(fcurve, frames)
+            rotations[bone] = np.degrees(quaternion_to_euler(values))
+        else:
+            values = np.zeros((len(frames), 3))
+            for index, fcurve in channels.items():
+                values[:, index] = sample_fcurve(fcurve, frames)
+            rotations[bone] = np.degrees(values)
+    return rotations
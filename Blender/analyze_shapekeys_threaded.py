@@ -0,0 +1,118 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+import bpy
+
+# Shape key analysis of all skinned meshes (head, eyebrows, eyelashes, beard, tear, mouth...)
+# with a producer/consumer queue: the main thread only reads bpy data (foreach_get is not
+# thread safe), worker threads run the NumPy reductions, which release the GIL.
+# Runs the serial version too and prints the speedup on the meshes of the open .blend file.
+# Headless: blender -b avatar.blend --python analyze_shapekeys_threaded.py
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from shapekey_analysis import (  # noqa: E402
+    apply_vertex_group_weights,
+    key_deltas,
+    read_shape_keys,
+    read_vertex_group_weights,
+    summarize_deltas,
+)
+
+worker_count = min(8, os.cpu_count() or 1)
+# Meshes read ahead of the workers (limits memory used by coordinates waiting in the queue)
+queue_size = worker_count * 2
+
+
+def read_mesh(obj):
+    """bpy access only: read keys and vertex group weights of one object (main thread)."""
+    shape_keys = read_shape_keys(obj.data)
+    group_names = [group for group in shape_keys["vertex_groups"] if group]
+    return obj.name, shape_keys, read_vertex_group_weights(obj, group_names)
+
+
+def analyze_mesh(shape_keys, group_weights):
+    """NumPy only: effective deltas and per-key summary (safe to run in worker threads)."""
+    deltas = key_deltas(shape_keys["coordinates"], shape_keys["relative_indices"])
+    apply_vertex_group_weights(deltas, shape_keys["vertex_groups"], group_weights)
+    summary = summarize_deltas(deltas)
+    return {"names": shape_keys["names"], **summary}
+
+
+def analyze_serial(objects):
+    results = {}
+    for obj in objects:
+        name, shape_keys, group_weights = read_mesh(obj)
+        results[name] = analyze_mesh(shape_keys, group_weights)
+    return results
+
+
+def analyze_threaded(objects, workers=worker_count):
+    """
+    Producer/consumer analysis: this (main) thread reads meshes into a bounded queue,
+    `workers` threads analyse them.
+
+    Returns:
+        dict: Analysis (see `analyze_mesh`) by object name.
+    """
+    tasks = queue.Queue(maxsize=queue_size)
+    results = {}
+    errors = []
+
+    def consume():
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            name, shape_keys, group_weights = task
+            try:
+                results[name] = analyze_mesh(shape_keys, group_weights)
+            except Exception as e:
+                errors.append((name, e))
+
+    threads = [threading.Thread(target=consume, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for obj in objects:
+            tasks.put(read_mesh(obj))
+    finally:
+        for _ in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        name, error = errors[0]
+        raise RuntimeError(f"Analysis of '{name}' failed: {error}") from error
+    return results
+
+
+def benchmark(objects):
+    start_time = time.perf_counter()
+    serial = analyze_serial(objects)
+    serial_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    threaded = analyze_threaded(objects)
+    threaded_time = time.perf_counter() - start_time
+
+    if serial != threaded:
+        print("WARNING: serial and threaded results differ!")
+    key_count = sum(len(result["names"]) for result in serial.values())
+    print(f"Analysed {len(objects)} meshes, {key_count} shape keys:")
+    print(f"- serial: {serial_time:.3f} s")
+    print(f"- threaded ({worker_count} workers): {threaded_time:.3f} s")
+    print(f"- speedup: {serial_time / max(threaded_time, 1e-9):.2f}x")
+    return threaded
+
+
+if __name__ == "__main__":
+    meshes = [obj for obj in bpy.data.objects if obj.type == "MESH" and obj.data.shape_keys]
+    for name, result in benchmark(meshes).items():
+        print(f"- {name}: {sum(1 for count in result['affected'] if count)} keys move vertices")
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from a2f_clip import load_clip
+from clip_encoder import read_clip
+
+# Bake clips into a weight texture atlas for GPU-side playback: a shader/compute pass samples
+# morph target weights directly, instead of JS setting target.influence for every target
+# every frame.
+# One texel row holds one frame of all targets, clips are stacked frame after frame. When the
+# frames don't fit in `max_texture_size` rows, they continue in the next band (the next
+# target-width block of columns to the right). Global frame g of the atlas is at
+#   x = (g // height) * band_width + target texel, y = g % height
+# Formats:
+#   float16: R16F texture, one target per texel
+#   rgba8:   RGBA8 texture, four targets per texel, weights clamped to [0, 1] and quantized
+# Writes the raw texture data (.bin, row by row from y = 0) and a JSON index
+# with the layout and the first frame of every clip.
+# Usage:
+#   python clip_atlas.py atlas clip1.json clip2.a2fc ... [--format rgba8] [--max-size 4096]
+
+default_max_texture_size = 4096
+
+
+def next_power_of_two(value):
+    return 1 << max(int(value) - 1, 0).bit_length()
+
+
+def load_any_clip(path):
+    """JSON export or binary clip (clip_encoder.py)."""
+    return read_clip(path) if path.endswith(".a2fc") else load_clip(path)
+
+
+def build_atlas(clips, texture_format="float16", max_texture_size=default_max_texture_size):
+    """
+    Pack the weights of clips (same facsNames) into one texture.
+
+    Returns:
+        tuple[np.ndarray, dict]: (height, width, channels) texture data (float16 or uint8)
+            and the JSON index.
+    """
+    names = clips[0]["facsNames"]
+    for clip in clips[1:]:
+        if clip["facsNames"] != names:
+            raise ValueError("All clips of an atlas need the same facsNames")
+    channels = 4 if texture_format == "rgba8" else 1
+    band_width = next_power_of_two(-(-len(names) // channels))
+    frame_counts = [clip["numFrames"] for clip in clips]
+    total_frames = sum(frame_counts)
+    height = min(next_power_of_two(max(total_frames, 1)), max_texture_size)
+    bands = -(-total_frames // height)
+    width = next_power_of_two(bands * band_width)
+    if width > max_texture_size:
+        raise ValueError(f"{total_frames} frames don't fit in {max_texture_size}² texels")
+
+    # (frames, targets) in atlas order, padded to full bands of band_width × channels targets
+    weights = np.zeros((bands * height, band_width * channels), dtype=np.float32)
+    weights[:total_frames, : len(names)] = np.concatenate([clip["weightMat"] for clip in clips])
+    if texture_format == "rgba8":
+        texels = np.rint(np.clip(weights, 0.0, 1.0) * 255.0).astype(np.uint8)
+    else:
+        texels = weights.astype(np.float16)
+    # Bands side by side: (bands, height, band texels, channels) -> (height, bands × band texels)
+    bands_data = texels.reshape(bands, height, band_width, channels)
+    texture = np.zeros((height, width, channels), dtype=texels.dtype)
+    texture[:, : bands * band_width] = bands_data.transpose(1, 0, 2, 3).reshape(
+        height, bands * band_width, channels
+    )
+
+    starts = np.concatenate([[0], np.cumsum(frame_counts)[:-1]]).astype(int)
+    index = {
+        "format": texture_format,
+        "width": width,
+        "height": height,
+        "bandWidth": band_width,
+        "targetsPerTexel": channels,
+        "facsNames": names,
+        "clips": [
+            {
+                "name": clip.get("name", ""),
+                "trackPath": clip.get("trackPath", ""),
+                "fps": clip["exportFps"],
+                "startFrame": int(start),
+                "numFrames": clip["numFrames"],
+            }
+            for clip, start in zip(clips, starts)
+        ],
+    }
+    return texture, index
+
+
+def quantization_error(texture, index, clips):
+    """Max absolute difference between the weights sampled from the atlas and the clips."""
+    height, band_width = index["height"], index["bandWidth"]
+    target_count = len(index["facsNames"])
+    error = 0.0
+    for clip, entry in zip(clips, index["clips"]):
+        frames = entry["startFrame"] + np.arange(entry["numFrames"])
+        rows = texture[frames % height]
+        # Columns of the band of every frame
+        columns = (frames // height)[:, None] * band_width + np.arange(band_width)
+        texels = np.take_along_axis(rows, columns[:, :, None], axis=1)
+        values = texels.reshape(len(frames), -1)[:, :target_count].astype(np.float32)
+        if index["format"] == "rgba8":
+            values /= 255.0
+        error = max(error, float(np.abs(values - clip["weightMat"]).max(initial=0.0)))
+    return error
+
+
+def write_atlas(path, texture, index):
+    """Write <path>.bin (raw texel data) and <path>.json (index)."""
+    texture.astype(texture.dtype.newbyteorder("<")).tofile(path + ".bin")
+    with open(path + ".json", "w", encoding="utf-8") as file:
+        json.dump(index, file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bake clips into a weight texture atlas.")
+    parser.add_argument("output", help="Output path without extension")
+    parser.add_argument("clips", nargs="+")
+    parser.add_argument("--format", choices=["float16", "rgba8"], default="float16")
+    parser.add_argument("--max-size", type=int, default=default_max_texture_size)
+    args = parser.parse_args()
+
+    clips = []
+    for path in args.clips:
+        clip = load_any_clip(path)
+        clip["name"] = os.path.splitext(os.path.basename(path))[0]
+        clips.append(clip)
+    texture, index = build_atlas(clips, args.format, args.max_size)
+    write_atlas(args.output, texture, index)
+
+    frame_count = sum(clip["numFrames"] for clip in clips)
+    used = frame_count * len(index["facsNames"]) * texture.dtype.itemsize
+    source_size = sum(os.path.getsize(path) for path in args.clips)
+    # Parsed JSON weightMat (JS numbers are 8 byte doubles) and precomputeBlendShapes
+    # (one Uint16Array of numFrames per morph target of every mesh)
+    parsed_size = frame_count * len(index["facsNames"]) * 8
+    uint16_size = frame_count * len(index["facsNames"]) * 2
+    print(
+        f"Atlas {index['width']}×{index['height']} {args.format}: {texture.nbytes / 1e3:.1f} KB "
+        f"({used / texture.nbytes:.0%} used by {len(clips)} clips, {frame_count} frames)"
+    )
+    print(
+        f"Clip files: {source_size / 1e3:.1f} KB, parsed weightMat: {parsed_size / 1e3:.1f} KB, "
+        f"precomputed Uint16Arrays: {uint16_size / 1e3:.1f} KB per mesh"
+    )
+    print(f"Max quantization error: {quantization_error(texture, index, clips):.5f}")
@@ -0,0 +1,133 @@
+import argparse
+import json
+
+import numpy as np
+
+from a2f_clip import load_clip, save_clip
+from facs_arkit_shape_keys import a2fBlendshapesToShapeKeys
+
+# Offline per-frame budget of active morph targets.
+# A2F drives all 52 channels with tiny residual values, but GPU morph pipelines have a
+# practical cap on active targets. Per frame, only the `budget` most significant targets are
+# kept (weight × vertex displacement magnitude of the target, from the shape key analysis),
+# the others are zeroed. Active targets get a bonus and stay on for a minimum number of frames
+# (hysteresis), so they don't flicker in and out. Reports the geometric error introduced.
+# Usage:
+#   python clip_budget.py clip.json clip-budget.json --budget 16 \
+#       --magnitudes shapekey_report.json --mesh Head
+
+default_budget = 16
+# Weights below this don't count as active
+active_threshold = 0.001
+# Score bonus of targets active in the previous frame
+hysteresis_bonus = 0.25
+# Frames a target stays active once it's turned on (if it has a non-zero weight)
+minimum_active_frames = 6
+
+
+def load_target_magnitudes(report_path, mesh_name, facs_names):
+    """
+    Displacement magnitude (max effective vertex displacement, in meters) of every A2F pose,
+    from a shapekey_dump.py --json report. ARKit names are looked up first (keys renamed by
+    reorder_arkit_shapekeys.py), then the mapped Daz key. Unknown poses get None.
+    """
+    with open(report_path, encoding="utf-8") as file:
+        report = json.load(file)
+    max_displacement = report[mesh_name]["max_displacement"]
+    magnitudes = []
+    for name in facs_names:
+        source = name if name in max_displacement else a2fBlendshapesToShapeKeys.get(name, "")
+        magnitudes.append(max_displacement.get(source))
+    return magnitudes
+
+
+def budget_weights(
+    weights,
+    magnitudes,
+    budget=default_budget,
+    bonus=hysteresis_bonus,
+    minimum_frames=minimum_active_frames,
+):
+    """
+    Enforce a per-frame budget of active targets.
+
+    Args:
+        weights (np.ndarray): (F, P) clip weights.
+        magnitudes (np.ndarray): (P,) displacement magnitude of every target (importance).
+        budget (int): Max number of active targets per frame.
+        bonus (float): Score bonus (fraction) for targets active in the previous frame.
+        minimum_frames (int): Frames a target stays active once turned on.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (F, P) budgeted weights and (F,) geometric error bound
+            per frame (sum of dropped weight × magnitude, in meters).
+    """
+    weights = np.asarray(weights, dtype=np.float32)
+    magnitudes = np.asarray(magnitudes, dtype=np.float32)
+    frame_count, target_count = weights.shape
+    budget = min(budget, target_count)
+
+    scores = np.abs(weights) * magnitudes
+    candidates = np.abs(weights) > active_threshold
+    active = np.zeros(target_count, dtype=bool)
+    active_frames = np.zeros(target_count, dtype=np.int64)
+    keep = np.zeros_like(candidates)
+
+    for frame_index in range(frame_count):
+        frame_scores = np.where(candidates[frame_index], scores[frame_index], -np.inf)
+        frame_scores = np.where(active, frame_scores * (1.0 + bonus), frame_scores)
+        # Recently turned on targets keep their place while they still have a weight
+        held = active & (active_frames < minimum_frames) & candidates[frame_index]
+        frame_scores[held] = np.inf
+
+        order = np.argsort(-frame_scores, kind="stable")[:budget]
+        selected = np.zeros(target_count, dtype=bool)
+        selected[order] = np.isfinite(frame_scores[order]) | held[order]
+        selected &= candidates[frame_index]
+
+        active_frames = np.where(selected, np.where(active, active_frames + 1, 1), 0)
+        active = selected
+        keep[frame_index] = selected
+
+    budgeted = np.where(keep, weights, 0.0).astype(np.float32)
+    errors = np.where(keep, 0.0, scores).sum(axis=1)
+    return budgeted, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enforce an active morph target budget.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--budget", type=int, default=default_budget)
+    parser.add_argument("--magnitudes", help="shapekey_dump.py --json report")
+    parser.add_argument("--mesh", default="Head", help="Mesh name in the report")
+    args = parser.parse_args()
+
+    clip = load_clip(args.input)
+    pose_count = clip["numPoses"]
+    magnitudes = np.ones(pose_count, dtype=np.float32)
+    if args.magnitudes:
+        found = load_target_magnitudes(args.magnitudes, args.mesh, clip["facsNames"])
+        missing = [name for name, value in zip(clip["facsNames"], found) if value is None]
+        if missing:
+            print(f"No displacement magnitude for {missing}, using the max one.")
+        known = [value for value in found if value is not None]
+        fallback = max(known) if known else 1.0
+        magnitudes = np.array([fallback if v is None else v for v in found], dtype=np.float32)
+
+    weights = clip["weightMat"]
+    budgeted, errors = budget_weights(weights, magnitudes, args.budget)
+    clip["weightMat"] = budgeted
+    save_clip(clip, args.output)
+
+    active_before = (np.abs(weights) > active_threshold).sum(axis=1)
+    active_after = (budgeted != 0).sum(axis=1)
+    toggles = np.count_nonzero(np.diff(budgeted != 0, axis=0))
+    unit = "mm" if args.magnitudes else "(weight units)"
+    scale = 1000.0 if args.magnitudes else 1.0
+    print(f"Active targets per frame: max {active_before.max()} -> {active_after.max()}")
+    print(f"Active target toggles: {toggles}")
+    print(
+        f"Geometric error bound: max {errors.max() * scale:.3f} {unit}, "
+        f"mean {errors.mean() * scale:.3f} {unit}"
+    )
@@ -0,0 +1,322 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from a2f_clip import clip_from_json
+from clip_convert import process_clip
+from export_cache import default_cache_dir, fingerprint
+
+# Cache of fully processed clips (filtered, resampled, retargeted, encoded .a2fc bytes), so the
+# same answer audio isn't processed again across sessions.
+# Clips are retargeted to an avatar with its ARKit index map (arkit_index_map.json of
+# reorder_arkit_shapekeys.py, see clip_convert.retarget_clip): weight columns in morph target
+# order with the target indices in the clip, so the client binds targets by index
+# (precomputeBlendShapesByIndex) instead of matching names.
+# Keyed by (audio content hash, index map hash, processing parameters). Two tiers:
+# a size-bounded in-memory LRU and a size-bounded directory (least recently used files are
+# evicted). Identical requests arriving together are coalesced: one computes, the others wait
+# for its result. Hit/miss metrics are kept per tier.
+# Service (local HTTP):
+#   python clip_cache.py [--port 8765] [--index-map avatar=arkit_index_map.json ...]
+#   POST /clip?fps=30&avatar=<name>&audio_hash=<sha256> with an A2F export as body
+#       -> .a2fc bytes (without audio_hash, the export itself is hashed; without avatar,
+#       the clip keeps the A2F names and isn't retargeted)
+#   GET /metrics -> JSON metrics
+
+default_memory_bytes = 64 * 1024 * 1024
+default_disk_bytes = 1024 * 1024 * 1024
+default_clip_cache_dir = os.path.join(default_cache_dir, "clips")
+default_port = 8765
+
+
+def clip_cache_key(audio_hash, index_map_hash, parameters):
+    return fingerprint(
+        {"audio": audio_hash, "index_map": index_map_hash, "parameters": parameters}
+    )
+
+
+def load_index_map(path):
+    """ARKit index map and its hash (the avatar mapping version)."""
+    with open(path, encoding="utf-8") as file:
+        index_map = json.load(file)
+    return index_map, fingerprint(index_map)
+
+
+class ClipCache:
+    """
+    Two-tier LRU cache of clip bytes with request coalescing. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        cache_dir=default_clip_cache_dir,
+        max_memory_bytes=default_memory_bytes,
+        max_disk_bytes=default_disk_bytes,
+    ):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._metrics = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "compute_seconds": 0.0,
+        }
+        # Disk tier index: path -> size, least recently used first (scanned once)
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            for _, path, size in sorted(self._disk_entries()):
+                self._disk[path] = size
+                self._disk_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.a2fc")
+
+    def _disk_entries(self):
+        """(mtime, path, size) of all cached files."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".a2fc"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, os.path.join(root, name), stat.st_size))
+        return entries
+
+    def _remember(self, key, data):
+        """Add to the memory tier, evicting least recently used entries (lock held)."""
+        if len(data) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._metrics["memory_evictions"] += 1
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        # mtime = last use, for the eviction order of the next start
+        os.utime(path)
+        with self._lock:
+            if path in self._disk:
+                self._disk.move_to_end(path)
+            else:
+                # Written by another process since the scan
+                self._disk[path] = len(data)
+                self._disk_bytes += len(data)
+        return data
+
+    def _write_disk(self, key, data):
+        if not self.cache_dir or len(data) > self.max_disk_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        evicted = []
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk.pop(path, 0)
+            self._disk[path] = len(data)
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_path, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self._metrics["disk_evictions"] += 1
+                evicted.append(old_path)
+        # Files are deleted outside of the lock
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, key, compute):
+        """
+        Cached bytes for `key`, calling `compute()` (returning bytes) on a miss.
+        Concurrent calls with the same key wait for the first one's result.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._metrics["memory_hits"] += 1
+                return self._memory[key]
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+            else:
+                self._metrics["coalesced"] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            data = self._read_disk(key)
+            if data is not None:
+                with self._lock:
+                    self._metrics["disk_hits"] += 1
+            else:
+                start = time.perf_counter()
+                data = compute()
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._metrics["misses"] += 1
+                    self._metrics["compute_seconds"] += elapsed
+                self._write_disk(key, data)
+            with self._lock:
+                self._remember(key, data)
+            future.set_result(data)
+            return data
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics.update(
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_bytes,
+                disk_bytes=self._disk_bytes,
+            )
+        # Coalesced requests didn't compute either
+        hits = metrics["memory_hits"] + metrics["disk_hits"] + metrics["coalesced"]
+        metrics["hit_rate"] = hits / max(hits + metrics["misses"], 1)
+        return metrics
+
+
+class _Handler(BaseHTTPRequestHandler):
+    cache = None
+    # Avatar name -> (index map, index map hash)
+    index_maps = {}
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/metrics":
+            self._send(200, json.dumps(self.cache.metrics()).encode(), "application/json")
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/clip":
+            self._send(404, b"Not found", "text/plain")
+            return
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError(f"invalid Content-Length {length}")
+            body = self.rfile.read(length)
+            fps = int(query["fps"]) if "fps" in query else None
+            if fps is not None and fps <= 0:
+                raise ValueError(f"fps must be positive, got {fps}")
+            weight_error = float(query["weight_error"]) if "weight_error" in query else None
+            if weight_error is not None and not 0.0 < weight_error < float("inf"):
+                raise ValueError(f"weight_error must be positive and finite, got {weight_error}")
+            parameters = {
+                "fps": fps,
+                "smooth": query.get("smooth", "1") != "0",
+                "max_errors": {"weight": weight_error} if weight_error else None,
+            }
+            avatar = query.get("avatar")
+            if avatar is not None and avatar not in self.index_maps:
+                raise ValueError(f"unknown avatar '{avatar}'")
+            index_map, index_map_hash = self.index_maps[avatar] if avatar else (None, None)
+            audio_hash = query.get("audio_hash") or hashlib.sha256(body).hexdigest()
+            key = clip_cache_key(audio_hash, index_map_hash, parameters)
+            data = self.cache.get(
+                key,
+                lambda: process_clip(
+                    clip_from_json(json.loads(body)), parameters, index_map=index_map
+                )[2],
+            )
+        except (ValueError, KeyError, TypeError, IndexError, OverflowError) as error:
+            # Bad parameters or export (json.JSONDecodeError is a ValueError)
+            self._send(400, f"Bad request: {error}".encode(), "text/plain")
+            return
+        except Exception as error:
+            self._send(500, f"Internal error: {error}".encode(), "text/plain")
+            return
+        self._send(200, data, "application/octet-stream")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=default_port, cache=None, index_map_paths=None):
+    """
+    Args:
+        index_map_paths (dict, optional): Avatar name -> path of its arkit_index_map.json.
+    """
+    _Handler.cache = cache or ClipCache()
+    _Handler.index_maps = {
+        avatar: load_index_map(path) for avatar, path in (index_map_paths or {}).items()
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    print(f"Clip cache on http://127.0.0.1:{port} (POST /clip, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(_Handler.cache.metrics(), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve processed clips from a local cache.")
+    parser.add_argument("--port", type=int, default=default_port)
+    parser.add_argument("--cache-dir", default=default_clip_cache_dir)
+    parser.add_argument("--memory-mb", type=float, default=default_memory_bytes / 2**20)
+    parser.add_argument("--disk-mb", type=float, default=default_disk_bytes / 2**20)
+    parser.add_argument(
+        "--index-map",
+        nargs="+",
+        default=[],
+        metavar="AVATAR=PATH",
+        help="ARKit index map of every avatar clips are retargeted to",
+    )
+    args = parser.parse_args()
+    index_map_paths = {}
+    for item in args.index_map:
+        avatar, separator, path = item.partition("=")
+        if not separator:
+            parser.error(f"--index-map expects AVATAR=PATH, got '{item}'")
+        index_map_paths[avatar] = path
+    serve(
+        args.port,
+        ClipCache(args.cache_dir, int(args.memory_mb * 2**20), int(args.disk_mb * 2**20)),
+        index_map_paths,
+    )
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from a2f_clip import load_clip, load_emotion_keys, save_emotion_keys
+from clip_resample import resample_clip, resample_emotion_keys
+
+# Concatenation of A2F clips played back to back (answers made of many short segments).
+# Segments are loaded one at a time, joined with a crossfade of `crossfade_frames` frames
+# (the next segment starts that many frames before the previous one ends) and written out
+# frame by frame, so memory holds one segment and not the whole session.
+# Segments with another fps are resampled to the fps of the first one (clip_resample.py).
+# The output has a "segments" list (trackPath, startFrame, numFrames of every segment),
+# to schedule the segment audio at the right frames.
+# Usage:
+#   python clip_concat.py session.json a.json b.json c.json [--crossfade 6] \
+#       [--emotion session-emotion.json a-emotion.json b-emotion.json c-emotion.json]
+
+default_crossfade_frames = 6
+
+
+def crossfade_ramp(frame_count):
+    """(N, 1) smoothstep weights of the incoming segment over a crossfade of N frames."""
+    t = (np.arange(frame_count, dtype=np.float32) + 1.0) / (frame_count + 1.0)
+    return (t * t * (3.0 - 2.0 * t))[:, None]
+
+
+def crossfade(outgoing, incoming):
+    """
+    Crossfade the overlapping frames of two segments, all channels at once.
+    Joint rotations are blended by nlerp on the shortest path.
+    """
+    ramp = crossfade_ramp(len(outgoing["weightMat"]))
+    blended = {"weightMat": (1.0 - ramp) * outgoing["weightMat"] + ramp * incoming["weightMat"]}
+    if len(outgoing["rotations"]):
+        q1, q2 = outgoing["rotations"], incoming["rotations"]
+        q2 = np.where(np.sum(q1 * q2, axis=-1, keepdims=True) < 0.0, -q2, q2)
+        rotations = (1.0 - ramp[:, :, None]) * q1 + ramp[:, :, None] * q2
+        rotations /= np.maximum(np.linalg.norm(rotations, axis=-1, keepdims=True), 1e-12)
+        blended["rotations"] = rotations
+        blended["translations"] = (
+            (1.0 - ramp[:, :, None]) * outgoing["translations"]
+            + ramp[:, :, None] * incoming["translations"]
+        )
+    else:
+        blended["rotations"] = outgoing["rotations"]
+        blended["translations"] = outgoing["translations"]
+    return {key: value.astype(np.float32) for key, value in blended.items()}
+
+
+def _frames(clip, start, stop=None):
+    return {key: clip[key][start:stop] for key in ("weightMat", "rotations", "translations")}
+
+
+class _ArrayWriter:
+    """Writes rows of a JSON array of arrays to a temporary file, one chunk at a time."""
+
+    def __init__(self, directory):
+        self.file = tempfile.TemporaryFile("w+", encoding="utf-8", dir=directory)
+        self.count = 0
+
+    def write(self, rows):
+        for row in rows.tolist():
+            self.file.write(("," if self.count else "") + json.dumps(row))
+            self.count += 1
+
+    def copy_to(self, output):
+        self.file.seek(0)
+        output.write("[")
+        shutil.copyfileobj(self.file, output)
+        output.write("]")
+        self.file.close()
+
+
+def concatenate_clips(paths, output_path, crossfade_frames=default_crossfade_frames):
+    """
+    Concatenate the clips at `paths` into one clip at `output_path`, streaming.
+
+    Returns:
+        list[dict]: trackPath, startFrame and numFrames of every segment (in output frames).
+    """
+    directory = os.path.dirname(os.path.abspath(output_path))
+    writers = {key: _ArrayWriter(directory) for key in ("weightMat", "rotations", "translations")}
+    header = None
+    segments = []
+    pending = None  # Last frames of the previous segment, waiting for the crossfade
+    frame_count = 0
+
+    for path in paths:
+        clip = load_clip(path)
+        if header is None:
+            header = {key: clip[key] for key in ("exportFps", "trackPath", "facsNames", "joints")}
+        elif clip["facsNames"] != header["facsNames"] or clip["joints"] != header["joints"]:
+            raise ValueError(f"'{path}' has other poses or joints than '{paths[0]}'")
+        if clip["exportFps"] != header["exportFps"]:
+            clip = resample_clip(clip, header["exportFps"])
+
+        length = clip["numFrames"]
+        overlap = min(crossfade_frames, length, len(pending["weightMat"]) if pending else 0)
+        start = frame_count - overlap
+        if overlap:
+            # Frames of the previous segment before the overlap can be written now
+            kept = len(pending["weightMat"]) - overlap
+            for key, writer in writers.items():
+                writer.write(pending[key][:kept])
+            pending = crossfade(_frames(pending, kept), _frames(clip, 0, overlap))
+            frames = {key: np.concatenate([pending[key], clip[key][overlap:]]) for key in pending}
+        else:
+            if pending:
+                for key, writer in writers.items():
+                    writer.write(pending[key])
+            frames = _frames(clip, 0)
+        # Hold back the last frames for the crossfade with the next segment
+        held = min(crossfade_frames, len(frames["weightMat"]))
+        split = len(frames["weightMat"]) - held
+        for key, writer in writers.items():
+            writer.write(frames[key][:split])
+        pending = _frames(frames, split)
+        frame_count = start + length
+        segments.append({"trackPath": clip["trackPath"], "startFrame": start, "numFrames": length})
+
+    if pending:
+        for key, writer in writers.items():
+            writer.write(pending[key])
+
+    header = header or {"exportFps": 60, "trackPath": "", "facsNames": [], "joints": []}
+    with open(output_path + ".tmp", "w", encoding="utf-8") as output:
+        output.write("{")
+        for key in ("exportFps", "trackPath"):
+            output.write(f"{json.dumps(key)}: {json.dumps(header[key])}, ")
+        output.write(f'"numPoses": {len(header["facsNames"])}, "numFrames": {frame_count}, ')
+        output.write(f'"facsNames": {json.dumps(header["facsNames"])}, "weightMat": ')
+        writers["weightMat"].copy_to(output)
+        output.write(f', "joints": {json.dumps(header["joints"])}, "rotations": ')
+        writers["rotations"].copy_to(output)
+        output.write(', "translations": ')
+        writers["translations"].copy_to(output)
+        output.write(f', "segments": {json.dumps(segments)}}}')
+    os.replace(output_path + ".tmp", output_path)
+    return segments
+
+
+def concatenate_emotion_keys(paths, segments, output_path):
+    """
+    Concatenate emotion key exports of the segments, key frames rebased to the segment starts.
+    Keys of a segment after the start of the next one are replaced by the next segment's keys.
+    """
+    emotions = []
+    fps = None
+    for path in paths:
+        emotion = load_emotion_keys(path)
+        fps = emotion["exportFps"] if fps is None else fps
+        if emotion["exportFps"] != fps:
+            emotion = resample_emotion_keys(emotion, fps)
+        emotions.append(emotion)
+
+    frames, keys = [], []
+    for index, (emotion, segment) in enumerate(zip(emotions, segments)):
+        rebased = emotion["emotionFrames"] + segment["startFrame"]
+        if index + 1 < len(segments):
+            mask = rebased < segments[index + 1]["startFrame"]
+        else:
+            mask = np.ones(len(rebased), dtype=bool)
+        frames.append(rebased[mask])
+        keys.append(emotion["emotionKeys"][mask])
+
+    combined = dict(emotions[0])
+    combined["emotionFrames"] = np.concatenate(frames)
+    combined["emotionKeys"] = np.concatenate(keys)
+    combined["numFrames"] = segments[-1]["startFrame"] + segments[-1]["numFrames"]
+    save_emotion_keys(combined, output_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concatenate A2F clips with crossfades.")
+    parser.add_argument("output")
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("--crossfade", type=int, default=default_crossfade_frames)
+    parser.add_argument(
+        "--emotion", nargs="+", metavar="PATH", help="Output, then the emotion key exports"
+    )
+    args = parser.parse_args()
+
+    segments = concatenate_clips(args.inputs, args.output, args.crossfade)
+    if args.emotion:
+        if len(args.emotion) != len(args.inputs) + 1:
+            parser.error("--emotion needs an output and one emotion key export per clip")
+        concatenate_emotion_keys(args.emotion[1:], segments, args.emotion[0])
+    total = segments[-1]["startFrame"] + segments[-1]["numFrames"]
+    print(f"{len(segments)} segments, {total} frames -> {args.output}")
+    for segment in segments:
+        print(f"- frame {segment['startFrame']}: {segment['trackPath']}")
@@ -0,0 +1,293 @@
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from a2f_clip import load_clip, load_emotion_keys, save_emotion_keys
+from clip_encoder import clip_bytes, encode_clip
+from clip_filters import filter_weights
+from clip_resample import resample_clip, resample_emotion_keys
+from export_cache import canonical_json, fingerprint
+
+# Convert a library of A2F exports with the clip pipeline in a process pool.
+# Walks a directory for a2f_export_bsweight-<name>.json, pairs each with
+# a2f_export_emotionkey-<name>.json (optional) and writes <name>.a2fc (+ <name>-emotion.json)
+# to the output directory, same subdirectories. Pipeline: load, smooth (clip_filters.py),
+# resample (clip_resample.py, with --fps), encode (clip_encoder.py), write. The same pipeline
+# (`process_clip`) serves clips in clip_cache.py, where it can also retarget them to an avatar.
+# Outputs are written atomically and recorded in a manifest, so an interrupted run resumes
+# where it stopped (and changed inputs or parameters are converted again).
+# Usage:
+#   python clip_convert.py exports_dir output_dir [--fps 30] [--processes 8] [--no-smooth]
+
+BSWEIGHT_PATTERN = re.compile(r"^a2f_export_bsweight-(.+)\.json$")
+EMOTION_PREFIX = "a2f_export_emotionkey-"
+MANIFEST_NAME = "manifest.jsonl"
+
+# Max submitted jobs per worker, so the queue (and pickled results) stay bounded
+queued_jobs_per_process = 2
+
+
+def find_exports(input_dir):
+    """
+    Pair blendshape weight exports with their emotion key exports.
+
+    Returns:
+        list[dict]: name (relative path without prefix/extension), clip and emotion paths
+            (emotion None if missing), sorted by name.
+    """
+    jobs = []
+    for root, _, files in os.walk(input_dir):
+        names = set(files)
+        for file_name in files:
+            match = BSWEIGHT_PATTERN.match(file_name)
+            if not match:
+                continue
+            emotion_name = f"{EMOTION_PREFIX}{match.group(1)}.json"
+            relative_dir = os.path.relpath(root, input_dir)
+            jobs.append(
+                {
+                    "name": os.path.normpath(os.path.join(relative_dir, match.group(1))),
+                    "clip": os.path.join(root, file_name),
+                    "emotion": os.path.join(root, emotion_name) if emotion_name in names else None,
+                }
+            )
+    return sorted(jobs, key=lambda job: job["name"])
+
+
+def output_path(output_dir, job):
+    return os.path.join(output_dir, job["name"] + ".a2fc")
+
+
+def job_key(job, parameters):
+    """Fingerprint of a job's inputs (path, size, modification time) and parameters."""
+    inputs = []
+    for path in (job["clip"], job["emotion"]):
+        if path:
+            stat = os.stat(path)
+            inputs.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    return fingerprint({"inputs": inputs, "parameters": parameters})
+
+
+def _atomic_write(path, write):
+    """Call `write(tmp_path)`, then move the file to `path` (never a partial output)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def _write_bytes(data):
+    def write(path):
+        with open(path, "wb") as file:
+            file.write(data)
+
+    return write
+
+
+def retarget_clip(clip, index_map):
+    """
+    Bind a clip to an avatar's morph targets with its ARKit index map (arkit_index_map.json
+    of reorder_arkit_shapekeys.py): weight columns in index map pose order (poses the clip
+    doesn't drive stay 0, other columns are dropped) and the map's meshes (morph target index
+    of every column), so the client binds targets by index without a sidecar.
+    """
+    names = list(index_map["facsNames"])
+    column_by_name = {name: column for column, name in enumerate(clip["facsNames"])}
+    if not any(name in column_by_name for name in names):
+        raise ValueError("The clip drives none of the poses of the index map")
+    source = np.asarray(clip["weightMat"], dtype=np.float32)
+    weights = np.zeros((len(source), len(names)), dtype=np.float32)
+    for pose, name in enumerate(names):
+        column = column_by_name.get(name)
+        if column is not None:
+            weights[:, pose] = source[:, column]
+    clip = dict(clip)
+    clip.update(facsNames=names, numPoses=len(names), weightMat=weights)
+    clip["meshes"] = index_map["meshes"]
+    return clip
+
+
+def process_clip(clip, parameters, emotion=None, index_map=None, lap=None):
+    """
+    Clip pipeline: smooth, resample, retarget (with an index map) and encode.
+
+    Args:
+        parameters (dict): smooth (bool), fps (None keeps the clip's) and max_errors
+            (see clip_encoder.encode_clip).
+        emotion (dict, optional): Emotion keys, resampled with the clip.
+        index_map (dict, optional): ARKit index map to retarget to, see `retarget_clip`.
+        lap (callable, optional): Called with the name of every finished stage (timings).
+
+    Returns:
+        tuple[dict, dict | None, bytes]: Processed clip, emotion keys and .a2fc bytes.
+    """
+    lap = lap or (lambda stage: None)
+    if parameters["smooth"]:
+        clip["weightMat"] = filter_weights(clip["weightMat"], clip["facsNames"], clip["exportFps"])
+    lap("smooth")
+    fps = parameters["fps"]
+    if fps and fps != clip["exportFps"]:
+        clip = resample_clip(clip, fps)
+        if emotion is not None:
+            emotion = resample_emotion_keys(emotion, fps)
+    lap("resample")
+    if index_map is not None:
+        clip = retarget_clip(clip, index_map)
+    data = clip_bytes(clip, encode_clip(clip, parameters["max_errors"]))
+    lap("encode")
+    return clip, emotion, data
+
+
+def convert_job(job, output_dir, parameters):
+    """
+    Run the pipeline on one export pair (in a worker process).
+
+    Returns:
+        dict: name, input/output bytes, frame count and seconds per stage.
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    def lap(stage):
+        nonlocal start
+        now = time.perf_counter()
+        timings[stage] = now - start
+        start = now
+
+    clip = load_clip(job["clip"])
+    emotion = load_emotion_keys(job["emotion"]) if job["emotion"] else None
+    lap("load")
+    clip, emotion, data = process_clip(clip, parameters, emotion, lap=lap)
+
+    output_bytes = _atomic_write(output_path(output_dir, job), _write_bytes(data))
+    if emotion is not None:
+        output_bytes += _atomic_write(
+            os.path.join(output_dir, job["name"] + "-emotion.json"),
+            lambda path: save_emotion_keys(emotion, path),
+        )
+    lap("write")
+
+    input_bytes = sum(os.path.getsize(path) for path in (job["clip"], job["emotion"]) if path)
+    return {
+        "name": job["name"],
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "frames": clip["numFrames"],
+        "timings": timings,
+    }
+
+
+def _load_manifest(path):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Last line of an interrupted run
+                continue
+            done[entry["name"]] = entry
+    return done
+
+
+def convert_library(input_dir, output_dir, parameters, processes=None):
+    """
+    Convert all export pairs under `input_dir`, skipping those already converted with the same
+    inputs and parameters.
+
+    Returns:
+        tuple[list[dict], int, float]: Results of converted jobs, skipped job count, seconds.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    done = _load_manifest(manifest_path)
+    pending = []
+    skipped = 0
+    for job in find_exports(input_dir):
+        key = job_key(job, parameters)
+        entry = done.get(job["name"])
+        if entry and entry["key"] == key and os.path.exists(output_path(output_dir, job)):
+            skipped += 1
+        else:
+            pending.append((job, key))
+
+    results = []
+    start = time.perf_counter()
+    processes = processes or os.cpu_count() or 1
+    with open(manifest_path, "a", encoding="utf-8") as manifest, ProcessPoolExecutor(
+        max_workers=processes
+    ) as executor:
+        queue = iter(pending)
+        running = {}
+        while True:
+            # Keep a bounded number of jobs submitted
+            while len(running) < processes * queued_jobs_per_process:
+                item = next(queue, None)
+                if item is None:
+                    break
+                job, key = item
+                running[executor.submit(convert_job, job, output_dir, parameters)] = (job, key)
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job, key = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as error:
+                    print(f"ERROR: {job['clip']}: {error}")
+                    continue
+                results.append(result)
+                manifest.write(canonical_json({"name": job["name"], "key": key}) + "\n")
+                manifest.flush()
+    return results, skipped, time.perf_counter() - start
+
+
+def print_summary(results, skipped, seconds):
+    print(f"Converted {len(results)} clips, skipped {skipped} (already converted)")
+    if not results:
+        return
+    input_bytes = sum(result["input_bytes"] for result in results)
+    output_bytes = sum(result["output_bytes"] for result in results)
+    frames = sum(result["frames"] for result in results)
+    print(
+        f"Throughput: {len(results) / seconds:.1f} clips/s, "
+        f"{input_bytes / 1e6 / seconds:.1f} MB/s, {frames / seconds:.0f} frames/s "
+        f"({seconds:.1f} s)"
+    )
+    print(
+        f"Compression: {input_bytes / 1e6:.1f} MB -> {output_bytes / 1e6:.2f} MB "
+        f"({input_bytes / max(output_bytes, 1):.1f}×)"
+    )
+    stages = results[0]["timings"].keys()
+    total = sum(sum(result["timings"].values()) for result in results)
+    print("Stage time (summed over workers):")
+    for stage in stages:
+        stage_total = sum(result["timings"][stage] for result in results)
+        print(f"- {stage}: {stage_total:.2f} s ({stage_total / max(total, 1e-9):.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a directory of A2F exports.")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--fps", type=int, default=None, help="Resample to this frame rate")
+    parser.add_argument("--no-smooth", action="store_true")
+    parser.add_argument("--weight-error", type=float, default=None)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    parameters = {
+        "fps": args.fps,
+        "smooth": not args.no_smooth,
+        "max_errors": {"weight": args.weight_error} if args.weight_error else None,
+    }
+    print_summary(*convert_library(args.input_dir, args.output_dir, parameters, args.processes))
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+from a2f_clip import load_clip
+
+# Binary clip encoder with per-channel fixed-point precision.
+# The TS path stores every weight as value × 10000 in a Uint16Array, which wastes bandwidth on
+# low-dynamic channels and silently wraps negative weights and weights > 6.5535.
+# Here every channel (blendshape weight, joint rotation/translation component) gets its own
+# offset, scale and bit depth (0 for constant channels, 8 or 16) from its range and the required
+# precision, so no value can overflow. Decoded value = offset + quantized × scale.
+# Usage:
+#   python clip_encoder.py clip.json clip.a2fc [--weight-error 0.0005]
+#
+# Binary layout (little endian):
+#   header: magic "A2FC", u16 version, u16 channel count, f32 fps, u32 frame count,
+#           u32 metadata length
+#   metadata: UTF-8 JSON (facsNames, joints, trackPath, channels, meshes of retargeted clips),
+#             padded with spaces to 4 bytes
+#   channel table: per channel f32 offset, f32 scale, u8 bits, 3 bytes padding
+#   channel data: per channel with bits > 0, u8/u16[frame count], padded to 4 bytes
+
+CLIP_MAGIC = b"A2FC"
+CLIP_VERSION = 1
+HEADER_FORMAT = "<4sHHfII"
+CHANNEL_FORMAT = "<ffB3x"
+
+# Max quantization error by channel kind (weights: half of the client deadband,
+# A2F joint translations are in centimeters)
+default_max_errors = {"weight": 0.0005, "rotation": 0.0001, "translation": 0.001}
+
+
+def clip_channels(clip):
+    """
+    All animated channels of a clip as one (F, C) matrix.
+
+    Returns:
+        tuple[list[str], list[str], np.ndarray]: Channel names, channel kinds
+            (weight/rotation/translation) and values.
+    """
+    names = list(clip["facsNames"])
+    kinds = ["weight"] * len(names)
+    columns = [clip["weightMat"]]
+    frame_count = len(clip["weightMat"])
+    for kind, array, components in (
+        ("rotation", clip.get("rotations"), "xyzw"),
+        ("translation", clip.get("translations"), "xyz"),
+    ):
+        if array is None or not np.size(array):
+            continue
+        for joint_index, joint in enumerate(clip["joints"]):
+            for component_index, component in enumerate(components):
+                names.append(f"{joint}.{kind}.{component}")
+                kinds.append(kind)
+                columns.append(array[:, joint_index, component_index].reshape(frame_count, 1))
+    return names, kinds, np.concatenate(columns, axis=1).astype(np.float32)
+
+
+def choose_quantization(values, max_error):
+    """
+    Offset, scale and bit depth of every channel, vectorized over channels.
+
+    Args:
+        values (np.ndarray): (F, C) channel values.
+        max_error (np.ndarray): (C,) required max absolute error.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (C,) offsets, scales and bits (0, 8 or 16).
+    """
+    minimum = values.min(axis=0) if len(values) else np.zeros(values.shape[1], np.float32)
+    maximum = values.max(axis=0) if len(values) else minimum
+    value_range = (maximum - minimum).astype(np.float64)
+    # Rounding error is half a step: step = 2 × max error
+    levels = np.ceil(value_range / (2.0 * np.maximum(max_error, 1e-12))) + 1
+    bits = np.where(value_range == 0, 0, np.where(levels <= 2**8, 8, 16))
+    max_codes = np.where(bits == 0, 1, 2.0**bits - 1)
+    scales = np.where(bits == 0, 0.0, value_range / max_codes)
+    return minimum.astype(np.float32), scales.astype(np.float32), bits.astype(np.uint8)
+
+
+def quantize(values, offsets, scales, bits):
+    """(F, C) integer codes, validated against overflow."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        codes = np.where(scales > 0, np.rint((values - offsets) / scales), 0)
+    max_codes = np.where(bits == 0, 0, 2.0**bits - 1)
+    if (codes < 0).any() or (codes > max_codes).any():
+        raise OverflowError("Quantized value out of channel range")
+    return codes.astype(np.int64)
+
+
+def dequantize(codes, offsets, scales):
+    return (offsets + codes * scales).astype(np.float32)
+
+
+def encode_clip(clip, max_errors=None):
+    """
+    Choose per-channel quantization and encode all channels.
+
+    Returns:
+        dict: names, kinds, offsets, scales, bits, codes (F, C), errors (C,) max absolute
+            quantization error of every channel and max_errors (C,) required max errors
+            (16 bit isn't always enough for wide channels, see `print_encoding_report`).
+    """
+    max_errors = {**default_max_errors, **(max_errors or {})}
+    names, kinds, values = clip_channels(clip)
+    max_error = np.array([max_errors[kind] for kind in kinds], dtype=np.float64)
+    offsets, scales, bits = choose_quantization(values, max_error)
+    codes = quantize(values, offsets, scales, bits)
+    errors = np.abs(dequantize(codes, offsets, scales) - values).max(axis=0, initial=0.0)
+    return {
+        "names": names,
+        "kinds": kinds,
+        "offsets": offsets,
+        "scales": scales,
+        "bits": bits,
+        "codes": codes,
+        "errors": errors,
+        "max_errors": max_error,
+    }
+
+
+def _pad(data, fill=b"\0"):
+    return data + fill * (-len(data) % 4)
+
+
+def clip_bytes(clip, encoded):
+    """Binary clip (see the layout above) as bytes."""
+    metadata = {
+        "facsNames": clip["facsNames"],
+        "joints": clip.get("joints", []),
+        "trackPath": clip.get("trackPath", ""),
+        "channels": encoded["names"],
+    }
+    if clip.get("meshes"):
+        # Morph target indices of every weight column (retargeted clips, see clip_convert.py)
+        metadata["meshes"] = clip["meshes"]
+    metadata_data = _pad(json.dumps(metadata).encode("utf-8"), b" ")
+    frame_count = len(encoded["codes"])
+    parts = [
+        struct.pack(
+            HEADER_FORMAT,
+            CLIP_MAGIC,
+            CLIP_VERSION,
+            len(encoded["names"]),
+            clip["exportFps"],
+            frame_count,
+            len(metadata_data),
+        ),
+        metadata_data,
+    ]
+    for offset, scale, bits in zip(encoded["offsets"], encoded["scales"], encoded["bits"]):
+        parts.append(struct.pack(CHANNEL_FORMAT, offset, scale, bits))
+    for index, bits in enumerate(encoded["bits"]):
+        if bits:
+            dtype = "<u1" if bits == 8 else "<u2"
+            parts.append(_pad(encoded["codes"][:, index].astype(dtype).tobytes()))
+    return b"".join(parts)
+
+
+def write_clip(path, clip, encoded):
+    with open(path, "wb") as file:
+        file.write(clip_bytes(clip, encoded))
+
+
+def read_clip(path):
+    """
+    Read a binary clip back into a clip dict (see a2f_clip.load_clip).
+    """
+    with open(path, "rb") as file:
+        return clip_from_bytes(file.read(), path)
+
+
+def clip_from_bytes(data, name="clip"):
+    """Decode binary clip bytes into a clip dict."""
+    magic, version, channel_count, fps, frame_count, metadata_length = struct.unpack_from(
+        HEADER_FORMAT, data, 0
+    )
+    if magic != CLIP_MAGIC or version != CLIP_VERSION:
+        raise ValueError(f"'{name}' is not a binary clip (version {CLIP_VERSION})")
+    offset = struct.calcsize(HEADER_FORMAT)
+    metadata = json.loads(data[offset:offset + metadata_length])
+    offset += metadata_length
+
+    channel_size = struct.calcsize(CHANNEL_FORMAT)
+    values = np.empty((frame_count, channel_count), dtype=np.float32)
+    table = [
+        struct.unpack_from(CHANNEL_FORMAT, data, offset + index * channel_size)
+        for index in range(channel_count)
+    ]
+    offset += channel_count * channel_size
+    for index, (channel_offset, scale, bits) in enumerate(table):
+        if bits == 0:
+            values[:, index] = channel_offset
+            continue
+        codes = np.frombuffer(data, "<u1" if bits == 8 else "<u2", frame_count, offset)
+        offset += codes.nbytes + (-codes.nbytes % 4)
+        values[:, index] = dequantize(codes, channel_offset, scale)
+
+    pose_count = len(metadata["facsNames"])
+    joint_count = len(metadata["joints"])
+    joint_values = values[:, pose_count:]
+    clip = {
+        "exportFps": fps,
+        "trackPath": metadata["trackPath"],
+        "numPoses": pose_count,
+        "numFrames": frame_count,
+        "facsNames": metadata["facsNames"],
+        "weightMat": values[:, :pose_count],
+        "joints": metadata["joints"],
+        "rotations": joint_values[:, : joint_count * 4].reshape(frame_count, joint_count, 4),
+        "translations": joint_values[:, joint_count * 4:].reshape(frame_count, joint_count, 3),
+    }
+    if "meshes" in metadata:
+        clip["meshes"] = metadata["meshes"]
+    return clip
+
+
+def print_encoding_report(encoded, path, source_size=None):
+    bits = encoded["bits"]
+    frame_count = len(encoded["codes"])
+    print(
+        f"Channels: {len(bits)} ({np.count_nonzero(bits == 0)} constant, "
+        f"{np.count_nonzero(bits == 8)} × 8 bit, {np.count_nonzero(bits == 16)} × 16 bit)"
+    )
+    for kind in sorted(set(encoded["kinds"])):
+        mask = np.array(encoded["kinds"]) == kind
+        print(f"- {kind}: max quantization error {encoded['errors'][mask].max():.6f}")
+    for index in np.flatnonzero(encoded["errors"] > encoded["max_errors"] * 1.001):
+        print(
+            f"WARNING: '{encoded['names'][index]}' error {encoded['errors'][index]:.6f} exceeds "
+            f"{encoded['max_errors'][index]} (range too wide for 16 bit)"
+        )
+    uint16_size = frame_count * len(bits) * 2
+    print(
+        f"Size: {os.path.getsize(path) / 1e3:.1f} KB "
+        f"(uint16 for every channel: {uint16_size / 1e3:.1f} KB"
+        + (f", JSON: {source_size / 1e3:.1f} KB)" if source_size else ")")
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encode an A2F clip with per-channel precision.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--weight-error", type=float, default=default_max_errors["weight"])
+    args = parser.parse_args()
+
+    clip = load_clip(args.input)
+    encoded = encode_clip(clip, {"weight": args.weight_error})
+    write_clip(args.output, clip, encoded)
+    print_encoding_report(encoded, args.output, os.path.getsize(args.input))
@@ -0,0 +1,162 @@
+import json
+import struct
+import sys
+
+import numpy as np
+
+from a2f_clip import load_clip
+
+# Per-frame "dirty target" event stream for playback.
+# Instead of touching every target every frame and comparing it against a deadband on the
+# client (applyPrecomputedBlendShapes), only (target index, new value) pairs whose change
+# exceeds the deadband are stored. Keyframes with the full state every `keyframe_interval`
+# frames allow seeking. Client work per frame is proportional to the changing targets.
+# Usage:
+#   python clip_events.py a2f_export_bsweight-*.json clip.a2fe [deadband] [keyframe_interval]
+#
+# Binary layout (little endian):
+#   header: magic "A2FE", u16 version, u16 target count, f32 fps, u32 frame count,
+#           u32 keyframe interval, u32 event count, u32 names length
+#   names: UTF-8 JSON array of target names (padded with spaces to 4 bytes)
+#   frame offsets: u32[frame count + 1], first event of every frame
+#   keyframes: f16[keyframe count][target count], state after frame k × interval
+#   event targets: u16[event count] (padded to 4 bytes), event values: f16[event count]
+
+EVENT_STREAM_MAGIC = b"A2FE"
+EVENT_STREAM_VERSION = 1
+HEADER_FORMAT = "<4sHHfIIII"
+
+# Same deadband as applyPrecomputedBlendShapes in src/audio2face.ts
+default_deadband = 0.001
+default_keyframe_interval = 60
+
+
+def encode_events(weights, deadband=default_deadband, keyframe_interval=default_keyframe_interval):
+    """
+    Compute dirty-target events of a (F, P) weight matrix, vectorized over targets.
+
+    A target gets an event when it differs from its last sent value by more than `deadband`
+    (all non-zero targets get one in the first frame), same as the client deadband.
+
+    Returns:
+        dict: frame_offsets (F + 1,) uint32, targets (M,) uint16, values (M,) float16,
+            keyframes (ceil(F / interval), P) float16.
+    """
+    weights = np.asarray(weights, dtype=np.float32)
+    frame_count, target_count = weights.shape
+    sent = np.zeros(target_count, dtype=np.float32)
+    frame_offsets = np.zeros(frame_count + 1, dtype=np.uint32)
+    keyframe_count = (frame_count + keyframe_interval - 1) // keyframe_interval
+    keyframes = np.zeros((keyframe_count, target_count), dtype=np.float32)
+    targets = []
+    values = []
+
+    for frame_index in range(frame_count):
+        # Values are sent as float16, compare against what the client will really have
+        frame = weights[frame_index].astype(np.float16).astype(np.float32)
+        dirty = np.flatnonzero(np.abs(frame - sent) > deadband)
+        sent[dirty] = frame[dirty]
+        targets.append(dirty)
+        values.append(frame[dirty])
+        frame_offsets[frame_index + 1] = frame_offsets[frame_index] + len(dirty)
+        if frame_index % keyframe_interval == 0:
+            keyframes[frame_index // keyframe_interval] = sent
+
+    return {
+        "frame_offsets": frame_offsets,
+        "targets": np.concatenate(targets or [[]]).astype(np.uint16),
+        "values": np.concatenate(values or [[]]).astype(np.float16),
+        "keyframes": keyframes.astype(np.float16),
+    }
+
+
+def decode_events(events, target_count):
+    """(F, P) weights as the client sees them after applying all events (for validation)."""
+    frame_offsets = events["frame_offsets"]
+    weights = np.zeros((len(frame_offsets) - 1, target_count), dtype=np.float32)
+    state = np.zeros(target_count, dtype=np.float32)
+    for frame_index in range(len(frame_offsets) - 1):
+        start, stop = frame_offsets[frame_index], frame_offsets[frame_index + 1]
+        state[events["targets"][start:stop]] = events["values"][start:stop]
+        weights[frame_index] = state
+    return weights
+
+
+def _pad(data):
+    return data + b"\0" * (-len(data) % 4)
+
+
+def write_event_stream(path, events, names, fps, keyframe_interval=default_keyframe_interval):
+    names_data = json.dumps(names).encode("utf-8")
+    names_data += b" " * (-len(names_data) % 4)
+    header = struct.pack(
+        HEADER_FORMAT,
+        EVENT_STREAM_MAGIC,
+        EVENT_STREAM_VERSION,
+        len(names),
+        fps,
+        len(events["frame_offsets"]) - 1,
+        keyframe_interval,
+        len(events["targets"]),
+        len(names_data),
+    )
+    with open(path, "wb") as file:
+        file.write(header)
+        file.write(names_data)
+        file.write(events["frame_offsets"].astype("<u4").tobytes())
+        file.write(_pad(events["keyframes"].astype("<f2").tobytes()))
+        file.write(_pad(events["targets"].astype("<u2").tobytes()))
+        file.write(_pad(events["values"].astype("<f2").tobytes()))
+
+
+def read_event_stream(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    header = struct.unpack_from(HEADER_FORMAT, data, 0)
+    magic, version, target_count, fps, frame_count, keyframe_interval = header[:6]
+    event_count, names_length = header[6:]
+    if magic != EVENT_STREAM_MAGIC or version != EVENT_STREAM_VERSION:
+        raise ValueError(f"'{path}' is not an event stream (version {EVENT_STREAM_VERSION})")
+    offset = struct.calcsize(HEADER_FORMAT)
+    names = json.loads(data[offset:offset + names_length])
+    offset += names_length
+
+    def take(dtype, count):
+        nonlocal offset
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes + (-array.nbytes % 4)
+        return array
+
+    keyframe_count = (frame_count + keyframe_interval - 1) // keyframe_interval
+    frame_offsets = take("<u4", frame_count + 1)
+    keyframes = take("<f2", keyframe_count * target_count).reshape(keyframe_count, target_count)
+    targets = take("<u2", event_count)
+    values = take("<f2", event_count)
+    return {
+        "names": names,
+        "fps": fps,
+        "keyframe_interval": keyframe_interval,
+        "frame_offsets": frame_offsets,
+        "keyframes": keyframes,
+        "targets": targets,
+        "values": values,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python clip_events.py input.json output.a2fe [deadband] [keyframe_interval]")
+        sys.exit(2)
+    clip = load_clip(sys.argv[1])
+    deadband = float(sys.argv[3]) if len(sys.argv) > 3 else default_deadband
+    interval = int(sys.argv[4]) if len(sys.argv) > 4 else default_keyframe_interval
+
+    events = encode_events(clip["weightMat"], deadband, interval)
+    write_event_stream(sys.argv[2], events, clip["facsNames"], clip["exportFps"], interval)
+    error = np.abs(decode_events(events, clip["numPoses"]) - clip["weightMat"]).max()
+    frame_count, target_count = clip["weightMat"].shape
+    print(
+        f"{len(events['targets'])} events for {frame_count} frames × {target_count} targets "
+        f"({len(events['targets']) / (frame_count * target_count):.1%} of updates), "
+        f"max error {error:.4f}"
+    )
@@ -0,0 +1,195 @@
+import argparse
+
+import numpy as np
+
+from a2f_clip import load_clip, save_clip
+from clip_encoder import clip_bytes, encode_clip
+from clip_events import default_deadband, encode_events
+from facs_arkit_shape_keys import audio2faceFacsNames
+
+# Temporal smoothing / jitter filtering of A2F weight tracks.
+# Raw A2F output at 60 fps jitters frame to frame in eye and brow channels, which means needless
+# influence updates and visible twitching. Filters run on whole (frames × channels) matrices,
+# configurable per channel group. Run this before keyframe reduction (clip_events.py,
+# clip_encoder.py), which would otherwise spend events/precision on the jitter.
+# Smoothing alone turns steps into many small moves that each cross the client deadband, so
+# changes smaller than `snap_threshold` are snapped back to the held value afterwards: fewer
+# deadband events than the raw clip, at most `snap_threshold` of error.
+# Usage:
+#   python clip_filters.py clip.json clip-smooth.json
+
+# Filter and parameters per channel group (see `channel_group`). None = no filtering.
+default_filters = {
+    # One-Euro: smooths small jitter, but follows fast blinks/saccades with little lag
+    "eyes": ("one_euro", {"min_cutoff": 2.0, "beta": 0.5, "d_cutoff": 1.0}),
+    "brows": ("savitzky_golay", {"window": 9, "order": 2}),
+    "jaw": ("critically_damped", {"frequency": 12.0}),
+    "mouth": ("savitzky_golay", {"window": 5, "order": 2}),
+}
+# Changes below this are held at the previous value (2 × the deadband of the client)
+snap_threshold = 2.0 * default_deadband
+
+
+def channel_group(name):
+    """Channel group of an ARKit (audio2faceFacsNames) pose: eyes, brows, jaw or mouth."""
+    for prefix, group in (("eye", "eyes"), ("brow", "brows"), ("jaw", "jaw")):
+        if name.startswith(prefix):
+            return group
+    # mouth*, cheek*, nose*, tongue*: lower face
+    return "mouth"
+
+
+def savitzky_golay(values, fps, window=9, order=2):
+    """
+    Savitzky–Golay smoothing along frames (axis 0), for all channels at once.
+    Edges are mirrored, so the first/last frames aren't pulled to zero.
+    """
+    window = max(3, window | 1)  # odd window
+    order = min(order, window - 1)
+    half = window // 2
+    if len(values) < 2:
+        return values.copy()
+    # Least squares fit of a polynomial over the window, row 0 of the pseudo-inverse
+    # gives the smoothing coefficients of the center sample
+    offsets = np.arange(-half, half + 1, dtype=np.float64)
+    coefficients = np.linalg.pinv(np.vander(offsets, order + 1, increasing=True))[0]
+    mode = "reflect" if len(values) > half else "edge"
+    padded = np.pad(values, ((half, half), (0, 0)), mode=mode)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)
+    return np.einsum("fcw,w->fc", windows, coefficients).astype(np.float32)
+
+
+def one_euro(values, fps, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+    """
+    One-Euro filter (Casiez et al. 2012), vectorized over channels: the cutoff frequency rises
+    with the speed of the signal, so slow jitter is smoothed and fast motion has little lag.
+    """
+    def alpha(cutoff):
+        tau = 1.0 / (2.0 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau * fps)
+
+    filtered = np.empty_like(values, dtype=np.float32)
+    if not len(values):
+        return filtered
+    previous = values[0].astype(np.float64)
+    previous_derivative = np.zeros_like(previous)
+    filtered[0] = previous
+    d_alpha = alpha(d_cutoff)
+    for frame_index in range(1, len(values)):
+        derivative = (values[frame_index] - previous) * fps
+        previous_derivative += d_alpha * (derivative - previous_derivative)
+        frame_alpha = alpha(min_cutoff + beta * np.abs(previous_derivative))
+        previous = previous + frame_alpha * (values[frame_index] - previous)
+        filtered[frame_index] = previous
+    return filtered
+
+
+def critically_damped(values, fps, frequency=10.0):
+    """
+    Critically damped spring following the signal, vectorized over channels
+    (exact solution per frame, so it's stable at any fps). Higher frequency = less lag.
+    """
+    filtered = np.empty_like(values, dtype=np.float32)
+    if not len(values):
+        return filtered
+    omega = 2.0 * np.pi * frequency
+    dt = 1.0 / fps
+    decay = np.exp(-omega * dt)
+    position = values[0].astype(np.float64)
+    velocity = np.zeros_like(position)
+    filtered[0] = position
+    for frame_index in range(1, len(values)):
+        target = values[frame_index]
+        offset = position - target
+        temp = (velocity + omega * offset) * dt
+        velocity = (velocity - omega * temp) * decay
+        position = target + (offset + temp) * decay
+        filtered[frame_index] = position
+    return filtered
+
+
+def deadband_hold(values, threshold, lower=None, upper=None):
+    """
+    Hold every channel at its last value until it moves by more than `threshold`, vectorized
+    over channels. Values reaching `lower`/`upper` (per channel) are always taken, so tracks
+    return exactly to rest.
+    """
+    held = np.empty_like(values, dtype=np.float32)
+    if not len(values):
+        return held
+    current = values[0].astype(np.float32)
+    held[0] = current
+    for frame_index in range(1, len(values)):
+        frame = values[frame_index]
+        update = np.abs(frame - current) > threshold
+        if lower is not None:
+            update |= (frame <= lower) | (frame >= upper)
+        current = np.where(update, frame, current)
+        held[frame_index] = current
+    return held
+
+
+filter_functions = {
+    "savitzky_golay": savitzky_golay,
+    "one_euro": one_euro,
+    "critically_damped": critically_damped,
+}
+
+
+def filter_weights(weights, names, fps, filters=None, snap=snap_threshold):
+    """
+    Filter a (F, P) weight matrix, every channel group with its own filter.
+    Results are clamped to the original range of each channel (no negative weights), then
+    changes below `snap` are held (see `deadband_hold`, 0 disables it).
+    """
+    filters = {**default_filters, **(filters or {})}
+    weights = np.asarray(weights, dtype=np.float32)
+    filtered = weights.copy()
+    groups = np.array([channel_group(name) for name in names])
+    for group, config in filters.items():
+        columns = np.flatnonzero(groups == group)
+        if config is None or not len(columns):
+            continue
+        name, parameters = config
+        filtered[:, columns] = filter_functions[name](weights[:, columns], fps, **parameters)
+    if len(weights):
+        lower, upper = weights.min(axis=0), weights.max(axis=0)
+        filtered = np.clip(filtered, lower, upper)
+        if snap:
+            filtered = deadband_hold(filtered, snap, lower, upper)
+    return filtered
+
+
+def jitter(weights):
+    """Mean absolute second difference per channel (frame-to-frame jitter)."""
+    if len(weights) < 3:
+        return np.zeros(weights.shape[1], dtype=np.float32)
+    return np.abs(np.diff(weights, n=2, axis=0)).mean(axis=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smooth A2F weight tracks per channel group.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    args = parser.parse_args()
+
+    clip = load_clip(args.input)
+    if clip["facsNames"] != audio2faceFacsNames:
+        print("WARNING: clip poses differ from audio2faceFacsNames, groups are guessed by name.")
+    weights = clip["weightMat"]
+    filtered = filter_weights(weights, clip["facsNames"], clip["exportFps"])
+    clip["weightMat"] = filtered
+    save_clip(clip, args.output)
+
+    groups = np.array([channel_group(name) for name in clip["facsNames"]])
+    before, after = jitter(weights), jitter(filtered)
+    for group in default_filters:
+        mask = groups == group
+        print(f"- {group}: jitter {before[mask].mean():.5f} -> {after[mask].mean():.5f}")
+    events_before = len(encode_events(weights)["targets"])
+    events_after = len(encode_events(filtered)["targets"])
+    print(f"Deadband events: {events_before} -> {events_after}")
+    size_after = len(clip_bytes(clip, encode_clip(clip)))
+    clip["weightMat"] = weights
+    size_before = len(clip_bytes(clip, encode_clip(clip)))
+    print(f"Encoded clip (.a2fc): {size_before / 1e3:.1f} KB -> {size_after / 1e3:.1f} KB")
@@ -0,0 +1,194 @@
+import argparse
+
+import numpy as np
+
+from a2f_clip import load_clip, save_clip
+from clip_encoder import encode_clip, print_encoding_report, read_clip, write_clip
+from clip_filters import channel_group
+from clip_resample import resample_clip
+from facs_arkit_shape_keys import audio2faceFacsNames
+
+# Seeded procedural idle facial motion: blinks, eye saccades (eyeLook*) and subtle brow motion
+# on the 52 ARKit channels, precomputed into a looping clip, so the face isn't frozen between
+# answers and the client never runs procedural logic per frame.
+# The clip loops seamlessly: blinks don't cross the end, the gaze returns to its first target
+# and brow motion is a sum of sines with whole periods over the clip.
+# It can be blended additively under a speech clip (`blend_idle`), looping as needed.
+# Usage:
+#   python clip_idle.py idle.a2fc [--seconds 60] [--seed 1] [--fps 30]
+#   python clip_idle.py idle.a2fc --merge speech.json speech-idle.json
+# (the idle clip is resampled to the speech clip's frame rate if they differ)
+
+default_fps = 30
+default_seconds = 60.0
+
+# Blinks: log-normal intervals (median ~3.5 s), close fast, open slower, some double blinks
+blink_interval_median = 3.5
+blink_interval_sigma = 0.5
+blink_close_seconds = 0.08
+blink_open_seconds = 0.18
+double_blink_probability = 0.1
+# Saccades: fixation durations, gaze range (ARKit eyeLook weights) and saccade duration
+fixation_seconds = (0.6, 3.0)
+gaze_range = (0.35, 0.2)  # horizontal, vertical
+saccade_seconds = 0.045
+# Brows: amplitude and periods (s) of the slow motion
+brow_amplitude = 0.08
+brow_periods = (9.0, 5.0, 3.0)
+# Idle gain per channel group under speech (speech clips drive the mouth and move the eyes)
+speech_gains = {"eyes": 0.5, "brows": 0.5}
+
+
+def _column(name):
+    return audio2faceFacsNames.index(name)
+
+
+def blink_track(times, duration, rng):
+    """(F,) blink weight: sum of blink shapes, none crossing the loop end."""
+    blink_length = blink_close_seconds + blink_open_seconds
+    count = int(duration / blink_interval_median * 2) + 2
+    intervals = rng.lognormal(np.log(blink_interval_median), blink_interval_sigma, count)
+    starts = np.cumsum(intervals) - intervals[0] * rng.uniform(0.2, 1.0)
+    starts = starts[(starts >= 0.0) & (starts + blink_length < duration)]
+    doubles = starts[rng.random(len(starts)) < double_blink_probability] + blink_length + 0.05
+    starts = np.concatenate([starts, doubles[doubles + blink_length < duration]])
+    # (F, B) time since every blink start
+    local = times[:, None] - starts[None, :]
+    closing = np.clip(local / blink_close_seconds, 0.0, 1.0)
+    opening = np.clip((local - blink_close_seconds) / blink_open_seconds, 0.0, 1.0)
+    opened = opening * opening * (3.0 - 2.0 * opening)
+    shape = np.where(local < blink_close_seconds, closing, 1.0 - opened)
+    shape = np.where((local < 0.0) | (local > blink_length), 0.0, shape)
+    return np.clip(shape.sum(axis=1), 0.0, 1.0)
+
+
+def gaze_track(times, duration, rng):
+    """(F, 2) horizontal/vertical gaze (-1..1 × gaze_range), fixations joined by saccades."""
+    count = int(duration / fixation_seconds[0]) + 2
+    changes = np.cumsum(rng.uniform(*fixation_seconds, count))
+    changes = changes[changes < duration - fixation_seconds[0]]
+    # Mostly small saccades around the center, first target repeated at the end for the loop
+    targets = rng.normal(0.0, 0.4, (len(changes) + 1, 2)).clip(-1.0, 1.0) * gaze_range
+    targets[-1] = targets[0]
+    # Fixation index of every frame, then a smoothstep from the previous target
+    fixation = np.searchsorted(changes, times, side="right")
+    since = times - np.concatenate([[0.0], changes])[fixation]
+    t = np.clip(since / saccade_seconds, 0.0, 1.0)[:, None]
+    t = t * t * (3.0 - 2.0 * t)
+    previous = targets[np.maximum(fixation - 1, 0)]
+    moving = previous + (targets[fixation] - previous) * t
+    return np.where(fixation[:, None] > 0, moving, targets[0])
+
+
+def brow_track(times, duration, rng):
+    """(F, 3) inner/outer-left/outer-right brow raise, periodic over the clip."""
+    motion = np.zeros((len(times), 3))
+    for period in brow_periods:
+        # Whole number of periods over the clip, so the motion loops
+        cycles = max(1, round(duration / period))
+        phases = rng.uniform(0.0, 2.0 * np.pi, 3)
+        amplitudes = rng.uniform(0.3, 1.0, 3) / len(brow_periods)
+        motion += amplitudes * np.sin(2.0 * np.pi * cycles * times[:, None] / duration + phases)
+    # Outer brows follow the inner brow in part
+    motion[:, 1:] = 0.6 * motion[:, 1:] + 0.4 * motion[:, :1]
+    return motion * brow_amplitude
+
+
+def idle_weights(seconds=default_seconds, fps=default_fps, seed=1):
+    """(F, 52) looping idle weights on audio2faceFacsNames."""
+    rng = np.random.default_rng(seed)
+    frame_count = max(1, int(round(seconds * fps)))
+    duration = frame_count / fps
+    times = np.arange(frame_count) / fps
+    weights = np.zeros((frame_count, len(audio2faceFacsNames)), dtype=np.float32)
+
+    blink = blink_track(times, duration, rng)
+    weights[:, _column("eyeBlinkLeft")] = blink
+    weights[:, _column("eyeBlinkRight")] = np.clip(blink * rng.uniform(0.95, 1.0), 0.0, 1.0)
+
+    gaze = gaze_track(times, duration, rng)
+    horizontal, vertical = gaze[:, 0], gaze[:, 1]
+    # Positive horizontal = looking to the avatar's left (left eye out, right eye in)
+    left, right = np.maximum(horizontal, 0.0), np.maximum(-horizontal, 0.0)
+    weights[:, _column("eyeLookOutLeft")] = left
+    weights[:, _column("eyeLookInRight")] = left
+    weights[:, _column("eyeLookInLeft")] = right
+    weights[:, _column("eyeLookOutRight")] = right
+    up, down = np.maximum(vertical, 0.0), np.maximum(-vertical, 0.0)
+    for side in ("Left", "Right"):
+        weights[:, _column(f"eyeLookUp{side}")] = up
+        # Looking down lowers the lids a little
+        weights[:, _column(f"eyeLookDown{side}")] = down
+        weights[:, _column(f"eyeBlink{side}")] = np.maximum(
+            weights[:, _column(f"eyeBlink{side}")], down * 0.3
+        )
+
+    brows = brow_track(times, duration, rng)
+    raise_names = ("browInnerUp", "browOuterUpLeft", "browOuterUpRight")
+    weights[:, [_column(name) for name in raise_names]] = np.maximum(brows, 0.0)
+    down_columns = [_column("browDownLeft"), _column("browDownRight")]
+    weights[:, down_columns] = np.maximum(-brows[:, 1:] * 0.5, 0.0)
+    return np.clip(weights, 0.0, 1.0)
+
+
+def idle_clip(seconds=default_seconds, fps=default_fps, seed=1):
+    weights = idle_weights(seconds, fps, seed)
+    return {
+        "exportFps": fps,
+        "trackPath": "",
+        "numPoses": len(audio2faceFacsNames),
+        "numFrames": len(weights),
+        "facsNames": list(audio2faceFacsNames),
+        "weightMat": weights,
+        "joints": [],
+        "rotations": np.zeros((len(weights), 0, 4), dtype=np.float32),
+        "translations": np.zeros((len(weights), 0, 3), dtype=np.float32),
+    }
+
+
+def blend_idle(speech_weights, speech_names, idle, start_frame=0):
+    """
+    Add a looping idle clip (same fps, see clip_resample.py) under speech weights,
+    idle frame `start_frame` at the first speech frame.
+
+    Returns:
+        np.ndarray: (F, P) speech + idle weights, clamped to [0, 1].
+    """
+    frames = (start_frame + np.arange(len(speech_weights))) % idle["numFrames"]
+    result = np.asarray(speech_weights, dtype=np.float32).copy()
+    for column, name in enumerate(speech_names):
+        if name not in idle["facsNames"]:
+            continue
+        gain = speech_gains.get(channel_group(name), 0.0)
+        result[:, column] += gain * idle["weightMat"][frames, idle["facsNames"].index(name)]
+    return np.clip(result, 0.0, 1.0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a looping idle facial motion clip.")
+    parser.add_argument("output", help="Idle clip (.a2fc)")
+    parser.add_argument("--seconds", type=float, default=default_seconds)
+    parser.add_argument("--fps", type=int, default=default_fps)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--merge", nargs=2, metavar=("SPEECH", "OUTPUT"))
+    args = parser.parse_args()
+
+    if args.merge:
+        idle = read_clip(args.output)
+        speech = load_clip(args.merge[0])
+        if speech["exportFps"] != idle["exportFps"]:
+            # Default idle clips are 30 fps, A2F speech exports 60 fps
+            idle = resample_clip(idle, speech["exportFps"])
+        speech["weightMat"] = blend_idle(speech["weightMat"], speech["facsNames"], idle)
+        save_clip(speech, args.merge[1])
+        print(f"Idle motion added under {speech['numFrames']} speech frames -> {args.merge[1]}")
+    else:
+        clip = idle_clip(args.seconds, args.fps, args.seed)
+        encoded = encode_clip(clip)
+        write_clip(args.output, clip, encoded)
+        weights = clip["weightMat"]
+        closed = (weights[:, _column("eyeBlinkLeft")] > 0.5).astype(int)
+        blinks = np.count_nonzero(np.diff(closed) == 1)
+        print(f"{clip['numFrames']} frames, seed {args.seed}: {blinks} blinks")
+        print_encoding_report(encoded, args.output)
+        print(f"Loop seam: max weight jump {np.abs(weights[0] - weights[-1]).max():.4f}")
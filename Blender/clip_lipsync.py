@@ -0,0 +1,210 @@
+import argparse
+import os
+import time
+import wave
+
+import numpy as np
+
+from a2f_clip import save_clip
+from clip_filters import filter_weights
+from facs_arkit_shape_keys import audio2faceFacsNames, visemeNames
+
+# Offline lip-sync fallback from audio energy, when A2F isn't available.
+# Reads a WAV file in chunks, computes short-time energy and band energies with a vectorized
+# NumPy STFT (one window per clip frame) and maps them to jawOpen, mouthClose, mouthFunnel and
+# the viseme_* targets. Only the per-frame features are kept in memory, not the audio.
+# Writes a standard A2F clip (52 ARKit poses + visemes, no joints), so the client plays it
+# like any A2F export.
+# Energy features can't tell consonant places apart: TH, DD, kk, nn and RR stay 0.
+# Usage:
+#   python clip_lipsync.py answer.wav answer-lipsync.json [--fps 60]
+
+default_fps = 60
+# Samples read per chunk (per channel)
+chunk_samples = 1 << 20
+# Window length in seconds (rounded up to a power of two samples)
+window_seconds = 0.032
+# Frequency bands (Hz): voicing/low formants, open vowel formants, front vowels, sibilants
+bands = {"low": (80, 500), "mid": (500, 2000), "high": (2000, 4000), "sibilant": (4000, 10000)}
+# Percentiles of frame energy (dB) mapped to loudness 0 and 1
+noise_percentile = 10
+peak_percentile = 98
+# Closures (mouthClose, viseme_PP) only count this close to speech (seconds)
+speech_context_seconds = 0.15
+
+clip_names = audio2faceFacsNames + visemeNames
+
+
+def read_wav_chunks(path, frames_per_chunk=chunk_samples):
+    """
+    Yield (sample rate, mono float32 samples in [-1, 1]) chunks of a PCM WAV file.
+    """
+    with wave.open(path, "rb") as file:
+        sample_rate = file.getframerate()
+        channels = file.getnchannels()
+        width = file.getsampwidth()
+        while True:
+            data = file.readframes(frames_per_chunk)
+            if not data:
+                return
+            if width == 1:
+                samples = (np.frombuffer(data, np.uint8).astype(np.float32) - 128.0) / 128.0
+            elif width == 3:
+                raw = np.frombuffer(data, np.uint8).reshape(-1, 3).astype(np.int32)
+                values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+                values = np.where(values >= 1 << 23, values - (1 << 24), values)
+                samples = values.astype(np.float32) / float(1 << 23)
+            else:
+                samples = np.frombuffer(data, {2: "<i2", 4: "<i4"}[width]).astype(np.float32)
+                samples /= float(1 << (8 * width - 1))
+            yield sample_rate, samples.reshape(-1, channels).mean(axis=1)
+
+
+def audio_features(chunks, fps=default_fps):
+    """
+    Per-frame features of streamed audio, one STFT window centered on every clip frame.
+
+    Args:
+        chunks: Iterable of (sample rate, mono samples), see `read_wav_chunks`.
+        fps (float): Clip frame rate.
+
+    Returns:
+        dict: decibels (F,) frame energy, and (F,) energy fraction of every band in `bands`.
+    """
+    features = []
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = 0  # Position of buffer[0] in the stream padded with half a window
+    frame_index = 0
+    total_samples = 0
+    window = None
+
+    def take_frames(stop_sample):
+        """STFT features of all frames whose window ends before `stop_sample`."""
+        nonlocal frame_index
+        # Window starts of frames k, k+1, ... (in the padded stream)
+        starts = np.rint(np.arange(frame_index, frame_index + len(buffer) // hop + 2) * hop)
+        starts = starts[starts + window_length <= stop_sample].astype(np.int64)
+        if not len(starts):
+            return
+        indices = (starts - buffer_start)[:, None] + np.arange(window_length)
+        spectrum = np.abs(np.fft.rfft(buffer[indices] * window, axis=1)) ** 2
+        energy = spectrum.sum(axis=1) + 1e-12
+        frame_features = [10.0 * np.log10(energy / window_length)]
+        for low, high in bands.values():
+            mask = (frequencies >= low) & (frequencies < high)
+            frame_features.append(spectrum[:, mask].sum(axis=1) / energy)
+        features.append(np.stack(frame_features, axis=1).astype(np.float32))
+        frame_index += len(starts)
+
+    for sample_rate, samples in chunks:
+        if window is None:
+            hop = sample_rate / fps
+            window_length = 1 << int(np.ceil(np.log2(sample_rate * window_seconds)))
+            window = np.hanning(window_length).astype(np.float32)
+            frequencies = np.fft.rfftfreq(window_length, 1.0 / sample_rate)
+            buffer = np.zeros(window_length // 2, dtype=np.float32)
+        total_samples += len(samples)
+        buffer = np.concatenate([buffer, samples])
+        take_frames(buffer_start + len(buffer))
+        # Drop samples no later window needs
+        drop = max(0, int(np.rint(frame_index * hop)) - buffer_start)
+        buffer = buffer[drop:]
+        buffer_start += drop
+
+    if window is not None:
+        frame_count = int(np.ceil(total_samples * fps / sample_rate))
+        # Pad the end, so the windows of the last frames are complete
+        padding = np.zeros(window_length + int(np.ceil(hop)), dtype=np.float32)
+        buffer = np.concatenate([buffer, padding])
+        take_frames(buffer_start + len(buffer))
+        features = [np.concatenate(features)[:frame_count]] if features else []
+    stacked = np.concatenate(features) if features else np.zeros((0, 1 + len(bands)), np.float32)
+    result = {"decibels": stacked[:, 0]}
+    for index, band in enumerate(bands):
+        result[band] = stacked[:, index + 1]
+    return result
+
+
+def _moving_max(values, size):
+    if not len(values) or size <= 1:
+        return values
+    padded = np.pad(values, (size // 2, size - 1 - size // 2), mode="edge")
+    return np.lib.stride_tricks.sliding_window_view(padded, size).max(axis=1)
+
+
+def features_to_weights(features, fps=default_fps):
+    """(F, len(clip_names)) weights from audio features, all frames at once."""
+    decibels = features["decibels"]
+    frame_count = len(decibels)
+    weights = np.zeros((frame_count, len(clip_names)), dtype=np.float32)
+    if not frame_count:
+        return weights
+    column = {name: index for index, name in enumerate(clip_names)}
+
+    noise, peak = np.percentile(decibels, [noise_percentile, peak_percentile])
+    loudness = np.clip((decibels - noise) / max(peak - noise, 1e-6), 0.0, 1.0)
+    activity = np.clip((loudness - 0.1) / 0.2, 0.0, 1.0)
+    context = _moving_max(activity, int(round(speech_context_seconds * fps)) * 2 + 1)
+    low, mid = features["low"], features["mid"]
+    high, sibilant = features["high"], features["sibilant"]
+    voiced = low + mid
+    closure = np.clip(context - loudness * 2.0, 0.0, 1.0) * context
+    rounded = np.clip((low - mid) * 2.0, 0.0, 1.0)
+
+    weights[:, column["jawOpen"]] = 0.7 * loudness * voiced
+    weights[:, column["mouthClose"]] = 0.6 * closure
+    weights[:, column["mouthFunnel"]] = 0.6 * loudness * rounded
+
+    visemes = {
+        "viseme_sil": 1.0 - context,
+        "viseme_PP": closure,
+        "viseme_aa": loudness * np.clip(mid * 1.5, 0.0, 1.0),
+        "viseme_O": loudness * rounded * (1.0 - rounded),
+        "viseme_U": loudness * rounded * rounded,
+        "viseme_E": loudness * np.clip(high * 2.0, 0.0, 1.0),
+        "viseme_I": loudness * np.clip(high * 2.0, 0.0, 1.0) * (1.0 - mid),
+        "viseme_SS": activity * sibilant,
+        "viseme_CH": activity * sibilant * high,
+        "viseme_FF": context * sibilant * (1.0 - loudness),
+    }
+    viseme_columns = [column[name] for name in visemes]
+    weights[:, viseme_columns] = np.stack(list(visemes.values()), axis=1)
+    # Visemes are alternatives, keep their sum <= 1
+    visemes_all = [column[name] for name in visemeNames]
+    total = weights[:, visemes_all].sum(axis=1, keepdims=True)
+    weights[:, visemes_all] /= np.maximum(total, 1.0)
+    return filter_weights(np.clip(weights, 0.0, 1.0), clip_names, fps)
+
+
+def lipsync_clip(wav_path, fps=default_fps):
+    """A2F clip (see a2f_clip.load_clip) generated from a WAV file."""
+    weights = features_to_weights(audio_features(read_wav_chunks(wav_path), fps), fps)
+    return {
+        "exportFps": fps,
+        "trackPath": os.path.abspath(wav_path),
+        "numPoses": len(clip_names),
+        "numFrames": len(weights),
+        "facsNames": clip_names,
+        "weightMat": weights,
+        "joints": [],
+        "rotations": np.zeros((0, 0, 4), dtype=np.float32),
+        "translations": np.zeros((0, 0, 3), dtype=np.float32),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a lip-sync clip from a WAV file.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--fps", type=int, default=default_fps)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    clip = lipsync_clip(args.input, args.fps)
+    elapsed = time.perf_counter() - start
+    save_clip(clip, args.output)
+    duration = clip["numFrames"] / args.fps
+    print(
+        f"{duration:.1f} s of audio -> {clip['numFrames']} frames in {elapsed:.2f} s "
+        f"({duration / max(elapsed, 1e-9):.0f}× real time)"
+    )
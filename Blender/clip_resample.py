@@ -0,0 +1,142 @@
+import argparse
+import os
+
+import numpy as np
+
+from a2f_clip import load_clip, load_emotion_keys, save_clip, save_emotion_keys
+
+# Frame rate resampling of A2F clips.
+# Exports come at 60 fps, low-end clients render at 30 and some pipelines need 24/25 fps.
+# Resampled clips play frame by frame at the render rate, so the client needs no index mapping
+# (and 30 fps clips are half the size). Every frame of the new clip samples the source at the
+# same time, so the clip stays aligned with its audio (trackPath) and its emotion keys.
+# Usage:
+#   python clip_resample.py clip.json clip-30.json --fps 30 [--cubic] [--nlerp] \
+#       [--emotion emotionkey.json emotionkey-30.json]
+
+
+def sample_positions(frame_count, fps, target_fps):
+    """Source frame positions (fractional) of every frame at the target fps, same duration."""
+    target_count = max(1, int(round(frame_count * target_fps / fps))) if frame_count else 0
+    positions = np.arange(target_count, dtype=np.float64) * (fps / target_fps)
+    return np.minimum(positions, max(frame_count - 1, 0))
+
+
+def _split(positions, frame_count):
+    lower = np.floor(positions).astype(np.int64)
+    lower = np.minimum(lower, max(frame_count - 2, 0))
+    upper = np.minimum(lower + 1, frame_count - 1)
+    return lower, upper, (positions - lower)[:, None]
+
+
+def interpolate_linear(values, positions):
+    """Linear interpolation of (F, C) values at fractional frame positions (all channels)."""
+    lower, upper, t = _split(positions, len(values))
+    return ((1.0 - t) * values[lower] + t * values[upper]).astype(np.float32)
+
+
+def interpolate_cubic(values, positions):
+    """Catmull-Rom interpolation of (F, C) values (passes through every source frame)."""
+    frame_count = len(values)
+    lower, upper, t = _split(positions, frame_count)
+    before = values[np.maximum(lower - 1, 0)]
+    after = values[np.minimum(upper + 1, frame_count - 1)]
+    p1, p2 = values[lower], values[upper]
+    t2, t3 = t * t, t * t * t
+    result = 0.5 * (
+        2.0 * p1
+        + (p2 - before) * t
+        + (2.0 * before - 5.0 * p1 + 4.0 * p2 - after) * t2
+        + (3.0 * p1 - before - 3.0 * p2 + after) * t3
+    )
+    return result.astype(np.float32)
+
+
+def interpolate_rotations(rotations, positions, nlerp=False):
+    """
+    Slerp (or nlerp) of (F, J, 4) quaternions at fractional frame positions,
+    vectorized over frames and joints. Takes the shortest path.
+    """
+    lower, upper, t = _split(positions, len(rotations))
+    q1 = rotations[lower].astype(np.float64)
+    q2 = rotations[upper].astype(np.float64)
+    dot = np.sum(q1 * q2, axis=-1, keepdims=True)
+    q2 = np.where(dot < 0.0, -q2, q2)
+    dot = np.abs(dot)
+    t = t[:, :, None] if q1.ndim == 3 else t
+    if nlerp:
+        result = (1.0 - t) * q1 + t * q2
+    else:
+        angle = np.arccos(np.clip(dot, -1.0, 1.0))
+        sin_angle = np.sin(angle)
+        # Nearly identical quaternions: fall back to lerp (avoids dividing by ~0)
+        small = sin_angle < 1e-6
+        safe_sin = np.where(small, 1.0, sin_angle)
+        w1 = np.where(small, 1.0 - t, np.sin((1.0 - t) * angle) / safe_sin)
+        w2 = np.where(small, t, np.sin(t * angle) / safe_sin)
+        result = w1 * q1 + w2 * q2
+    result /= np.maximum(np.linalg.norm(result, axis=-1, keepdims=True), 1e-12)
+    return result.astype(np.float32)
+
+
+def resample_clip(clip, target_fps, cubic=False, nlerp=False):
+    """
+    Resample a clip (see a2f_clip.load_clip) to `target_fps`.
+    Returns a new clip, exportFps and numFrames updated.
+    """
+    fps = clip["exportFps"]
+    weights = clip["weightMat"]
+    positions = sample_positions(len(weights), fps, target_fps)
+    resampled = dict(clip)
+    interpolate = interpolate_cubic if cubic else interpolate_linear
+    resampled["weightMat"] = interpolate(weights, positions)
+    if cubic and len(weights):
+        # Catmull-Rom overshoots, keep every channel in its source range
+        resampled["weightMat"] = np.clip(
+            resampled["weightMat"], weights.min(axis=0), weights.max(axis=0)
+        )
+    if len(clip["rotations"]):
+        resampled["rotations"] = interpolate_rotations(clip["rotations"], positions, nlerp)
+        translations = clip["translations"]
+        flat = translations.reshape(len(translations), -1)
+        resampled["translations"] = interpolate(flat, positions).reshape(
+            len(positions), *translations.shape[1:]
+        )
+    resampled["exportFps"] = target_fps
+    resampled["numFrames"] = len(positions)
+    return resampled
+
+
+def resample_emotion_keys(emotion, target_fps):
+    """Move emotion keys to the frames at `target_fps` with the same time."""
+    ratio = target_fps / emotion["exportFps"]
+    resampled = dict(emotion)
+    resampled["emotionFrames"] = emotion["emotionFrames"] * ratio
+    resampled["numFrames"] = max(1, int(round(emotion["numFrames"] * ratio)))
+    resampled["exportFps"] = target_fps
+    return resampled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resample an A2F clip to another frame rate.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--fps", type=float, required=True)
+    parser.add_argument("--cubic", action="store_true", help="Catmull-Rom instead of linear")
+    parser.add_argument("--nlerp", action="store_true", help="nlerp instead of slerp")
+    parser.add_argument("--emotion", nargs=2, metavar=("INPUT", "OUTPUT"))
+    args = parser.parse_args()
+
+    target_fps = int(args.fps) if args.fps.is_integer() else args.fps
+    clip = load_clip(args.input)
+    resampled = resample_clip(clip, target_fps, args.cubic, args.nlerp)
+    save_clip(resampled, args.output)
+    input_size, output_size = os.path.getsize(args.input), os.path.getsize(args.output)
+    print(
+        f"{clip['numFrames']} frames at {clip['exportFps']} fps -> "
+        f"{resampled['numFrames']} frames at {target_fps} fps "
+        f"({input_size / 1e3:.1f} KB -> {output_size / 1e3:.1f} KB)"
+    )
+    if args.emotion:
+        emotion = resample_emotion_keys(load_emotion_keys(args.emotion[0]), target_fps)
+        save_emotion_keys(emotion, args.emotion[1])
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+
+from a2f_clip import emotion_weights, load_clip, load_emotion_keys
+from clip_encoder import read_clip
+from facs_arkit_shape_keys import (
+    a2fBlendshapesToShapeKeys,
+    a2fEmotionNamesToShapeKeys,
+    audio2faceFacsNames,
+    visemeNames,
+    visemeNamesToShapeKeys,
+)
+
+# Scan the processed clip library for the targets our content actually drives, and write
+# a keep-list of shape keys for the pruning step (usage_keep_list in remove_unused_shapekeys.py).
+# Per target (ARKit pose, viseme or emotion): max activation and a percentile, from a
+# histogram accumulated over all weight matrices (one bincount per clip).
+# A target is used if it reaches `minimum_max_activation` (and `minimum_percentile_activation`
+# at `activation_percentile`); its shape keys (ARKit name and the keys mapped by
+# a2fBlendshapesToShapeKeys, a2fEmotionNamesToShapeKeys, visemeNamesToShapeKeys) are kept.
+# The ARKit shape keys (audio2faceFacsNames) and the Daz keys they're mapped from are always
+# kept: reorder_arkit_shapekeys.py renames the Daz keys and gives them fixed indices the client
+# relies on, and pruning may run before it (export_avatar.py prunes first).
+# Other keys clips can drive (allMorphTargets of src/audio2face.ts, visemes, Daz keys mapped by
+# the tables) are listed for pruning if not kept.
+# Keys no clip drives (body morphs, correctives, hands) are never listed.
+# Library: .a2fc clips, a2f_export_bsweight-*.json and a2f_export_emotionkey-*.json /
+# *-emotion.json files, in all subdirectories.
+# Usage:
+#   python clip_usage.py library_dir keep_list.json [--percentile 99]
+
+# Never pruned: body, corrective, hand and head_bs (asymmetry) keys
+PROTECTED_KEY_PATTERN = re.compile(r"cbs|body|hand|head_bs", re.IGNORECASE)
+
+minimum_max_activation = 0.05
+minimum_percentile_activation = 0.0
+activation_percentile = 99.0
+histogram_bins = 1000
+client_targets_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "src", "audio2face.ts"
+)
+
+
+def client_morph_targets(path=client_targets_path):
+    """Names in allMorphTargets of the client (empty if the file isn't there)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as file:
+        match = re.search(r"allMorphTargets\s*=\s*\[(.*?)\]", file.read(), re.S)
+    return re.findall(r"'([^']+)'", match.group(1)) if match else []
+
+
+def library_files(library_dir):
+    """Clip and emotion key files of the library, sorted: (clips, emotions)."""
+    clips, emotions = [], []
+    for root, _, files in os.walk(library_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(".a2fc") or name.startswith("a2f_export_bsweight-"):
+                clips.append(path)
+            elif name.startswith("a2f_export_emotionkey-") or name.endswith("-emotion.json"):
+                emotions.append(path)
+    return sorted(clips), sorted(emotions)
+
+
+class UsageHistogram:
+    """Per-target activation histogram over [0, 1] and exact max, accumulated per matrix."""
+
+    def __init__(self, bins=histogram_bins):
+        self.bins = bins
+        self.names = []
+        self._rows = {}
+        self.counts = np.zeros((0, bins), dtype=np.int64)
+        self.maxima = np.zeros(0)
+
+    def add(self, weights, names):
+        """Add a (F, P) weight matrix with column names."""
+        weights = np.asarray(weights, dtype=np.float32)
+        for name in names:
+            if name not in self._rows:
+                self._rows[name] = len(self.names)
+                self.names.append(name)
+        missing = len(self.names) - len(self.maxima)
+        if missing:
+            self.counts = np.vstack([self.counts, np.zeros((missing, self.bins), np.int64)])
+            self.maxima = np.append(self.maxima, np.full(missing, -np.inf))
+        if not weights.size:
+            return
+        rows = np.array([self._rows[name] for name in names])
+        bins = np.clip((weights * self.bins).astype(np.int64), 0, self.bins - 1)
+        cells = rows[None, :] * self.bins + bins
+        self.counts += np.bincount(cells.ravel(), minlength=self.counts.size).reshape(
+            self.counts.shape
+        )
+        np.maximum.at(self.maxima, rows, weights.max(axis=0))
+
+    def percentiles(self, percentile):
+        """(T,) activation at `percentile` (upper edge of the histogram bin, at most the max)."""
+        cumulative = np.cumsum(self.counts, axis=1)
+        totals = cumulative[:, -1:]
+        bins = (cumulative < totals * percentile / 100.0).sum(axis=1)
+        return np.minimum(np.minimum(bins + 1, self.bins) / self.bins, self.maxima)
+
+    def stats(self, percentile=activation_percentile):
+        frames = self.counts.sum(axis=1)
+        values = self.percentiles(percentile)
+        return {
+            name: {
+                "max": float(self.maxima[row]),
+                "percentile": float(values[row]),
+                "frames": int(frames[row]),
+            }
+            for row, name in enumerate(self.names)
+        }
+
+
+def scan_library(library_dir, percentile=activation_percentile):
+    """
+    Activation stats of every target driven by the library.
+
+    Returns:
+        dict: target name -> max, percentile (activation at `percentile`), frames.
+    """
+    histogram = UsageHistogram()
+    clip_paths, emotion_paths = library_files(library_dir)
+    for path in clip_paths:
+        clip = read_clip(path) if path.endswith(".a2fc") else load_clip(path)
+        histogram.add(clip["weightMat"], clip["facsNames"])
+    for path in emotion_paths:
+        emotion = load_emotion_keys(path)
+        histogram.add(emotion_weights(emotion), emotion["emotionNames"])
+    print(f"Scanned {len(clip_paths)} clips and {len(emotion_paths)} emotion key files")
+    return histogram.stats(percentile)
+
+
+def keep_list(stats):
+    """
+    Shape keys to keep and animation targets to prune.
+
+    Returns:
+        tuple[list[str], list[str], list[str]]: used targets, shape keys to keep and
+            shape keys to prune (sorted).
+    """
+    used = sorted(
+        name
+        for name, stat in stats.items()
+        if stat["max"] >= minimum_max_activation
+        and stat["percentile"] >= minimum_percentile_activation
+    )
+    mappings = {
+        **a2fBlendshapesToShapeKeys,
+        **visemeNamesToShapeKeys,
+        **a2fEmotionNamesToShapeKeys,
+    }
+    # ARKit keys and their Daz source keys: pruning may run before the reorder renames them
+    keep = set(used) | set(audio2faceFacsNames)
+    keep.update(mappings[name] for name in used if mappings.get(name))
+    keep.update(
+        a2fBlendshapesToShapeKeys[name]
+        for name in audio2faceFacsNames
+        if a2fBlendshapesToShapeKeys.get(name)
+    )
+
+    # Keys clips can drive
+    candidates = set(client_morph_targets()) | set(audio2faceFacsNames) | set(visemeNames)
+    candidates.update(key for key in mappings.values() if key)
+    # Emotion names aren't shape keys, only their mapped keys are
+    candidates -= set(a2fEmotionNamesToShapeKeys)
+    keep &= candidates
+    prune = sorted(candidates - keep)
+    protected = [name for name in prune if PROTECTED_KEY_PATTERN.search(name)]
+    if protected:
+        raise ValueError(f"Body, corrective or hand keys in the prune list: {protected}")
+    return used, sorted(keep), prune
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep-list of shape keys used by clips.")
+    parser.add_argument("library_dir")
+    parser.add_argument("output", help="Keep-list (.json)")
+    parser.add_argument("--percentile", type=float, default=activation_percentile)
+    args = parser.parse_args()
+
+    stats = scan_library(args.library_dir, args.percentile)
+    used, keep, prune = keep_list(stats)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(
+            {"percentile": args.percentile, "keep": keep, "prune": prune, "targets": stats},
+            file,
+            indent=2,
+        )
+
+    print(f"{len(used)} of {len(stats)} targets used (max >= {minimum_max_activation}):")
+    for name, stat in sorted(stats.items(), key=lambda item: -item[1]["max"]):
+        flag = "" if name in used else "  UNUSED"
+        print(
+            f"- {name}: max {stat['max']:.3f}, "
+            f"p{args.percentile:g} {stat['percentile']:.3f}{flag}"
+        )
+    print(f"Keep {len(keep)} shape keys, prune {len(prune)} -> {args.output}")
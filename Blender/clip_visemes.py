@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from clip_encoder import encode_clip, write_clip
+from facs_arkit_shape_keys import visemeNames
+
+# Compile phoneme (or viseme) timings of TTS engines into dense viseme tracks, written as
+# binary clips (clip_encoder.py), so TTS answers can skip A2F.
+# Coarticulation: every phoneme has a dominance over time (Cohen-Massaro), 1 during the
+# phoneme and falling off exponentially outside of it; the weight of a viseme at a frame is
+# the dominance of its phonemes divided by the total dominance of the neighbouring phonemes.
+# Lip closures (PP, FF) fall off faster than vowels, so they're reached even in fast speech.
+# Many utterances are compiled in one vectorized pass (frames × neighbouring phonemes).
+# Timing files:
+#   JSON: [{"phoneme": "HH", "start": 0.0, "end": 0.08}, ...] ("viseme" instead of
+#         "phoneme" with Oculus names, "time" instead of "start" with end = next start)
+#   text: one "start end phoneme" or "start phoneme" per line (seconds)
+# Usage:
+#   python clip_visemes.py output_dir timings1.json timings2.txt ... [--fps 60] \
+#       [--audio answer1.wav answer2.wav ...]
+# trackPath of every clip is its audio track as given with --audio (relative paths stay
+# relative), or empty.
+
+default_fps = 60
+# Phonemes before and after each frame taking part in the coarticulation
+neighbour_phonemes = 3
+# Dominance fall-off rate (1/s) outside the phoneme by viseme, default for the others
+dominance_rates = {"viseme_PP": 60.0, "viseme_FF": 45.0, "viseme_sil": 25.0}
+default_dominance_rate = 30.0
+
+# ARPAbet (CMU, stress digits removed) and common IPA phonemes of every Oculus viseme
+viseme_phonemes = {
+    "viseme_sil": ["sil", "sp", "pau", ""],
+    "viseme_PP": ["P", "B", "M", "p", "b", "m"],
+    "viseme_FF": ["F", "V", "f", "v"],
+    "viseme_TH": ["TH", "DH", "θ", "ð"],
+    "viseme_DD": ["T", "D", "t", "d"],
+    "viseme_kk": ["K", "G", "NG", "k", "g", "ŋ"],
+    "viseme_CH": ["CH", "JH", "SH", "ZH", "tʃ", "dʒ", "ʃ", "ʒ"],
+    "viseme_SS": ["S", "Z", "s", "z"],
+    "viseme_nn": ["N", "L", "n", "l"],
+    "viseme_RR": ["R", "ER", "r", "ɹ", "ɚ", "ɝ"],
+    "viseme_aa": ["AA", "AE", "AH", "AY", "HH", "a", "ɑ", "æ", "ʌ", "ə", "h"],
+    "viseme_E": ["EH", "EY", "e", "ɛ"],
+    "viseme_I": ["IH", "IY", "Y", "i", "ɪ", "j"],
+    "viseme_O": ["AO", "OW", "OY", "AW", "o", "ɔ"],
+    "viseme_U": ["UH", "UW", "W", "u", "ʊ", "w"],
+}
+phoneme_visemes = {
+    phoneme: viseme for viseme, phonemes in viseme_phonemes.items() for phoneme in phonemes
+}
+
+
+def phoneme_viseme(phoneme):
+    """Oculus viseme of a phoneme (viseme names pass through), viseme_sil if unknown."""
+    if phoneme in visemeNames:
+        return phoneme
+    # Stress digits (ARPAbet), stress and length marks (IPA)
+    phoneme = phoneme.strip().strip("012ˈˌː")
+    return phoneme_visemes.get(phoneme, phoneme_visemes.get(phoneme.upper(), "viseme_sil"))
+
+
+def load_timings(path):
+    """
+    Read a timing file.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (N,) start and end times (s), and
+            viseme indices (into visemeNames).
+    """
+    entries = []
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        for entry in data:
+            label = entry.get("phoneme", entry.get("viseme", ""))
+            start = entry.get("start", entry.get("time"))
+            entries.append((float(start), entry.get("end"), label))
+    else:
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                fields = line.split()
+                if not fields or fields[0].startswith("#"):
+                    continue
+                if len(fields) >= 3:
+                    entries.append((float(fields[0]), float(fields[1]), fields[2]))
+                else:
+                    entries.append((float(fields[0]), None, fields[1] if len(fields) > 1 else ""))
+
+    entries.sort(key=lambda entry: entry[0])
+    starts = np.array([entry[0] for entry in entries], dtype=np.float64)
+    # Missing ends: the next phoneme's start (the last one lasts 0.1 s)
+    next_starts = np.append(starts[1:], starts[-1] + 0.1 if len(starts) else 0.0)
+    ends = [start if end is None else end for (_, end, _), start in zip(entries, next_starts)]
+    ends = np.array(ends, dtype=np.float64)
+    visemes = [visemeNames.index(phoneme_viseme(entry[2])) for entry in entries]
+    visemes = np.array(visemes, dtype=np.int64)
+    return starts, np.maximum(ends, starts), visemes
+
+
+def compile_visemes(utterances, fps=default_fps):
+    """
+    Dense viseme weights of many utterances at once.
+
+    Args:
+        utterances (list[tuple]): (starts, ends, visemes) of every utterance, see `load_timings`.
+        fps (float): Frame rate of the tracks.
+
+    Returns:
+        list[np.ndarray]: (F, len(visemeNames)) weights of every utterance.
+    """
+    rates = np.array(
+        [dominance_rates.get(name, default_dominance_rate) for name in visemeNames], np.float64
+    )
+    # All utterances on one timeline, each shifted to start after the previous one, with
+    # phoneme and frame ids of its own utterance
+    frame_counts = [int(np.ceil(ends.max(initial=0.0) * fps)) + 1 for _, ends, _ in utterances]
+    frame_offsets = np.concatenate([[0], np.cumsum(frame_counts)])
+    phoneme_counts = [len(starts) for starts, _, _ in utterances]
+    phoneme_offsets = np.concatenate([[0], np.cumsum(phoneme_counts)])
+    if not phoneme_offsets[-1]:
+        return [np.zeros((count, len(visemeNames)), np.float32) for count in frame_counts]
+    shifts = frame_offsets[:-1] / fps
+    starts = np.concatenate([u[0] + shift for u, shift in zip(utterances, shifts)])
+    ends = np.concatenate([u[1] + shift for u, shift in zip(utterances, shifts)])
+    visemes = np.concatenate([u[2] for u in utterances])
+    phoneme_utterance = np.repeat(np.arange(len(utterances)), phoneme_counts)
+    frame_utterance = np.repeat(np.arange(len(utterances)), frame_counts)
+    times = np.arange(frame_offsets[-1], dtype=np.float64) / fps
+
+    # Neighbouring phonemes of every frame: (F, 2K + 1) phoneme indices
+    current = np.searchsorted(starts, times, side="right") - 1
+    neighbours = current[:, None] + np.arange(-neighbour_phonemes, neighbour_phonemes + 1)
+    valid = (neighbours >= 0) & (neighbours < len(starts))
+    neighbours = np.clip(neighbours, 0, len(starts) - 1)
+    valid &= phoneme_utterance[neighbours] == frame_utterance[:, None]
+
+    # Dominance: 1 inside the phoneme, exp(-rate × distance) outside
+    distance = np.maximum(starts[neighbours] - times[:, None], 0.0) + np.maximum(
+        times[:, None] - ends[neighbours], 0.0
+    )
+    neighbour_visemes = visemes[neighbours]
+    dominance = np.where(valid, np.exp(-rates[neighbour_visemes] * distance), 0.0)
+
+    # Sum the dominance of every viseme per frame
+    viseme_count = len(visemeNames)
+    cells = np.arange(len(times))[:, None] * viseme_count + neighbour_visemes
+    weights = np.bincount(cells.ravel(), dominance.ravel(), len(times) * viseme_count)
+    weights = weights.reshape(len(times), viseme_count)
+    total = weights.sum(axis=1, keepdims=True)
+    silent = total[:, 0] < 1e-6
+    weights = np.where(total > 1e-6, weights / np.maximum(total, 1e-12), 0.0)
+    weights[silent, visemeNames.index("viseme_sil")] = 1.0
+    weights = weights.astype(np.float32)
+    return [weights[frame_offsets[i]:frame_offsets[i + 1]] for i in range(len(utterances))]
+
+
+def viseme_clip(weights, fps, track_path=""):
+    """A2F clip (see a2f_clip.load_clip) driving only the viseme targets."""
+    return {
+        "exportFps": fps,
+        "trackPath": track_path,
+        "numPoses": len(visemeNames),
+        "numFrames": len(weights),
+        "facsNames": list(visemeNames),
+        "weightMat": weights,
+        "joints": [],
+        "rotations": np.zeros((len(weights), 0, 4), dtype=np.float32),
+        "translations": np.zeros((len(weights), 0, 3), dtype=np.float32),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile phoneme timings into viseme clips.")
+    parser.add_argument("output_dir")
+    parser.add_argument("timings", nargs="+")
+    parser.add_argument("--fps", type=int, default=default_fps)
+    parser.add_argument("--audio", nargs="+", help="Audio track of every timing file")
+    args = parser.parse_args()
+    if args.audio and len(args.audio) != len(args.timings):
+        parser.error("--audio needs one audio track per timing file")
+    audio_paths = args.audio or [""] * len(args.timings)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    utterances = [load_timings(path) for path in args.timings]
+    total_size = 0
+    total_frames = 0
+    weights_list = compile_visemes(utterances, args.fps)
+    for path, audio_path, weights in zip(args.timings, audio_paths, weights_list):
+        clip = viseme_clip(weights, args.fps, audio_path)
+        name = os.path.splitext(os.path.basename(path))[0] + ".a2fc"
+        output_path = os.path.join(args.output_dir, name)
+        write_clip(output_path, clip, encode_clip(clip))
+        total_size += os.path.getsize(output_path)
+        total_frames += len(weights)
+    print(
+        f"{len(utterances)} utterances, {total_frames} frames -> {args.output_dir} "
+        f"({total_size / 1e3:.1f} KB)"
+    )
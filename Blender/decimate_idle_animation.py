@@ -0,0 +1,146 @@
+import os
+import sys
+
+import bpy
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from action_analysis import (  # noqa: E402
+    BONE_PATH_PATTERN,
+    action_fcurves,
+    read_keyframes,
+    remove_fcurve,
+    sample_fcurve,
+    write_keyframes,
+)
+from keyframes import interpolate_keys, reduce_keyframes  # noqa: E402
+
+# Decimate baked animations (like the idle animation of
+# avaturn-Lucas-blendshapes-idle-animation.glb, a key per frame per bone channel) before the
+# glTF export, so the GLB is smaller and the browser evaluates fewer keys.
+# All fcurves of an action are read with foreach_get, the channels of every property
+# (e.g. the 4 quaternion components of a bone) are reduced together within a tolerance
+# (keyframes.py) and written back in one pass as linear keys. Channels that never leave the
+# rest value are deleted, other constant channels keep a single key.
+# Only baked properties (a key on every frame) are decimated, so the samples are the whole curve;
+# hand-keyed curves (Bezier shapes between sparse keys) are left untouched.
+# Reports the keyframe reduction and the max angular error of the rotations.
+# Headless: blender -b avatar.blend --python decimate_idle_animation.py -- [action names]
+
+# Max rotation error (degrees), location error (scene units) and error of other channels
+angle_tolerance_degrees = 0.1
+location_tolerance = 0.0005
+default_tolerance = 0.001
+
+rest_values = {"rotation_quaternion": (1.0, 0.0, 0.0, 0.0), "scale": (1.0, 1.0, 1.0)}
+
+
+def channel_tolerance(property_name):
+    angle = np.radians(angle_tolerance_degrees)
+    if property_name == "rotation_quaternion":
+        # Component errors of unit quaternions: angle error <= ~4 × component error
+        return angle / 4.0
+    if property_name == "rotation_euler":
+        return angle
+    if property_name == "location":
+        return location_tolerance
+    return default_tolerance
+
+
+def quaternion_angles(a, b):
+    """(F,) angle (radians) between (F, 4) quaternions (normalized first, sign-independent)."""
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return 2.0 * np.arccos(np.clip(np.abs((a * b).sum(axis=1)), 0.0, 1.0))
+
+
+def is_baked(keys):
+    """True if (K, 2) keys are on every whole frame of their range (baked animation)."""
+    frames = keys[:, 0]
+    return bool(np.all(np.abs(np.diff(frames) - 1.0) < 1e-4))
+
+
+def property_groups(fcurves):
+    """Fcurves by data path (all array indices of one property together), index order."""
+    groups = {}
+    for fcurve in fcurves:
+        groups.setdefault(fcurve.data_path, []).append(fcurve)
+    for group in groups.values():
+        group.sort(key=lambda fcurve: fcurve.array_index)
+    return groups
+
+
+def decimate_action(action):
+    """
+    Decimate all fcurves of an action.
+
+    Returns:
+        dict: keys_before, keys_after, dropped_channels, skipped_channels (not baked),
+            max_angle (degrees), max_error (other channels).
+    """
+    stats = {"keys_before": 0, "keys_after": 0, "dropped_channels": 0, "skipped_channels": 0}
+    stats.update(max_angle=0.0, max_error=0.0)
+    for path, group in property_groups(action_fcurves(action)).items():
+        match = BONE_PATH_PATTERN.match(path)
+        property_name = match.group(2) if match else path.rsplit(".", 1)[-1]
+        counts = [len(fcurve.keyframe_points) for fcurve in group]
+        stats["keys_before"] += sum(counts)
+        if min(counts) == 0:
+            stats["keys_after"] += sum(counts)
+            continue
+
+        group_keys = [read_keyframes(fcurve) for fcurve in group]
+        if not all(is_baked(channel_keys) for channel_keys in group_keys):
+            stats["keys_after"] += sum(counts)
+            stats["skipped_channels"] += len(group)
+            continue
+        # Baked: the union of the key frames is every frame of the property
+        key_frames = [channel_keys[:, 0] for channel_keys in group_keys]
+        frames = np.unique(np.concatenate(key_frames)).astype(np.float64)
+        values = np.stack([sample_fcurve(fcurve, frames) for fcurve in group], axis=1)
+        tolerance = channel_tolerance(property_name)
+
+        if np.all(values.max(axis=0) - values.min(axis=0) <= tolerance):
+            rest = rest_values.get(property_name)
+            rest = np.array([rest[fcurve.array_index] for fcurve in group]) if rest else 0.0
+            if np.all(np.abs(values[0] - rest) <= tolerance):
+                for fcurve in group:
+                    remove_fcurve(action, fcurve)
+                stats["dropped_channels"] += len(group)
+                continue
+            keys = np.array([0])
+        else:
+            keys = reduce_keyframes(values, tolerance, frames)
+
+        reduced = interpolate_keys(frames, values, keys)
+        if property_name == "rotation_quaternion" and values.shape[1] == 4:
+            angle = np.degrees(quaternion_angles(values, reduced).max())
+            stats["max_angle"] = max(stats["max_angle"], float(angle))
+        else:
+            error = float(np.abs(reduced - values).max())
+            if property_name == "rotation_euler":
+                stats["max_angle"] = max(stats["max_angle"], float(np.degrees(error)))
+            else:
+                stats["max_error"] = max(stats["max_error"], error)
+        for column, fcurve in enumerate(group):
+            write_keyframes(fcurve, np.stack([frames[keys], values[keys, column]], axis=1))
+        stats["keys_after"] += len(keys) * len(group)
+    return stats
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    actions = [bpy.data.actions[name] for name in args] or list(bpy.data.actions)
+    for action in actions:
+        stats = decimate_action(action)
+        before, after = stats["keys_before"], stats["keys_after"]
+        print(
+            f"{action.name}: {before} -> {after} keyframes "
+            f"({1.0 - after / max(before, 1):.0%} fewer), "
+            f"{stats['dropped_channels']} constant channels dropped, "
+            f"{stats['skipped_channels']} hand-keyed channels skipped, "
+            f"max angular error {stats['max_angle']:.3f}°, other channels {stats['max_error']:.5f}"
+        )
@@ -0,0 +1,218 @@
+import argparse
+import os
+import subprocess
+import time
+
+from export_cache import (
+    ExportCache,
+    file_hash,
+    mapping_table_inputs,
+    pose_shapekey_inputs,
+    script_dir,
+    script_inputs,
+    script_parameters,
+)
+from facs_arkit_shape_keys import audio2faceFacsNames
+
+# Export avatar variants through the cached Blender stages (export_cache.py), so a rebuild
+# only re-runs the stages whose inputs changed. Every stage runs Blender in the background on
+# the previous stage's .blend and saves its own:
+#   pose_shapekeys: new_shapekey_from_pose.py (inputs: .blend hash, pose specs)
+#   prune: remove_unused_shapekeys.py (pruning parameters, clip_usage.py keep-list content)
+#   reorder_arkit: reorder_arkit_shapekeys.py (mapping tables), also writes arkit_index_map.json
+#   gltf_export: GLB export with `gltf_export_settings`
+# Every stage is also keyed on its input stage's outputs and on the Blender version. Changing
+# a mapping table re-runs reorder_arkit and gltf_export; the posed and pruned files of every
+# variant are restored from the cache.
+# Usage:
+#   python export_avatar.py avatar1.blend [avatar2.blend ...] --output-dir exports \
+#       [--pose-mesh Head] [--meshes Head Beard Brows] [--keep-list keep_list.json] \
+#       [--blender /path/to/blender]
+# Writes exports/<variant>.glb, and the stage files in exports/<variant>/.
+
+default_blender = "blender"
+# Keyword arguments of bpy.ops.export_scene.gltf (filepath is added)
+gltf_export_settings = {
+    "export_format": "GLB",
+    "export_morph": True,
+    "export_morph_normal": True,
+    # Sparse morph target accessors: only the vertices a key moves
+    "export_try_sparse_sk": True,
+}
+
+
+def blender_version(blender=default_blender):
+    result = subprocess.run([blender, "--version"], capture_output=True, text=True, check=True)
+    return result.stdout.splitlines()[0].strip()
+
+
+def run_blender(blender, blend_path, steps, script_args=()):
+    """
+    Run Blender in the background on a .blend file (fails if a script raises).
+
+    Args:
+        steps (list[tuple[str, str]]): ("--python", script path) or ("--python-expr", code),
+            run in order.
+        script_args (iterable[str]): Arguments after "--", read by the scripts.
+    """
+    command = [blender, "-b", blend_path, "--python-exit-code", "1"]
+    for option, value in steps:
+        command += [option, value]
+    script_args = list(script_args)
+    if script_args:
+        command += ["--", *script_args]
+    subprocess.run(command, check=True)
+
+
+def _script(name):
+    return ("--python", os.path.join(script_dir, name))
+
+
+def _select(mesh_name):
+    """Make a mesh the active, selected object (new_shapekey_from_pose uses the active one)."""
+    return (
+        "--python-expr",
+        "import bpy\n"
+        f"obj = bpy.data.objects[{mesh_name!r}]\n"
+        "obj.select_set(True)\n"
+        "bpy.context.view_layer.objects.active = obj\n",
+    )
+
+
+def _save(path):
+    return ("--python-expr", f"import bpy\nbpy.ops.wm.save_as_mainfile(filepath={path!r})\n")
+
+
+def _export_gltf(path):
+    return (
+        "--python-expr",
+        "import bpy\n"
+        f"bpy.ops.export_scene.gltf(filepath={path!r}, **{gltf_export_settings!r})\n",
+    )
+
+
+def keep_list_path(path=None):
+    """Keep-list of the prune stage: `path`, or usage_keep_list of remove_unused_shapekeys.py."""
+    if path:
+        return path
+    parameters = script_parameters(os.path.join(script_dir, "remove_unused_shapekeys.py"))
+    value = parameters.get("usage_keep_list")
+    if value is not None and not isinstance(value, str):
+        raise ValueError("usage_keep_list isn't a literal path, pass --keep-list")
+    return value
+
+
+def export_variant(cache, blend_path, output_dir, options):
+    """
+    Run all stages on one avatar variant.
+
+    Args:
+        options (dict): blender (executable), blender_version, pose_mesh (None: active object
+            of the file), meshes (objects to reorder, None: selected objects) and keep_list.
+
+    Returns:
+        str: Path of the exported GLB.
+    """
+    name = os.path.splitext(os.path.basename(blend_path))[0]
+    work_dir = os.path.join(output_dir, name)
+    os.makedirs(work_dir, exist_ok=True)
+    posed_path = os.path.join(work_dir, "posed.blend")
+    pruned_path = os.path.join(work_dir, "pruned.blend")
+    reordered_path = os.path.join(work_dir, "reordered.blend")
+    # Written next to the .blend it runs on
+    index_map_path = os.path.join(work_dir, "arkit_index_map.json")
+    glb_path = os.path.join(output_dir, f"{name}.glb")
+    blender = options["blender"]
+    keep_list = options["keep_list"]
+    common = {"blender": options["blender_version"]}
+
+    pose_steps = [_select(options["pose_mesh"])] if options["pose_mesh"] else []
+    posed = cache.run_stage(
+        "pose_shapekeys",
+        {
+            **common,
+            "blend": file_hash(blend_path),
+            "pose_mesh": options["pose_mesh"],
+            **pose_shapekey_inputs(),
+        },
+        [posed_path],
+        lambda: run_blender(
+            blender,
+            blend_path,
+            [*pose_steps, _script("new_shapekey_from_pose.py"), _save(posed_path)],
+        ),
+    )
+    pruned = cache.run_stage(
+        "prune",
+        {
+            **common,
+            "posed": posed,
+            # The path alone doesn't change when clip_usage.py rewrites the keep-list
+            "keep_list": file_hash(keep_list) if keep_list else None,
+            **script_inputs("remove_unused_shapekeys.py"),
+            **script_inputs("shapekey_analysis.py"),
+        },
+        [pruned_path],
+        lambda: run_blender(
+            blender,
+            posed_path,
+            [_script("remove_unused_shapekeys.py"), _save(pruned_path)],
+            [keep_list] if keep_list else [],
+        ),
+    )
+    reordered = cache.run_stage(
+        "reorder_arkit",
+        {
+            **common,
+            "pruned": pruned,
+            "meshes": options["meshes"],
+            "audio2faceFacsNames": audio2faceFacsNames,
+            **mapping_table_inputs(),
+            **script_inputs("reorder_arkit_shapekeys.py"),
+            **script_inputs("action_analysis.py"),
+            **script_inputs("shapekey_analysis.py"),
+        },
+        [reordered_path, index_map_path],
+        lambda: run_blender(
+            blender,
+            pruned_path,
+            [_script("reorder_arkit_shapekeys.py"), _save(reordered_path)],
+            options["meshes"] or [],
+        ),
+    )
+    cache.run_stage(
+        "gltf_export",
+        {**common, "reordered": reordered, "settings": gltf_export_settings},
+        [glb_path],
+        lambda: run_blender(blender, reordered_path, [_export_gltf(glb_path)]),
+    )
+    return glb_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export avatar variants with cached stages.")
+    parser.add_argument("blends", nargs="+")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--blender", default=default_blender)
+    parser.add_argument("--pose-mesh", help="Mesh of the pose shape keys (default: active)")
+    parser.add_argument("--meshes", nargs="+", help="Meshes to reorder (default: selected)")
+    parser.add_argument("--keep-list", help="clip_usage.py keep-list for the prune stage")
+    args = parser.parse_args()
+
+    options = {
+        "blender": args.blender,
+        "blender_version": blender_version(args.blender),
+        "pose_mesh": args.pose_mesh,
+        "meshes": args.meshes,
+        "keep_list": keep_list_path(args.keep_list),
+    }
+    cache = ExportCache()
+    start_time = time.perf_counter()
+    for blend_path in args.blends:
+        variant_start = time.perf_counter()
+        glb_path = export_variant(cache, blend_path, args.output_dir, options)
+        print(f"{blend_path} -> {glb_path} ({time.perf_counter() - variant_start:.1f} s)")
+    print(
+        f"Exported {len(args.blends)} variants in {time.perf_counter() - start_time:.1f} s: "
+        f"{cache.hits} stages restored, {cache.misses} rebuilt"
+    )
@@ -0,0 +1,226 @@
+import ast
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Deterministic, content-addressed cache for avatar export stages.
+# Every stage is fingerprinted from its inputs (.blend hash, script versions, script parameters,
+# new_shapekey_from_pose specs, mapping tables, outputs of previous stages). Outputs are stored
+# by content hash, so unchanged stages are skipped and only stages depending on what changed
+# (e.g. one line of a2fBlendshapesToShapeKeys) are rebuilt.
+# This module doesn't import bpy, stages may run Blender in a subprocess.
+#
+# Example:
+#   cache = ExportCache()
+#   inputs = {"blend": file_hash("avatar.blend"), **script_inputs("remove_unused_shapekeys.py")}
+#   pruned = cache.run_stage("prune", inputs, ["avatar-pruned.blend"], build=run_pruning)
+#   cache.run_stage("export", {"pruned": pruned, ...}, ["avatar.glb"], build=run_export)
+# Cached stages: the Blender stages of export_avatar.py (pose shape keys, pruning, ARKit
+# reorder, glTF export), glb_tools.py strip-morph-normals and glb_animation.py (A2F clip bake).
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+default_cache_dir = os.path.join(script_dir, ".export_cache")
+
+
+def canonical_json(value):
+    """JSON with sorted keys and no whitespace, so equal inputs always give equal bytes."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def fingerprint(value):
+    """SHA-256 of the canonical JSON of `value`."""
+    return hashlib.sha256(canonical_json(value).encode("utf-8")).hexdigest()
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's content, read in chunks (.blend files are hundreds of MB)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _literal(node):
+    """Value of a literal node, or a hash of its source (calls, names, sets...)."""
+    try:
+        value = ast.literal_eval(node)
+        # Values must be JSON-serializable stage inputs (not sets, bytes...)
+        json.dumps(value)
+        return value
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        source = ast.unparse(node)
+        return {"source": hashlib.sha256(source.encode("utf-8")).hexdigest()}
+
+
+def script_parameters(path):
+    """
+    Module-level assignments of a script (like `minimum_vertices_affected_to_keep = 80`),
+    read with `ast`, so scripts that run bpy code on import don't have to be imported.
+    Non-literal values are represented by a hash of their source.
+    """
+    with open(path, encoding="utf-8") as file:
+        tree = ast.parse(file.read(), path)
+    parameters = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+            if isinstance(target, ast.Name):
+                parameters[target.id] = _literal(node.value)
+    return parameters
+
+
+def script_calls(path, function_name):
+    """
+    Literal arguments of module-level calls to `function_name` in a script, e.g. the specs
+    passed to `new_shapekey_from_pose(...)`.
+
+    Returns:
+        list[dict]: {"args": [...], "kwargs": {...}} for every call, in script order.
+    """
+    with open(path, encoding="utf-8") as file:
+        tree = ast.parse(file.read(), path)
+    calls = []
+    for node in tree.body:
+        call = node.value if isinstance(node, ast.Expr) else None
+        if (
+            isinstance(call, ast.Call)
+            and isinstance(call.func, ast.Name)
+            and call.func.id == function_name
+        ):
+            calls.append(
+                {
+                    "args": [_literal(arg) for arg in call.args],
+                    "kwargs": {kw.arg: _literal(kw.value) for kw in call.keywords},
+                }
+            )
+    return calls
+
+
+def script_inputs(path):
+    """Script version (hash of its source) and its parameters, as stage inputs."""
+    if not os.path.isabs(path):
+        path = os.path.join(script_dir, path)
+    name = os.path.basename(path)
+    return {
+        f"{name}:version": file_hash(path),
+        f"{name}:parameters": script_parameters(path),
+    }
+
+
+def mapping_table_inputs():
+    """A2F -> shape key mapping tables as stage inputs."""
+    from facs_arkit_shape_keys import a2fBlendshapesToShapeKeys, a2fEmotionNamesToShapeKeys
+
+    return {
+        "a2fBlendshapesToShapeKeys": a2fBlendshapesToShapeKeys,
+        "a2fEmotionNamesToShapeKeys": a2fEmotionNamesToShapeKeys,
+    }
+
+
+def pose_shapekey_inputs(path="new_shapekey_from_pose.py"):
+    """Script version and `new_shapekey_from_pose` specs as stage inputs."""
+    if not os.path.isabs(path):
+        path = os.path.join(script_dir, path)
+    return {
+        "new_shapekey_from_pose.py:version": file_hash(path),
+        "new_shapekey_from_pose:specs": script_calls(path, "new_shapekey_from_pose"),
+    }
+
+
+class ExportCache:
+    """
+    Local content-addressed store for stage outputs.
+
+    Layout:
+        objects/<2 chars>/<sha256>: output files by content hash (deduplicated across stages
+            and avatar variants)
+        stages/<stage fingerprint>.json: output hashes of one stage run, in output_paths order
+    """
+
+    def __init__(self, cache_dir=default_cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+
+    def _stage_path(self, key):
+        return os.path.join(self.cache_dir, "stages", f"{key}.json")
+
+    def _atomic_write(self, path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                write(file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def store_file(self, path):
+        """Store a file by content hash, returns the hash."""
+        digest = file_hash(path)
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            with open(path, "rb") as source:
+                self._atomic_write(object_path, lambda file: shutil.copyfileobj(source, file))
+        return digest
+
+    def restore_file(self, digest, path):
+        """Copy a stored object to `path` (skipped if the file already has that content)."""
+        if os.path.exists(path) and file_hash(path) == digest:
+            return
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(self._object_path(digest), path)
+
+    def lookup(self, key):
+        """Output hashes of a cached stage run, or None if missing or incomplete."""
+        try:
+            with open(self._stage_path(key), encoding="utf-8") as file:
+                outputs = json.load(file)["outputs"]
+        except (OSError, ValueError, KeyError):
+            return None
+        if all(os.path.exists(self._object_path(digest)) for digest in outputs):
+            return outputs
+        return None
+
+    def run_stage(self, name, inputs, output_paths, build):
+        """
+        Run a stage, or restore its outputs from the cache if its inputs didn't change.
+
+        Args:
+            name (str): Stage name (part of the fingerprint).
+            inputs (dict): JSON-serializable stage inputs. Use hashes for files, and the return
+                value of a previous `run_stage` to chain stages.
+            output_paths (list[str]): Files written by `build`.
+            build (callable): Called without arguments to produce `output_paths`.
+
+        Returns:
+            str: Fingerprint of the stage outputs (changes only if an output changed).
+        """
+        key = fingerprint({"stage": name, "inputs": inputs})
+        outputs = self.lookup(key)
+        if outputs is not None and len(outputs) == len(output_paths):
+            # By index: outputs with the same file name in different directories stay apart
+            for path, digest in zip(output_paths, outputs):
+                self.restore_file(digest, path)
+            self.hits += 1
+            print(f"[cache] {name}: unchanged, skipped ({key[:12]})")
+        else:
+            build()
+            outputs = [self.store_file(path) for path in output_paths]
+            record = canonical_json({"stage": name, "inputs": inputs, "outputs": outputs})
+            self._atomic_write(self._stage_path(key), lambda file: file.write(record.encode()))
+            self.misses += 1
+            print(f"[cache] {name}: rebuilt ({key[:12]})")
+        return fingerprint(outputs)
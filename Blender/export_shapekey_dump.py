@@ -0,0 +1,88 @@
+import json
+import os
+import re
+import sys
+
+import bpy
+import numpy as np
+
+# One-shot dump of all meshes with shape keys into .npy files (memory-mappable) + manifest.json,
+# so shape key analysis can run in plain CPython with shapekey_dump.py, without Blender.
+# Headless: blender -b avatar.blend --python export_shapekey_dump.py -- /path/to/dump
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from shapekey_analysis import (  # noqa: E402
+    read_coordinates,
+    read_shape_keys,
+    read_triangles,
+    read_vertex_group_weights,
+)
+
+
+def safe_file_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+
+def export_shapekey_dump(output_dir):
+    """
+    Write every mesh with shape keys (one folder per mesh datablock):
+
+        base.npy (N, 3) float32, keys.npy (K, N, 3) float32, relative_indices.npy (K,) int64,
+        vertex_groups.npy (G, N) float32 weights, triangles.npy (T, 3) int32
+
+    and manifest.json with names of objects, keys, key vertex groups and vertex groups.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {"blend_file": bpy.data.filepath, "meshes": {}}
+
+    for obj in bpy.data.objects:
+        if obj.type != "MESH" or not obj.data.shape_keys:
+            continue
+        mesh = obj.data
+        if mesh.name in manifest["meshes"]:
+            manifest["meshes"][mesh.name]["objects"].append(obj.name)
+            continue
+
+        folder = safe_file_name(mesh.name)
+        mesh_dir = os.path.join(output_dir, folder)
+        os.makedirs(mesh_dir, exist_ok=True)
+
+        shape_keys = read_shape_keys(mesh)
+        group_weights = read_vertex_group_weights(obj)
+        group_names = sorted(group_weights)
+        weights = (
+            np.stack([group_weights[name] for name in group_names])
+            if group_names
+            else np.zeros((0, len(mesh.vertices)), dtype=np.float32)
+        )
+
+        np.save(os.path.join(mesh_dir, "base.npy"), read_coordinates(mesh.vertices))
+        np.save(os.path.join(mesh_dir, "keys.npy"), shape_keys["coordinates"])
+        np.save(os.path.join(mesh_dir, "relative_indices.npy"), shape_keys["relative_indices"])
+        np.save(os.path.join(mesh_dir, "vertex_groups.npy"), weights)
+        np.save(os.path.join(mesh_dir, "triangles.npy"), read_triangles(mesh))
+
+        manifest["meshes"][mesh.name] = {
+            "folder": folder,
+            "objects": [obj.name],
+            "vertex_count": len(mesh.vertices),
+            "key_names": shape_keys["names"],
+            "key_vertex_groups": shape_keys["vertex_groups"],
+            "use_relative": shape_keys["use_relative"],
+            "vertex_group_names": group_names,
+        }
+        print(f"- {mesh.name}: {len(shape_keys['names'])} keys, {len(mesh.vertices)} vertices")
+
+    with open(os.path.join(output_dir, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+    print(f"Shape key dump saved to '{output_dir}'.")
+    return manifest
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    default_dir = os.path.join(os.path.dirname(bpy.data.filepath) or script_dir, "shapekey_dump")
+    export_shapekey_dump(args[0] if args else default_dir)
@@ -8,10 +8,12 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 if script_dir not in sys.path:
     sys.path.append(script_dir)
 
-# Now we can import other local scripts from the same directory
-from count_shapekeys_number import count_shapekeys_number
+if __name__ == "__main__":
+    # Now we can import other local scripts from the same directory
+    # (imported here, so the mapping tables below can be imported outside of Blender)
+    from count_shapekeys_number import count_shapekeys_number
 
-count_shapekeys_number()
+    count_shapekeys_number()
 
 audio2faceFacsNames = [
     "eyeBlinkLeft",
@@ -468,8 +470,9 @@ for emotion in audio2faceEmotionNames:
             best_match = shapekey
     audio2faceEmotionNamesToShapeKeys[emotion] = best_match
 
-print("Audio2Face Emotion Names to Shape Keys:")
-print(audio2faceEmotionNamesToShapeKeys)
+if __name__ == "__main__":
+    print("Audio2Face Emotion Names to Shape Keys:")
+    print(audio2faceEmotionNamesToShapeKeys)
 
 # Emotions mapped to Daz shape keys:
 a2fEmotionNamesToShapeKeys = {
@@ -540,6 +543,44 @@ a2fBlendshapesToShapeKeys = {
     "tongueOut": "",
 }
 
+# Oculus visemes of the Avaturn avatar (viseme_* in allMorphTargets, src/audio2face.ts)
+visemeNames = [
+    "viseme_sil",
+    "viseme_PP",
+    "viseme_FF",
+    "viseme_TH",
+    "viseme_DD",
+    "viseme_kk",
+    "viseme_CH",
+    "viseme_SS",
+    "viseme_nn",
+    "viseme_RR",
+    "viseme_aa",
+    "viseme_E",
+    "viseme_I",
+    "viseme_O",
+    "viseme_U",
+]
+
+# Visemes mapped to Daz shape keys:
+visemeNamesToShapeKeys = {
+    "viseme_sil": "",  # neutral
+    "viseme_PP": "Vis M",
+    "viseme_FF": "Vis F",
+    "viseme_TH": "Vis TH",
+    "viseme_DD": "Vis T",
+    "viseme_kk": "Vis K",
+    "viseme_CH": "Vis SH",
+    "viseme_SS": "Vis S",
+    "viseme_nn": "Vis L",  # no N viseme
+    "viseme_RR": "Vis ER",
+    "viseme_aa": "Vis AA",
+    "viseme_E": "Vis EH",
+    "viseme_I": "Vis IH",  # Vis IY?
+    "viseme_O": "Vis OW",
+    "viseme_U": "Vis UW",
+}
+
 
 shape_keys_with_body_morphs = [
     "Basic",
@@ -1463,3 +1504,4 @@ shape_keys_all_merged = [
 # TODO:
 # "Mouth Smile Widen" created as a merge of "Mouth Smile Widen Left" and "... Right"
 # (original morph does not modify beard.
+# -> transfer_shapekeys.py copies keys from the head to beard/eyebrows/eyelashes in bulk.
@@ -0,0 +1,225 @@
+import argparse
+import os
+
+import numpy as np
+
+from a2f_clip import emotion_weights, load_clip, load_emotion_keys
+from export_cache import ExportCache, file_hash, mapping_table_inputs, script_inputs
+from facs_arkit_shape_keys import a2fBlendshapesToShapeKeys, a2fEmotionNamesToShapeKeys
+from glb_tools import COMPONENT_FLOAT, read_glb, write_glb
+from keyframes import reduce_keyframes
+
+# Bake A2F clips into a GLB as native glTF animations, so the engine's animation system drives
+# the morph targets instead of applyPrecomputedBlendShapes every frame.
+# Every clip becomes one animation with a "weights" channel per node with a morph mesh
+# (all targets of the mesh, unmapped ones stay 0) and rotation channels for the A2F joints
+# (jaw, eyes). Samplers keep only the keyframes needed to stay within a tolerance (keyframes.py)
+# and store weights as normalized uint16 when they are in [0, 1].
+# New data is appended to the binary chunk, existing bufferViews are not touched.
+# Usage:
+#   python glb_animation.py avatar.glb avatar-animated.glb clip1.json [clip2.json ...] \
+#       [--emotion emotion1.json ...] [--no-cache]
+# The bake is a cached export stage (export_cache.py): unchanged inputs restore the output.
+
+COMPONENT_UNSIGNED_SHORT = 5123
+
+# Max interpolation error of the reduced samplers
+weight_tolerance = 0.002
+rotation_tolerance = 0.0005
+# Node names of the A2F joints (same aliases as preselectJoints in src/audio2face.ts)
+joint_node_names = {
+    "jaw": ["jaw", "Jaw"],
+    "eye_L": ["eye_L", "LeftEye"],
+    "eye_R": ["eye_R", "RightEye"],
+}
+
+
+class _BinaryAppender:
+    """Appends accessors/bufferViews to a glTF, data at the end of the binary chunk."""
+
+    def __init__(self, gltf, binary):
+        self.gltf = gltf
+        self.binary = bytearray(binary)
+        gltf.setdefault("accessors", [])
+        gltf.setdefault("bufferViews", [])
+        if not gltf.get("buffers"):
+            gltf["buffers"] = [{"byteLength": 0}]
+
+    def add_accessor(self, array, accessor_type, component_type, normalized=False, bounds=False):
+        self.binary += b"\0" * (-len(self.binary) % 4)
+        data = array.tobytes()
+        self.gltf["bufferViews"].append(
+            {"buffer": 0, "byteOffset": len(self.binary), "byteLength": len(data)}
+        )
+        self.binary += data
+        accessor = {
+            "bufferView": len(self.gltf["bufferViews"]) - 1,
+            "componentType": component_type,
+            "count": len(array),
+            "type": accessor_type,
+        }
+        if normalized:
+            accessor["normalized"] = True
+        if bounds:
+            # Required for animation sampler inputs
+            accessor["min"] = [float(array.min())]
+            accessor["max"] = [float(array.max())]
+        self.gltf["accessors"].append(accessor)
+        return len(self.gltf["accessors"]) - 1
+
+
+def clip_target_weights(clip, target_names, emotion=None):
+    """
+    (F, T) weights of the morph targets of a mesh. A2F poses match targets by ARKit name
+    or by the mapped Daz key (a2fBlendshapesToShapeKeys), emotions by a2fEmotionNamesToShapeKeys.
+    Returns None if the clip drives none of the targets.
+    """
+    frame_count = clip["numFrames"]
+    weights = np.zeros((frame_count, len(target_names)), dtype=np.float32)
+    index = {name: target_index for target_index, name in enumerate(target_names)}
+    sources = [(clip["facsNames"], clip["weightMat"], a2fBlendshapesToShapeKeys)]
+    if emotion is not None:
+        emotions = emotion_weights(emotion, frame_count)
+        sources.append((emotion["emotionNames"], emotions, a2fEmotionNamesToShapeKeys))
+    driven = False
+    for names, values, mapping in sources:
+        for column, name in enumerate(names):
+            target_index = index.get(name, index.get(mapping.get(name, "")))
+            if target_index is not None:
+                weights[:, target_index] += values[:, column]
+                driven = True
+    return weights if driven else None
+
+
+def _joint_nodes(gltf):
+    nodes = {node.get("name"): node_index for node_index, node in enumerate(gltf.get("nodes", []))}
+    found = {}
+    for joint, aliases in joint_node_names.items():
+        for alias in aliases:
+            if alias in nodes:
+                found[joint] = nodes[alias]
+                break
+    return found
+
+
+def add_clip_animation(gltf, appender, clip, name, emotion=None):
+    """
+    Add one glTF animation for a clip.
+
+    Returns:
+        dict: Channel count, sampled and kept keyframe counts.
+    """
+    fps = clip["exportFps"]
+    times = np.arange(clip["numFrames"], dtype=np.float32) / fps
+    animation = {"name": name, "channels": [], "samplers": []}
+    stats = {"channels": 0, "sampled": 0, "kept": 0}
+    input_accessors = {}
+
+    def add_sampler(values, tolerance, accessor_type):
+        keys = reduce_keyframes(values, tolerance)
+        # Channels with the same keyframes share the input accessor
+        if keys.tobytes() not in input_accessors:
+            input_accessors[keys.tobytes()] = appender.add_accessor(
+                times[keys], "SCALAR", COMPONENT_FLOAT, bounds=True
+            )
+        # Weights: keyframe count × target count scalars, rotations: one VEC4 per keyframe
+        output = values[keys].reshape(-1) if accessor_type == "SCALAR" else values[keys]
+        if accessor_type == "SCALAR" and output.min(initial=0) >= 0 and output.max(initial=0) <= 1:
+            codes = np.rint(output * 65535.0).astype("<u2")
+            output_accessor = appender.add_accessor(
+                codes, accessor_type, COMPONENT_UNSIGNED_SHORT, normalized=True
+            )
+        else:
+            output_accessor = appender.add_accessor(
+                output.astype("<f4"), accessor_type, COMPONENT_FLOAT
+            )
+        animation["samplers"].append(
+            {
+                "input": input_accessors[keys.tobytes()],
+                "output": output_accessor,
+                "interpolation": "LINEAR",
+            }
+        )
+        stats["sampled"] += len(values)
+        stats["kept"] += len(keys)
+        return len(animation["samplers"]) - 1
+
+    mesh_samplers = {}
+    meshes = gltf.get("meshes", [])
+    for node_index, node in enumerate(gltf.get("nodes", [])):
+        if "mesh" not in node:
+            continue
+        mesh_index = node["mesh"]
+        if mesh_index not in mesh_samplers:
+            target_names = meshes[mesh_index].get("extras", {}).get("targetNames", [])
+            weights = clip_target_weights(clip, target_names, emotion) if target_names else None
+            mesh_samplers[mesh_index] = (
+                None if weights is None else add_sampler(weights, weight_tolerance, "SCALAR")
+            )
+        if mesh_samplers[mesh_index] is not None:
+            target = {"node": node_index, "path": "weights"}
+            animation["channels"].append({"sampler": mesh_samplers[mesh_index], "target": target})
+
+    rotations = clip["rotations"]
+    for joint, node_index in _joint_nodes(gltf).items():
+        if joint not in clip["joints"] or not len(rotations):
+            continue
+        # Same component order as applyJointTransforms (Quaternion.FromArray)
+        values = rotations[:, clip["joints"].index(joint)]
+        sampler = add_sampler(values, rotation_tolerance, "VEC4")
+        target = {"node": node_index, "path": "rotation"}
+        animation["channels"].append({"sampler": sampler, "target": target})
+
+    stats["channels"] = len(animation["channels"])
+    if animation["channels"]:
+        gltf.setdefault("animations", []).append(animation)
+    return stats
+
+
+def bake_clips(input_path, output_path, clip_paths, emotion_paths=None):
+    gltf, binary = read_glb(input_path)
+    appender = _BinaryAppender(gltf, binary)
+    emotion_paths = emotion_paths or [None] * len(clip_paths)
+    for clip_path, emotion_path in zip(clip_paths, emotion_paths):
+        clip = load_clip(clip_path)
+        emotion = load_emotion_keys(emotion_path) if emotion_path else None
+        name = os.path.splitext(os.path.basename(clip_path))[0]
+        stats = add_clip_animation(gltf, appender, clip, name, emotion)
+        reduction = 1.0 - stats["kept"] / max(stats["sampled"], 1)
+        print(
+            f"- {name}: {stats['channels']} channels, {stats['kept']}/{stats['sampled']} "
+            f"keyframes ({reduction:.0%} fewer)"
+        )
+    write_glb(output_path, gltf, appender.binary)
+    print(
+        f"Binary chunk {len(binary) / 1e6:.2f} MB -> {len(appender.binary) / 1e6:.2f} MB, "
+        f"{len(gltf.get('animations', []))} animations"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bake A2F clips into GLB animations.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("clips", nargs="+")
+    parser.add_argument("--emotion", nargs="+", help="Emotion key export of every clip")
+    parser.add_argument("--no-cache", action="store_true", help="Always bake")
+    args = parser.parse_args()
+    if args.emotion and len(args.emotion) != len(args.clips):
+        parser.error("--emotion needs one emotion key export per clip")
+
+    def build():
+        bake_clips(args.input, args.output, args.clips, args.emotion)
+
+    if args.no_cache:
+        build()
+    else:
+        inputs = {
+            "glb": file_hash(args.input),
+            "clips": [file_hash(path) for path in args.clips],
+            "emotions": [file_hash(path) for path in args.emotion or []],
+            **script_inputs("glb_animation.py"),
+            **script_inputs("keyframes.py"),
+            **mapping_table_inputs(),
+        }
+        ExportCache().run_stage("bake_clip_animations", inputs, [args.output], build)
@@ -0,0 +1,225 @@
+import json
+import struct
+import sys
+
+from export_cache import ExportCache, file_hash, script_inputs
+
+# Read/modify/write GLB files (binary glTF 2.0) outside of Blender.
+# The binary chunk is only sliced and re-joined (bufferViews are copied as bytes),
+# existing mesh buffers are never decoded and re-encoded.
+# Usage:
+#   python glb_tools.py strip-morph-normals avatar.glb morph_normals.json avatar-out.glb
+# Stripping is a cached export stage (export_cache.py): unchanged inputs restore the output.
+
+GLB_MAGIC = 0x46546C67  # "glTF"
+CHUNK_JSON = 0x4E4F534A  # "JSON"
+CHUNK_BIN = 0x004E4942  # "BIN\0"
+
+COMPONENT_FLOAT = 5126
+
+
+def read_glb(path):
+    """
+    Read a GLB file.
+
+    Returns:
+        tuple[dict, bytes]: glTF JSON and the binary chunk (empty if there is none).
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, length = struct.unpack_from("<III", data, 0)
+    if magic != GLB_MAGIC or version != 2:
+        raise ValueError(f"'{path}' is not a glTF 2.0 binary file")
+
+    gltf = None
+    binary = b""
+    offset = 12
+    while offset < length:
+        chunk_length, chunk_type = struct.unpack_from("<II", data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == CHUNK_JSON:
+            gltf = json.loads(chunk)
+        elif chunk_type == CHUNK_BIN and not binary:
+            binary = chunk
+        offset += 8 + chunk_length
+    if gltf is None:
+        raise ValueError(f"'{path}' has no JSON chunk")
+    return gltf, binary
+
+
+def write_glb(path, gltf, binary):
+    """Write glTF JSON and a binary chunk as a GLB file (buffer 0 length is set to the chunk)."""
+    binary = bytes(binary)
+    if gltf.get("buffers"):
+        gltf["buffers"][0]["byteLength"] = len(binary)
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    binary += b"\0" * (-len(binary) % 4)
+
+    length = 12 + 8 + len(json_chunk) + (8 + len(binary) if binary else 0)
+    with open(path, "wb") as file:
+        file.write(struct.pack("<III", GLB_MAGIC, 2, length))
+        file.write(struct.pack("<II", len(json_chunk), CHUNK_JSON))
+        file.write(json_chunk)
+        if binary:
+            file.write(struct.pack("<II", len(binary), CHUNK_BIN))
+            file.write(binary)
+
+
+def _accessor_references(gltf):
+    """Yield (container, key) of every place in glTF JSON that holds an accessor index."""
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            attributes = primitive.get("attributes", {})
+            for name in attributes:
+                yield attributes, name
+            if "indices" in primitive:
+                yield primitive, "indices"
+            for target in primitive.get("targets", []):
+                for name in target:
+                    yield target, name
+    for skin in gltf.get("skins", []):
+        if "inverseBindMatrices" in skin:
+            yield skin, "inverseBindMatrices"
+    for animation in gltf.get("animations", []):
+        for sampler in animation.get("samplers", []):
+            yield sampler, "input"
+            yield sampler, "output"
+    for node in gltf.get("nodes", []):
+        instancing = node.get("extensions", {}).get("EXT_mesh_gpu_instancing", {})
+        attributes = instancing.get("attributes", {})
+        for name in attributes:
+            yield attributes, name
+
+
+def _buffer_view_references(value):
+    """Yield (container, key) of every "bufferView" index in glTF JSON (incl. extensions)."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "bufferView" and isinstance(item, int):
+                yield value, key
+            else:
+                yield from _buffer_view_references(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _buffer_view_references(item)
+
+
+def compact_glb(gltf, binary):
+    """
+    Remove unused accessors and bufferViews and rebuild the binary chunk from the bufferViews
+    still in use (copied as raw bytes, keeping 4-byte alignment).
+
+    Returns:
+        tuple[dict, bytes]: The same glTF JSON (modified in place) and the new binary chunk.
+    """
+    accessors = gltf.get("accessors", [])
+    used_accessors = sorted({container[key] for container, key in _accessor_references(gltf)})
+    accessor_map = {old: new for new, old in enumerate(used_accessors)}
+    for container, key in list(_accessor_references(gltf)):
+        container[key] = accessor_map[container[key]]
+    gltf["accessors"] = [accessors[index] for index in used_accessors]
+
+    buffer_views = gltf.get("bufferViews", [])
+    # Skip the list of bufferViews itself, only count references to it
+    references = [
+        (container, key)
+        for name, value in gltf.items()
+        if name != "bufferViews"
+        for container, key in _buffer_view_references(value)
+    ]
+    used_views = sorted({container[key] for container, key in references})
+    view_map = {old: new for new, old in enumerate(used_views)}
+    for container, key in references:
+        container[key] = view_map[container[key]]
+
+    new_binary = bytearray()
+    new_views = []
+    for index in used_views:
+        view = dict(buffer_views[index])
+        if view.get("buffer", 0) == 0:
+            start = view.get("byteOffset", 0)
+            new_binary += b"\0" * (-len(new_binary) % 4)
+            view["byteOffset"] = len(new_binary)
+            new_binary += binary[start:start + view["byteLength"]]
+        new_views.append(view)
+    gltf["bufferViews"] = new_views
+
+    return gltf, bytes(new_binary)
+
+
+def strip_morph_normals(gltf, keep_normals, zero_fill=True):
+    """
+    Drop NORMAL deltas of morph targets that don't need them (see morph_normals.py).
+
+    Babylon disables normal morphing for a whole mesh as soon as one of its targets has no
+    normals. So for meshes where some keys still need normals (and `zero_fill` is True), dropped
+    NORMAL accessors are replaced by one shared accessor without a bufferView (all zeros by the
+    glTF spec): the file shrinks and normal morphing keeps working for the remaining keys.
+    Meshes where no key needs normals lose NORMAL deltas completely, so they also skip
+    normal morphing at runtime.
+
+    Args:
+        gltf (dict): glTF JSON, modified in place. Call `compact_glb` afterwards.
+        keep_normals (dict[str, list[str]]): Names of keys that keep normals, by mesh name.
+            Meshes not listed are left untouched.
+        zero_fill (bool, optional): Use zero accessors instead of dropping the attribute on
+            meshes that still have keys with normals. Defaults to True.
+
+    Returns:
+        int: Number of dropped NORMAL accessors.
+    """
+    dropped = 0
+    accessors = gltf.setdefault("accessors", [])
+    for mesh in gltf.get("meshes", []):
+        if mesh.get("name") not in keep_normals:
+            continue
+        keep = set(keep_normals[mesh["name"]])
+        target_names = mesh.get("extras", {}).get("targetNames", [])
+        for primitive in mesh.get("primitives", []):
+            targets = primitive.get("targets", [])
+            zero_accessor = None
+            for index, target in enumerate(targets):
+                name = target_names[index] if index < len(target_names) else None
+                if "NORMAL" not in target or name in keep:
+                    continue
+                if zero_fill and keep:
+                    if zero_accessor is None:
+                        count = accessors[target["NORMAL"]]["count"]
+                        accessors.append(
+                            {"componentType": COMPONENT_FLOAT, "count": count, "type": "VEC3"}
+                        )
+                        zero_accessor = len(accessors) - 1
+                    target["NORMAL"] = zero_accessor
+                else:
+                    del target["NORMAL"]
+                dropped += 1
+    return dropped
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 5 or sys.argv[1] != "strip-morph-normals":
+        print("Usage: python glb_tools.py strip-morph-normals in.glb morph_normals.json out.glb")
+        sys.exit(2)
+    _, _, input_path, keep_path, output_path = sys.argv
+
+    def build():
+        with open(keep_path) as file:
+            report = json.load(file)
+        keep_normals = {mesh: data["keep_normals"] for mesh, data in report.items()}
+
+        gltf, binary = read_glb(input_path)
+        dropped = strip_morph_normals(gltf, keep_normals)
+        gltf, new_binary = compact_glb(gltf, binary)
+        write_glb(output_path, gltf, new_binary)
+        print(
+            f"Dropped {dropped} morph target NORMAL accessors, binary chunk "
+            f"{len(binary) / 1e6:.2f} MB -> {len(new_binary) / 1e6:.2f} MB"
+        )
+
+    inputs = {
+        "glb": file_hash(input_path),
+        "morph_normals": file_hash(keep_path),
+        **script_inputs("glb_tools.py"),
+    }
+    ExportCache().run_stage("strip_morph_normals", inputs, [output_path], build)
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Error-bounded keyframe reduction of sampled animation channels (NumPy only, runs in and
+# outside of Blender). Keys are added where linear interpolation between the kept keys
+# deviates most (Douglas-Peucker), the worst frame of every segment per pass, until every
+# channel is within its tolerance.
+
+
+def interpolate_keys(times, values, keys):
+    """
+    Linear interpolation of the kept keys at every sample time.
+
+    Args:
+        times (np.ndarray): (F,) increasing sample times.
+        values (np.ndarray): (F, C) sampled values.
+        keys (np.ndarray): Sorted indices of the kept samples (first and last included).
+
+    Returns:
+        np.ndarray: (F, C) interpolated values.
+    """
+    if len(keys) < 2:
+        return np.repeat(values[keys[:1]], len(times), axis=0)
+    segment = np.searchsorted(keys, np.arange(len(times)), side="right") - 1
+    segment = np.clip(segment, 0, len(keys) - 2)
+    left, right = keys[segment], keys[segment + 1]
+    t = ((times - times[left]) / (times[right] - times[left]))[:, None]
+    return (1.0 - t) * values[left] + t * values[right]
+
+
+def reduce_keyframes(values, tolerance, times=None):
+    """
+    Indices of the samples to keep so that linear interpolation stays within `tolerance`
+    of every sample, all channels at once (a key is kept for all channels).
+
+    Args:
+        values (np.ndarray): (F, C) sampled values.
+        tolerance (float | np.ndarray): Max absolute error, scalar or per channel (C,).
+        times (np.ndarray, optional): (F,) sample times. Defaults to frame indices.
+
+    Returns:
+        np.ndarray: Sorted kept sample indices (first and last sample always kept).
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+    frame_count = len(values)
+    if frame_count <= 2:
+        return np.arange(frame_count)
+    if times is None:
+        times = np.arange(frame_count)
+    times = np.asarray(times, dtype=np.float64)
+    tolerance = np.maximum(np.asarray(tolerance, dtype=np.float64), 1e-12)
+    keep = np.zeros(frame_count, dtype=bool)
+    keep[[0, -1]] = True
+
+    while True:
+        keys = np.flatnonzero(keep)
+        error = (np.abs(interpolate_keys(times, values, keys) - values) / tolerance).max(axis=1)
+        error[keep] = 0.0
+        if error.max() <= 1.0:
+            return keys
+        # Worst sample of every segment that is out of tolerance
+        segment = np.searchsorted(keys, np.arange(frame_count), side="right")
+        order = np.lexsort((-error, segment))
+        first = np.ones(frame_count, dtype=bool)
+        first[1:] = segment[order][1:] != segment[order][:-1]
+        worst = order[first]
+        keep[worst[error[worst] > 1.0]] = True
@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+import bpy
+import numpy as np
+
+# Find shape keys whose normal change is too small to see, so their glTF morph targets can be
+# exported without NORMAL deltas (Babylon morphs normals when present, which doubles the
+# per-target vertex cost).
+# 1. In Blender (writes morph_normals.json next to the .blend file):
+#      blender -b avatar.blend --python morph_normals.py
+# 2. Export GLB with "Shape Key Normals" enabled, then drop the normals that aren't needed:
+#      python glb_tools.py strip-morph-normals avatar.glb morph_normals.json avatar-out.glb
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from shapekey_analysis import normal_deltas, read_shape_keys, read_triangles  # noqa: E402
+
+# Keys changing some vertex normal by more than this angle keep their normal deltas
+minimum_normal_angle_degrees = 2.0
+
+
+def analyze_morph_normals(obj):
+    """
+    Compute normal deltas of all keys of a mesh object and split keys by the threshold.
+
+    Returns:
+        dict: keep_normals (list[str]), drop_normals (list[str]) and
+            max_angle_degrees (dict[str, float]) by key name (reference key excluded).
+    """
+    shape_keys = read_shape_keys(obj.data)
+    triangles = read_triangles(obj.data)
+    _, angles = normal_deltas(shape_keys["coordinates"], triangles)
+    max_angles = angles.max(axis=1) if angles.shape[1] else np.zeros(len(angles))
+
+    keep = []
+    drop = []
+    for name, max_angle in zip(shape_keys["names"][1:], max_angles[1:]):
+        (keep if max_angle > minimum_normal_angle_degrees else drop).append(name)
+
+    return {
+        "keep_normals": keep,
+        "drop_normals": drop,
+        "max_angle_degrees": {
+            name: round(float(angle), 3)
+            for name, angle in zip(shape_keys["names"][1:], max_angles[1:])
+        },
+    }
+
+
+def export_morph_normals_report(path=None):
+    """Analyze all meshes with shape keys and write the report, keyed by mesh (data) name."""
+    if path is None:
+        path = os.path.join(os.path.dirname(bpy.data.filepath) or script_dir, "morph_normals.json")
+
+    report = {}
+    for obj in bpy.data.objects:
+        if obj.type != "MESH" or not obj.data.shape_keys or obj.data.name in report:
+            continue
+        result = analyze_morph_normals(obj)
+        report[obj.data.name] = result
+        print(
+            f"- {obj.name}: {len(result['keep_normals'])} keys keep normals, "
+            f"{len(result['drop_normals'])} drop them"
+        )
+
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Morph normals report saved to '{path}'.")
+    return report
+
+
+if __name__ == "__main__":
+    export_morph_normals_report()
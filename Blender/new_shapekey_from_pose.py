@@ -149,8 +149,9 @@ def new_shapekey_from_pose(shapekey_name, bone_modifications, armature_name=None
     bpy.context.view_layer.objects.active = bpy.data.objects[mesh_name]
     bpy.ops.object.mode_set(mode="OBJECT")
 
-    # Push a named action to the undo stack
-    bpy.ops.ed.undo_push(message=f"Shapekey '{shapekey_name}' created from pose")
+    # Push a named action to the undo stack (there is none in background mode)
+    if not bpy.app.background:
+        bpy.ops.ed.undo_push(message=f"Shapekey '{shapekey_name}' created from pose")
 
     print("Armature reset, and the process is complete.")
 
@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import sys
+
+import bpy
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from action_analysis import sample_bone_rotations  # noqa: E402
+
+# Flag (or delete) corrective body shape keys whose trigger angle no action reaches.
+# Daz correctives like "Michael9_body_cbs_upperarm_z40n_l" (see shape_keys_with_body_morphs)
+# are driven by bone rotations: l_upperarm, z axis, 40° negative; combined triggers like
+# "thigh_x90n_shin_x90p_l" need all rotations at once.
+# Every action of the file is sampled at every frame (bulk fcurve reading, action_analysis.py),
+# so import the animations to deploy (e.g. the Mixamo idle GLBs of src/genesis9-tests.ts) first.
+# A corrective counts as reached if its rotations reach `minimum_trigger_fraction` of the
+# trigger angle (Daz correctives fade in from the rest pose).
+# Headless: blender -b avatar.blend --python remove_unreached_correctives.py
+
+minimum_trigger_fraction = 0.25
+# Delete unreached correctives, otherwise only report them
+remove_unreached = False
+# Genesis 9 bone names of the corrective name parts, for bones with a left and right side
+bone_name_format = "{side}_{bone}"
+# Other bones (spine, neck, head) are center bones: their "_l"/"_r" suffix is the bend side
+sided_bones = ("shoulder", "upperarm", "forearm", "hand", "thigh", "shin", "foot")
+# Daz rotation axis -> (Euler axis of the pose bone, sign), if the import changed bone axes
+axis_map = {"x": ("x", 1.0), "y": ("y", 1.0), "z": ("z", 1.0)}
+# Also written as a keep-list (usage_keep_list in remove_unused_shapekeys.py), if set
+report_path = None
+
+CORRECTIVE_MARKER = "body_cbs_"
+CONDITION_PATTERN = re.compile(r"^([xyz])(\d+)([np])$")
+
+
+def corrective_triggers(name):
+    """
+    Trigger rotations of a corrective body shape key.
+
+    Returns:
+        list[tuple] | None: (bone name, Daz axis, degrees, sign) that all have to be reached,
+            None if the name isn't a corrective with a rotation trigger.
+    """
+    if CORRECTIVE_MARKER not in name:
+        return None
+    tokens = name.split(CORRECTIVE_MARKER, 1)[1].split("_")
+    side = tokens.pop() if tokens[-1] in ("l", "r") else None
+    triggers = []
+    bone = None
+    for token in tokens:
+        match = CONDITION_PATTERN.match(token)
+        if not match:
+            bone = token
+            continue
+        if bone is None:
+            return None
+        axis, degrees, sign = match.groups()
+        if side and bone in sided_bones:
+            bone_name = bone_name_format.format(side=side, bone=bone)
+        else:
+            bone_name = bone
+        triggers.append((bone_name, axis, float(degrees), 1.0 if sign == "p" else -1.0))
+    return triggers or None
+
+
+def trigger_reach(triggers, rotations):
+    """
+    Largest fraction of the trigger angles reached at once by any sampled frame.
+
+    Args:
+        triggers (list[tuple]): See `corrective_triggers`.
+        rotations (list[dict]): Bone rotations of every action (see sample_bone_rotations).
+    """
+    reach = 0.0
+    for action_rotations in rotations:
+        frame_count = len(next(iter(action_rotations.values()), ()))
+        fractions = np.ones(frame_count)
+        for bone, axis, degrees, sign in triggers:
+            euler_axis, axis_sign = axis_map[axis]
+            angles = action_rotations.get(bone)
+            if angles is None:
+                # Bone not animated by this action: rest pose
+                fractions[:] = 0.0
+                break
+            angle = angles[:, "xyz".index(euler_axis)] * axis_sign
+            fractions = np.minimum(fractions, np.clip(sign * angle / degrees, 0.0, 1.0))
+        if frame_count:
+            reach = max(reach, float(fractions.max()))
+    return reach
+
+
+def armature_bone_names():
+    return {bone.name for armature in bpy.data.armatures for bone in armature.bones}
+
+
+def find_unreached_correctives():
+    """
+    Reach of every corrective on mesh objects.
+
+    Returns:
+        dict: shape key name -> reach (0..1), None if a trigger bone isn't in any armature.
+    """
+    rotations = [sample_bone_rotations(action) for action in bpy.data.actions]
+    print(f"Sampled {len(rotations)} actions: {[action.name for action in bpy.data.actions]}")
+    bones = armature_bone_names()
+    reach = {}
+    for obj in bpy.context.scene.objects:
+        if obj.type != "MESH" or not obj.data.shape_keys:
+            continue
+        for key_block in obj.data.shape_keys.key_blocks:
+            triggers = corrective_triggers(key_block.name)
+            if triggers is None or key_block.name in reach:
+                continue
+            if any(bone not in bones for bone, _, _, _ in triggers):
+                reach[key_block.name] = None
+            else:
+                reach[key_block.name] = trigger_reach(triggers, rotations)
+    return reach
+
+
+if __name__ == "__main__":
+    if not bpy.data.actions:
+        raise SystemExit("No actions in this file: import the animations to deploy first.")
+    reach = find_unreached_correctives()
+    unreached = sorted(
+        name
+        for name, value in reach.items()
+        if value is not None and value < minimum_trigger_fraction
+    )
+    for name, value in sorted(reach.items()):
+        if value is None:
+            print(f"- {name}: trigger bone not found, kept")
+        else:
+            flag = "  UNREACHED" if name in unreached else ""
+            print(f"- {name}: {value:.0%} of the trigger angle reached{flag}")
+    print(f"{len(unreached)} of {len(reach)} correctives never reached")
+
+    if remove_unreached:
+        for obj in bpy.context.scene.objects:
+            if obj.type == "MESH" and obj.data.shape_keys:
+                key_blocks = obj.data.shape_keys.key_blocks
+                for name in unreached:
+                    if name in key_blocks:
+                        print(f"Deleting Shape Key '{name}' from object '{obj.name}'.")
+                        obj.shape_key_remove(key_blocks[name])
+
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as file:
+            json.dump({"reach": reach, "prune": unreached}, file, indent=2)
+        print(f"Report saved to '{report_path}'.")
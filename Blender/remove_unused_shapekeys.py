@@ -1,20 +1,39 @@
-import bpy
-
-# Script to delete all shapekeys with no or minimal effect on vertices
-minimum_vertices_affected_to_keep = 80
+import json
+import os
+import sys
 
+import bpy
 
-# Function to count vertices affected by a shape key
-def count_affected_vertices(shape_key_block):
-    base_mesh = shape_key_block.relative_key
-    affected_count = 0
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
 
-    for i, key_point in enumerate(shape_key_block.data):
-        # Check if the vertex has moved from its base position
-        if (key_point.co - base_mesh.data[i].co).length > 0:
-            affected_count += 1
+from shapekey_analysis import (  # noqa: E402
+    bake_vertex_groups,
+    count_affected_vertices,
+    read_effective_deltas,
+)
 
-    return affected_count
+# Script to delete all shapekeys with no or minimal effect on vertices
+minimum_vertices_affected_to_keep = 80
+# Vertices moved less than this (after vertex group masking) don't count as affected
+minimum_displacement = 0.0
+# Bake vertex group masks into kept keys, so exported keys don't need runtime masking and the
+# glTF exporter's sparse morph target accessors only store the vertices a key effectively moves
+bake_vertex_group_masks = False
+# Keep-list written by clip_usage.py: also delete animation targets no clip drives
+# (a path given after "--" on the Blender command line takes precedence, see export_avatar.py)
+usage_keep_list = None  # e.g. os.path.join(script_dir, "keep_list.json")
+
+
+def load_unused_targets(path):
+    """Animation targets listed for pruning in a clip_usage.py keep-list (empty without it)."""
+    if not path:
+        return set()
+    with open(path, encoding="utf-8") as file:
+        targets = set(json.load(file)["prune"])
+    print(f"{len(targets)} animation targets unused by clips ({path})")
+    return targets
 
 
 def measure_shape_key_size(shape_key_block):
@@ -24,12 +43,12 @@ def measure_shape_key_size(shape_key_block):
 
 
 # Function to measure shape key size
-def measure_shape_key_size_and_filter(shape_key_block):
-    affected_count = count_affected_vertices(shape_key_block)
-
+def measure_shape_key_size_and_filter(shape_key_block, affected_count):
     if affected_count < minimum_vertices_affected_to_keep:
         print(f"\nShape Key '{shape_key_block.name}'")
         print(f"- affects {affected_count} vertices")
+        if shape_key_block.vertex_group:
+            print(f"- masked by vertex group '{shape_key_block.vertex_group}'")
         measure_shape_key_size(shape_key_block)
         print("- will be deleted! X")
         return True
@@ -40,6 +59,9 @@ def measure_shape_key_size_and_filter(shape_key_block):
         return False
 
 
+script_args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+unused_targets = load_unused_targets(script_args[0] if script_args else usage_keep_list)
+
 # Iterate over all objects in the scene
 for obj in bpy.context.scene.objects:
     if obj.type == "MESH" and obj.data.shape_keys:
@@ -47,14 +69,22 @@ for obj in bpy.context.scene.objects:
         print(f"\nObject: {obj.name}")
         shape_keys = obj.data.shape_keys.key_blocks
 
+        # Effective displacement (delta × vertex group weight) of all keys at once
+        _, deltas = read_effective_deltas(obj)
+        affected_counts = count_affected_vertices(deltas, minimum_displacement)
+
         # List to store the shape keys to be deleted
         shape_keys_to_delete = []
 
-        # Collect shape keys that have less than 10 affected vertices
-        for shape_key in shape_keys:
-            if shape_key.name != "Basic" and measure_shape_key_size_and_filter(
-                shape_key
-            ):
+        # Collect shape keys that have less than 10 affected vertices or aren't used by clips
+        for shape_key, affected_count in zip(shape_keys, affected_counts):
+            if shape_key.name == "Basic":
+                continue
+            if shape_key.name in unused_targets:
+                print(f"\nShape Key '{shape_key.name}' isn't driven by any clip")
+                print("- will be deleted! X")
+                shape_keys_to_delete.append(shape_key.name)
+            elif measure_shape_key_size_and_filter(shape_key, affected_count):
                 shape_keys_to_delete.append(shape_key.name)
 
         print("\n XXXXXX All Shapekeys to delete:")
@@ -65,4 +95,8 @@ for obj in bpy.context.scene.objects:
             print(f"Deleting Shape Key '{shape_key_name}' from object '{obj.name}'.")
             obj.shape_key_remove(obj.data.shape_keys.key_blocks[shape_key_name])
 
+        if bake_vertex_group_masks:
+            baked = bake_vertex_groups(obj)
+            print(f"Baked vertex groups into {len(baked)} shape keys: {baked}")
+
 print("Finished checking and deleting shape keys.")
@@ -0,0 +1,204 @@
+import json
+import os
+import re
+import sys
+
+import bpy
+
+# Rename shape keys to ARKit names (with a2fBlendshapesToShapeKeys) and reorder key blocks,
+# so the 52 A2F poses occupy fixed leading indices (morph target i = audio2faceFacsNames[i]).
+# Writes a sidecar arkit_index_map.json, so the client binds A2F weights to morph targets
+# by index, matching names once per clip column (precomputeBlendShapesByIndex in
+# src/audio2face.ts), not once per morph target and frame.
+# Drivers, driver variables and action fcurves of the shape keys are re-targeted to the new
+# names (shared sources copied to several poses keep them on the first pose only).
+# Headless: blender -b avatar.blend --python reorder_arkit_shapekeys.py -- Head Beard Brows
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from facs_arkit_shape_keys import (  # noqa: E402
+    a2fBlendshapesToShapeKeys,
+    audio2faceFacsNames,
+)
+from action_analysis import action_fcurves  # noqa: E402
+from shapekey_analysis import read_shape_keys  # noqa: E402
+
+# Add empty keys for ARKit poses without a source key, so indices are the same on every mesh
+create_missing_keys = True
+index_map_version = 1
+
+KEY_BLOCK_PATH_PATTERN = re.compile(r'key_blocks\["((?:[^"\\]|\\.)*)"\]')
+
+
+def arkit_key_sources(key_names):
+    """
+    Source key of every ARKit pose on this mesh: the mapped Daz key, or the key already
+    named like the ARKit pose (mesh renamed before), or None.
+    """
+    existing = set(key_names)
+    sources = []
+    for arkit_name in audio2faceFacsNames:
+        source = a2fBlendshapesToShapeKeys.get(arkit_name, "")
+        if arkit_name in existing:
+            sources.append(arkit_name)
+        elif source in existing:
+            sources.append(source)
+        else:
+            sources.append(None)
+    return sources
+
+
+def rename_key_block_paths(key, rename):
+    """
+    Rewrite key block names in animation paths of a shape key datablock: its action fcurves,
+    its drivers and the driver variable targets reading this datablock.
+
+    Args:
+        key (bpy.types.Key): Shape key datablock.
+        rename (dict[str, str]): New name by old name (other names are left as they are).
+
+    Returns:
+        int: Number of rewritten paths.
+    """
+    animation_data = key.animation_data
+    if animation_data is None or not rename:
+        return 0
+
+    def replace(match):
+        name = bpy.utils.unescape_identifier(match.group(1))
+        if name not in rename:
+            return match.group(0)
+        return f'key_blocks["{bpy.utils.escape_identifier(rename[name])}"]'
+
+    owners = list(animation_data.drivers)
+    if animation_data.action:
+        owners += action_fcurves(animation_data.action)
+    for driver_fcurve in animation_data.drivers:
+        for variable in driver_fcurve.driver.variables:
+            owners += [target for target in variable.targets if target.id == key]
+    count = 0
+    for owner in owners:
+        path = KEY_BLOCK_PATH_PATTERN.sub(replace, owner.data_path)
+        if path != owner.data_path:
+            owner.data_path = path
+            count += 1
+    return count
+
+
+def reorder_arkit_shapekeys(obj):
+    """
+    Rebuild the key blocks of a mesh object in canonical order:
+    reference key, 52 ARKit poses (renamed; shared sources like "Mouth Frown" are copied),
+    then all other keys in their previous order.
+
+    Returns:
+        list[int]: Morph target index (key block index - 1, glTF exports keys after the
+            reference key) of every ARKit pose, -1 if the mesh doesn't have it.
+    """
+    shape_keys = read_shape_keys(obj.data)
+    names = shape_keys["names"]
+    key_blocks = obj.data.shape_keys.key_blocks
+    properties = [
+        {
+            "value": key_block.value,
+            "slider_min": key_block.slider_min,
+            "slider_max": key_block.slider_max,
+            "interpolation": key_block.interpolation,
+            "mute": key_block.mute,
+            "vertex_group": key_block.vertex_group,
+            "relative_key": key_block.relative_key.name,
+        }
+        for key_block in key_blocks
+    ]
+    index_by_name = {name: index for index, name in enumerate(names)}
+
+    # New order as (new name, old index or None for an empty key)
+    order = []
+    used_sources = set()
+    for arkit_name, source in zip(audio2faceFacsNames, arkit_key_sources(names)):
+        if source is not None:
+            order.append((arkit_name, index_by_name[source]))
+            used_sources.add(source)
+        elif create_missing_keys:
+            order.append((arkit_name, None))
+    arkit_names = {name for name, _ in order}
+    for index, name in enumerate(names[1:], start=1):
+        if name not in used_sources and name not in arkit_names:
+            order.append((name, index))
+
+    # Renamed keys: relative keys pointing to their old names must follow them
+    new_name_by_old = {names[old]: new for new, old in order if old is not None}
+
+    # Removing a key block deletes the drivers and fcurves on its path: park them on
+    # placeholder names first, then point them at the new names
+    shape_key = obj.data.shape_keys
+    animated_names = {names[old]: new for new, old in reversed(order) if old is not None}
+    placeholders = {old: f"__arkit_reorder_{index}__" for index, old in enumerate(animated_names)}
+    rename_key_block_paths(shape_key, placeholders)
+
+    # Remove all keys but the reference one, then add them back in the new order
+    for key_block in list(key_blocks)[1:]:
+        obj.shape_key_remove(key_block)
+    reference_name = names[0]
+    for new_name, old_index in order:
+        key_block = obj.shape_key_add(name=new_name, from_mix=False)
+        if old_index is None:
+            continue
+        key_block.data.foreach_set("co", shape_keys["coordinates"][old_index].reshape(-1))
+        for name, value in properties[old_index].items():
+            if name != "relative_key":
+                setattr(key_block, name, value)
+    for new_name, old_index in order:
+        if old_index is None:
+            continue
+        relative_name = properties[old_index]["relative_key"]
+        relative_name = new_name_by_old.get(relative_name, relative_name)
+        if relative_name != reference_name and relative_name in key_blocks:
+            key_blocks[new_name].relative_key = key_blocks[relative_name]
+    retargeted = rename_key_block_paths(
+        shape_key, {placeholders[old]: new for old, new in animated_names.items()}
+    )
+    if retargeted:
+        print(f"- {obj.name}: {retargeted} animation paths re-targeted to renamed keys")
+    obj.data.update()
+
+    new_index_by_name = {name: index for index, (name, _) in enumerate(order)}
+    return [new_index_by_name.get(arkit_name, -1) for arkit_name in audio2faceFacsNames]
+
+
+def export_arkit_index_map(objects, path=None):
+    """Reorder keys of all objects and write the sidecar index map."""
+    if path is None:
+        directory = os.path.dirname(bpy.data.filepath) or script_dir
+        path = os.path.join(directory, "arkit_index_map.json")
+
+    index_map = {"version": index_map_version, "facsNames": audio2faceFacsNames, "meshes": {}}
+    for obj in objects:
+        if obj.type != "MESH" or not obj.data.shape_keys:
+            print(f"Skipping '{obj.name}': not a mesh with shape keys.")
+            continue
+        if obj.data.name in index_map["meshes"]:
+            index_map["meshes"][obj.data.name]["objects"].append(obj.name)
+            continue
+        target_indices = reorder_arkit_shapekeys(obj)
+        index_map["meshes"][obj.data.name] = {
+            "objects": [obj.name],
+            "targetIndices": target_indices,
+        }
+        print(
+            f"- {obj.name}: {sum(index >= 0 for index in target_indices)} ARKit keys "
+            "in leading indices"
+        )
+
+    with open(path, "w") as file:
+        json.dump(index_map, file, indent=2)
+    print(f"ARKit index map saved to '{path}'.")
+    return index_map
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    selected = [bpy.data.objects[name] for name in args] or list(bpy.context.selected_objects)
+    export_arkit_index_map(selected)
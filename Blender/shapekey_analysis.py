@@ -0,0 +1,332 @@
+import hashlib
+
+import numpy as np
+
+# Bulk (vectorized) shape key analysis.
+# Coordinates are read once with `foreach_get` into NumPy arrays, so all checks run over all keys
+# at once instead of looping over `key_block.data` in Python (which was very slow for Daz meshes
+# with hundreds of keys and ~25k vertices). Vertex group weights are the exception: Blender has
+# no bulk accessor for them (see `read_vertex_group_weights`).
+# This module doesn't import bpy, so it can be imported and tested outside of Blender.
+
+
+def read_coordinates(collection):
+    """Read `co` of a bpy collection (mesh.vertices or key_block.data) into an (N, 3) array."""
+    coordinates = np.empty(len(collection) * 3, dtype=np.float32)
+    collection.foreach_get("co", coordinates)
+    return coordinates.reshape(-1, 3)
+
+
+def read_shape_keys(mesh):
+    """
+    Read all shape keys of a mesh in bulk.
+
+    Args:
+        mesh (bpy.types.Mesh): Mesh datablock with shape keys.
+
+    Returns:
+        dict: With the following keys:
+
+            names (list[str]): Key block names, in key_blocks order.
+            coordinates (np.ndarray): (K, N, 3) float32 coordinates of every key block.
+            relative_indices (np.ndarray): (K,) index of the `relative_key` of every key block.
+            vertex_groups (list[str]): Name of the vertex group of every key block ("" if none).
+            use_relative (bool): False for absolute shape keys.
+    """
+    key_blocks = mesh.shape_keys.key_blocks
+    names = [key_block.name for key_block in key_blocks]
+    index_by_name = {name: index for index, name in enumerate(names)}
+
+    coordinates = np.empty((len(key_blocks), len(mesh.vertices), 3), dtype=np.float32)
+    for index, key_block in enumerate(key_blocks):
+        key_block.data.foreach_get("co", coordinates[index].reshape(-1))
+
+    relative_indices = np.array(
+        [index_by_name.get(key_block.relative_key.name, -1) for key_block in key_blocks],
+        dtype=np.int64,
+    )
+
+    return {
+        "names": names,
+        "coordinates": coordinates,
+        "relative_indices": relative_indices,
+        "vertex_groups": [key_block.vertex_group for key_block in key_blocks],
+        "use_relative": mesh.shape_keys.use_relative,
+    }
+
+
+def read_vertex_group_weights(obj, group_names=None):
+    """
+    Read weights of vertex groups into dense (N,) arrays (0 for vertices not in the group).
+
+    Not a bulk read: Blender has no `foreach_get` for vertex group weights, so this loops in
+    Python over every vertex and its group elements (once for all requested groups).
+
+    Args:
+        obj (bpy.types.Object): Mesh object owning the vertex groups.
+        group_names (iterable[str], optional): Groups to read. Defaults to all groups.
+
+    Returns:
+        dict[str, np.ndarray]: Weights by vertex group name (missing groups are left out).
+    """
+    if group_names is None:
+        group_names = [group.name for group in obj.vertex_groups]
+    group_indices = {}
+    for name in set(group_names):
+        group = obj.vertex_groups.get(name)
+        if group is not None:
+            group_indices[group.index] = name
+    if not group_indices:
+        return {}
+
+    weights = np.zeros((len(group_indices), len(obj.data.vertices)), dtype=np.float32)
+    row_by_group = {group_index: row for row, group_index in enumerate(group_indices)}
+    for vertex in obj.data.vertices:
+        for element in vertex.groups:
+            row = row_by_group.get(element.group)
+            if row is not None:
+                weights[row, vertex.index] = element.weight
+
+    return {name: weights[row_by_group[index]] for index, name in group_indices.items()}
+
+
+def key_deltas(coordinates, relative_indices):
+    """(K, N, 3) displacement of every key against its relative key."""
+    return coordinates - coordinates[relative_indices]
+
+
+def displacement_lengths(deltas):
+    """(K, N) length of the displacement of every vertex in every key."""
+    return np.sqrt(np.einsum("knc,knc->kn", deltas, deltas))
+
+
+def count_affected_vertices(deltas, threshold=0.0):
+    """(K,) number of vertices moved by more than `threshold` for every key."""
+    return np.count_nonzero(displacement_lengths(deltas) > threshold, axis=1)
+
+
+def resolve_relative_chains(relative_indices, reference_index=0):
+    """
+    Follow `relative_key` chains of all keys at once (pointer doubling).
+
+    Returns:
+        np.ndarray: (K,) bool, True for keys whose chain ends at the reference key.
+            Chains ending in a cycle, in a missing key (-1) or in a key relative to itself
+            (other than the reference key) are False.
+    """
+    parents = np.asarray(relative_indices).copy()
+    valid = parents >= 0
+    parents[~valid] = reference_index
+    # A key relative to itself is a dead end, unless it's the reference (Basis) key
+    self_relative = parents == np.arange(len(parents))
+    self_relative[reference_index] = False
+    valid &= ~self_relative
+
+    for _ in range(max(1, int(np.ceil(np.log2(max(len(parents), 2)))) + 1)):
+        valid &= valid[parents]
+        parents = parents[parents]
+
+    return valid & (parents == reference_index)
+
+
+def apply_vertex_group_weights(deltas, vertex_groups, group_weights):
+    """
+    Scale deltas of keys masked by a vertex group by its weights (delta × weight), in place.
+
+    Blender multiplies the effect of a key by the weight of its `vertex_group`, so raw deltas
+    overcount the vertices a key really moves. Keys pointing to a missing group aren't masked
+    (same as in Blender).
+
+    Args:
+        deltas (np.ndarray): (K, N, 3) raw deltas, see `key_deltas`.
+        vertex_groups (list[str]): Vertex group name of every key ("" if none).
+        group_weights (dict[str, np.ndarray]): (N,) weights by group name,
+            see `read_vertex_group_weights`.
+
+    Returns:
+        np.ndarray: The same `deltas` array, now holding effective deltas.
+    """
+    for index, group in enumerate(vertex_groups):
+        weights = group_weights.get(group) if group else None
+        if weights is not None:
+            deltas[index] *= weights[:, np.newaxis]
+    return deltas
+
+
+def read_effective_deltas(obj):
+    """
+    Read all keys of a mesh object and compute their effective (vertex group masked) deltas.
+
+    Returns:
+        tuple[dict, np.ndarray]: Shape keys (see `read_shape_keys`)
+            and (K, N, 3) effective deltas.
+    """
+    shape_keys = read_shape_keys(obj.data)
+    deltas = key_deltas(shape_keys["coordinates"], shape_keys["relative_indices"])
+    group_weights = read_vertex_group_weights(obj, [g for g in shape_keys["vertex_groups"] if g])
+    apply_vertex_group_weights(deltas, shape_keys["vertex_groups"], group_weights)
+    return shape_keys, deltas
+
+
+def rebuild_coordinates(coordinates, deltas, relative_indices, changed, reference_index=0):
+    """
+    Rebuild coordinates of changed keys from their new deltas (relative key + delta), and of all
+    keys relative to them, so those keep their own deltas. Other keys are left untouched.
+
+    Keys with invalid chains (see `resolve_relative_chains`) are only rebuilt if changed.
+
+    Args:
+        coordinates (np.ndarray): (K, N, 3) original key coordinates.
+        deltas (np.ndarray): (K, N, 3) new deltas of every key against its relative key.
+        relative_indices (np.ndarray): (K,) index of the relative key of every key.
+        changed (np.ndarray): (K,) bool, keys whose deltas were changed.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (K, N, 3) new coordinates, (K,) bool rebuilt keys.
+    """
+    valid_chains = resolve_relative_chains(relative_indices, reference_index)
+    new_coordinates = coordinates.copy()
+    rebuilt = np.asarray(changed, dtype=bool).copy()
+    rebuilt[reference_index] = False
+    done = ~valid_chains
+    done[reference_index] = True
+
+    for index in range(len(coordinates)):
+        chain = []
+        while not done[index]:
+            chain.append(index)
+            index = relative_indices[index]
+        for index in reversed(chain):
+            rebuilt[index] |= rebuilt[relative_indices[index]]
+            done[index] = True
+
+    for index in np.flatnonzero(rebuilt & ~valid_chains):
+        new_coordinates[index] = coordinates[relative_indices[index]] + deltas[index]
+    # Valid chains in order of depth, so relative keys are always rebuilt first
+    pending = rebuilt & valid_chains
+    while pending.any():
+        ready = pending & ~pending[relative_indices]
+        for index in np.flatnonzero(ready):
+            new_coordinates[index] = new_coordinates[relative_indices[index]] + deltas[index]
+        pending &= ~ready
+
+    return new_coordinates, rebuilt
+
+
+def bake_vertex_groups(obj, key_names=None):
+    """
+    Bake vertex group masks into key coordinates, so exported keys (glTF morph targets)
+    don't need runtime masking. Keys relative to a baked key keep their own deltas.
+
+    Args:
+        obj (bpy.types.Object): Mesh object with shape keys.
+        key_names (iterable[str], optional): Keys to bake. Defaults to all masked keys.
+
+    Returns:
+        list[str]: Names of the baked keys.
+    """
+    key_blocks = obj.data.shape_keys.key_blocks
+    shape_keys = read_shape_keys(obj.data)
+    names = shape_keys["names"]
+    relative_indices = shape_keys["relative_indices"]
+    deltas = key_deltas(shape_keys["coordinates"], relative_indices)
+
+    wanted = set(names if key_names is None else key_names)
+    vertex_groups = [
+        group if name in wanted else "" for name, group in zip(names, shape_keys["vertex_groups"])
+    ]
+    group_weights = read_vertex_group_weights(obj, [group for group in vertex_groups if group])
+    apply_vertex_group_weights(deltas, vertex_groups, group_weights)
+
+    masked = np.array([bool(group) and group in group_weights for group in vertex_groups])
+    coordinates, rebuilt = rebuild_coordinates(
+        shape_keys["coordinates"], deltas, relative_indices, masked
+    )
+    for index in np.flatnonzero(rebuilt):
+        key_blocks[index].data.foreach_set("co", coordinates[index].reshape(-1))
+
+    baked = []
+    for index, group in enumerate(vertex_groups):
+        if group:
+            key_blocks[index].vertex_group = ""
+            baked.append(names[index])
+    obj.data.update()
+    return baked
+
+
+def read_triangles(mesh):
+    """(T, 3) vertex indices of the mesh triangles (loop triangles)."""
+    mesh.calc_loop_triangles()
+    triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", triangles)
+    return triangles.reshape(-1, 3)
+
+
+def vertex_normals(coordinates, triangles):
+    """
+    Area-weighted vertex normals, with vectorized cross products over all triangles.
+
+    Args:
+        coordinates (np.ndarray): (N, 3) vertex coordinates.
+        triangles (np.ndarray): (T, 3) vertex indices, see `read_triangles`.
+
+    Returns:
+        np.ndarray: (N, 3) unit normals (zeros for loose vertices).
+    """
+    corners = coordinates[triangles]
+    # Cross product length is 2 × triangle area, so bigger faces weigh more
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    vertex_indices = triangles.reshape(-1)
+    normals = np.empty(coordinates.shape, dtype=np.float64)
+    for axis in range(3):
+        normals[:, axis] = np.bincount(
+            vertex_indices,
+            weights=np.repeat(face_normals[:, axis], 3),
+            minlength=len(coordinates),
+        )
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+    return normals.astype(np.float32)
+
+
+def normal_deltas(coordinates, triangles, reference_index=0):
+    """
+    Per-vertex normal deltas of every key against the reference key (glTF morph target NORMAL).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (K, N, 3) normal deltas and (K, N) angle between
+            the reference and the morphed normal, in degrees.
+    """
+    reference_normals = vertex_normals(coordinates[reference_index], triangles)
+    deltas = np.empty_like(coordinates)
+    angles = np.empty(coordinates.shape[:2], dtype=np.float32)
+    for index, key_coordinates in enumerate(coordinates):
+        normals = vertex_normals(key_coordinates, triangles)
+        deltas[index] = normals - reference_normals
+        cosines = np.einsum("nc,nc->n", normals, reference_normals)
+        angles[index] = np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0)))
+    return deltas, angles
+
+
+def summarize_deltas(deltas, minimum_displacement=0.0, duplicate_tolerance=1e-5):
+    """
+    Per-key numbers used by pruning, duplicate and sparsity analyses.
+
+    Args:
+        deltas (np.ndarray): (K, N, 3) effective deltas.
+        minimum_displacement (float, optional): Vertices moved less don't count as affected.
+        duplicate_tolerance (float, optional): Keys with equal deltas rounded to this
+            get equal hashes.
+
+    Returns:
+        dict: affected (list[int]), max_displacement (list[float]) and hashes (list[str]).
+    """
+    lengths = displacement_lengths(deltas)
+    moved = lengths > minimum_displacement
+    quantized = np.round(deltas / duplicate_tolerance).astype(np.int64)
+    quantized[~moved] = 0
+    return {
+        "affected": np.count_nonzero(moved, axis=1).tolist(),
+        "max_displacement": lengths.max(axis=1, initial=0.0).tolist(),
+        "hashes": [hashlib.sha1(key.tobytes()).hexdigest() for key in quantized],
+    }
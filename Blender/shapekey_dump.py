@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Shape key analysis without Blender, on a dump written by export_shapekey_dump.py.
+# Arrays are opened with np.load(mmap_mode="r"), so nothing is copied until it's used and
+# worker processes share the OS page cache instead of pickling coordinates.
+# Usage:
+#   python shapekey_dump.py /path/to/dump [--processes 8] [--json report.json]
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from export_cache import script_parameters  # noqa: E402
+from shapekey_analysis import apply_vertex_group_weights, summarize_deltas  # noqa: E402
+
+# Same pruning parameters as the Blender script
+pruning_parameters = script_parameters(os.path.join(script_dir, "remove_unused_shapekeys.py"))
+minimum_vertices_affected_to_keep = pruning_parameters.get("minimum_vertices_affected_to_keep", 80)
+minimum_displacement = pruning_parameters.get("minimum_displacement", 0.0)
+# Keys with the same effective deltas rounded to this (in meters) are duplicates
+duplicate_tolerance = 1e-5
+# Max number of keys analysed by one task, so big meshes are split across processes
+keys_per_task = 64
+
+
+def open_dump(dump_dir):
+    """Read manifest.json of a dump."""
+    with open(os.path.join(dump_dir, "manifest.json"), encoding="utf-8") as file:
+        return json.load(file)
+
+
+def load_mesh(dump_dir, mesh_name, manifest=None):
+    """
+    Open all arrays of one mesh, memory-mapped (zero-copy, read only).
+
+    Returns:
+        dict: Mesh manifest entry plus base, keys, relative_indices, vertex_groups and
+            triangles arrays (see export_shapekey_dump.py).
+    """
+    if manifest is None:
+        manifest = open_dump(dump_dir)
+    mesh = dict(manifest["meshes"][mesh_name])
+    mesh_dir = os.path.join(dump_dir, mesh["folder"])
+    for name in ("base", "keys", "relative_indices", "vertex_groups", "triangles"):
+        mesh[name] = np.load(os.path.join(mesh_dir, f"{name}.npy"), mmap_mode="r")
+    return mesh
+
+
+def effective_deltas(mesh, start=0, stop=None):
+    """(stop - start, N, 3) effective (vertex group masked) deltas of a range of keys."""
+    stop = len(mesh["key_names"]) if stop is None else stop
+    relative_indices = np.asarray(mesh["relative_indices"][start:stop])
+    deltas = mesh["keys"][start:stop] - mesh["keys"][relative_indices]
+    group_weights = dict(zip(mesh["vertex_group_names"], mesh["vertex_groups"]))
+    return apply_vertex_group_weights(deltas, mesh["key_vertex_groups"][start:stop], group_weights)
+
+
+def analyze_keys(dump_dir, mesh_name, start, stop):
+    """
+    Counting, duplicate hashing and sparsity of keys [start, stop) of one mesh.
+    Runs in a worker process, arrays are memory-mapped there.
+    """
+    mesh = load_mesh(dump_dir, mesh_name)
+    deltas = effective_deltas(mesh, start, stop)
+    summary = summarize_deltas(deltas, minimum_displacement, duplicate_tolerance)
+    return {"names": mesh["key_names"][start:stop], **summary}
+
+
+def _tasks(dump_dir, manifest):
+    for mesh_name, mesh in manifest["meshes"].items():
+        key_count = len(mesh["key_names"])
+        for start in range(0, key_count, keys_per_task):
+            yield dump_dir, mesh_name, start, min(start + keys_per_task, key_count)
+
+
+def analyze_dump(dump_dir, processes=None):
+    """
+    Run counting, pruning, duplicate and sparsity analyses on every mesh of a dump,
+    in a process pool (`processes=1` runs in this process).
+
+    Returns:
+        dict: Report by mesh name, with affected vertex counts, keys to delete
+            (like remove_unused_shapekeys.py), groups of duplicate keys and sparsity.
+    """
+    manifest = open_dump(dump_dir)
+    tasks = list(_tasks(dump_dir, manifest))
+    if processes == 1:
+        results = [analyze_keys(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(analyze_keys, *zip(*tasks))) if tasks else []
+
+    report = {}
+    for (_, mesh_name, _, _), result in zip(tasks, results):
+        mesh_report = report.setdefault(
+            mesh_name, {"affected": {}, "max_displacement": {}, "_hashes": {}}
+        )
+        for name, affected, key_hash, max_displacement in zip(
+            result["names"], result["affected"], result["hashes"], result["max_displacement"]
+        ):
+            mesh_report["affected"][name] = affected
+            mesh_report["max_displacement"][name] = max_displacement
+            if affected:
+                mesh_report["_hashes"].setdefault(key_hash, []).append(name)
+
+    for mesh_name, mesh_report in report.items():
+        mesh = manifest["meshes"][mesh_name]
+        reference = mesh["key_names"][0]
+        vertex_count = mesh["vertex_count"]
+        affected = mesh_report["affected"]
+        moved_total = sum(affected.values())
+
+        mesh_report["delete"] = [
+            name
+            for name, count in affected.items()
+            if name != reference and name != "Basic" and count < minimum_vertices_affected_to_keep
+        ]
+        mesh_report["duplicates"] = [
+            names for names in mesh_report.pop("_hashes").values() if len(names) > 1
+        ]
+        # Dense: 3 floats per vertex per key, sparse: index + 3 floats per moved vertex
+        key_count = max(len(affected) - 1, 0)
+        mesh_report["sparsity"] = {
+            "moved_fraction": moved_total / max(key_count * vertex_count, 1),
+            "dense_bytes": key_count * vertex_count * 12,
+            "sparse_bytes": moved_total * 16,
+        }
+    return report
+
+
+def print_report(report):
+    for mesh_name, mesh_report in report.items():
+        sparsity = mesh_report["sparsity"]
+        print("------------------------")
+        print(f"Mesh: {mesh_name}")
+        print(f"- keys: {len(mesh_report['affected'])}")
+        print(f"- to delete ({len(mesh_report['delete'])}): {mesh_report['delete']}")
+        print(f"- duplicates ({len(mesh_report['duplicates'])}): {mesh_report['duplicates']}")
+        print(
+            f"- moved vertices: {sparsity['moved_fraction']:.1%}, "
+            f"dense {sparsity['dense_bytes'] / 1e6:.2f} MB, "
+            f"sparse {sparsity['sparse_bytes'] / 1e6:.2f} MB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse a shape key dump without Blender.")
+    parser.add_argument("dump_dir")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--json", help="Save the report to this file")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    report = analyze_dump(args.dump_dir, args.processes)
+    print_report(report)
+    print(f"\nAnalysed in {time.perf_counter() - start_time:.2f} s.")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
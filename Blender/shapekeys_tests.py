@@ -1,5 +1,19 @@
+import os
+import sys
+
 import bpy
 
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from shapekey_analysis import (  # noqa: E402
+    apply_vertex_group_weights,
+    count_affected_vertices as count_affected_vertices_bulk,
+    read_coordinates,
+    read_vertex_group_weights,
+)
+
 # Shape key names to investigate
 shape_key_names = [
     "tear_l",
@@ -14,17 +28,20 @@ shape_key_names = [
 
 
 # Function to count vertices affected by a shape key
-def count_affected_vertices(shape_key_block):
-    base_mesh = shape_key_block.relative_key
-    affected_count = 0
+# (raw, and effective: scaled by the key's vertex group weights like Blender does)
+def count_affected_vertices(obj, shape_key_block):
+    deltas = (
+        read_coordinates(shape_key_block.data)
+        - read_coordinates(shape_key_block.relative_key.data)
+    )[None]
+    affected_count = count_affected_vertices_bulk(deltas)[0]
 
-    for i, key_point in enumerate(shape_key_block.data):
-        # Check if the vertex has moved from its base position
-        if (key_point.co - base_mesh.data[i].co).length > 0:
-            affected_count += 1
+    group = shape_key_block.vertex_group
+    apply_vertex_group_weights(deltas, [group], read_vertex_group_weights(obj, [group]))
+    effective_count = count_affected_vertices_bulk(deltas)[0]
 
-    print(f"Affectted vertices: {affected_count}")
-    return affected_count
+    print(f"Affectted vertices: {affected_count} (effective: {effective_count})")
+    return effective_count
 
 
 def print_shape_key_block_props(shape_key_block):
@@ -75,7 +92,7 @@ for obj in bpy.context.scene.objects:
                 shape_key_block = shape_keys[shape_key_name]
                 print(f"\nShape Key '{shape_key_name}'")
                 measure_shape_key_size(shape_key_block)
-                count_affected_vertices(shape_key_block)
+                count_affected_vertices(obj, shape_key_block)
                 print_shape_key_block_props(shape_key_block)
             else:
                 print(f"Shape Key '{shape_key_name}' not found in object '{obj.name}'.")
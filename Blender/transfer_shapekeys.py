@@ -0,0 +1,261 @@
+import hashlib
+import os
+import sys
+
+import bpy
+import numpy as np
+from mathutils import kdtree
+
+# Bulk transfer of shape keys from the head to dependent meshes (eyebrows, eyelashes, beard...),
+# which often lack keys the head has or carry stale copies (e.g. "Mouth Smile Widen" doesn't
+# move the beard, see TODO in facs_arkit_shape_keys.py).
+# Every dependent vertex is mapped once to the closest point on the head surface (triangle +
+# barycentric weights, found with a KD-tree over triangle centers). The mapping is cached,
+# then each key is transferred in one vectorized pass. Deltas are taken against each key's
+# relative key and keep that relative key on the target when it's transferred too (else basis).
+# Headless:
+#   blender -b avatar.blend --python transfer_shapekeys.py -- --head Head --targets Beard,Brows
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from export_cache import default_cache_dir  # noqa: E402
+from facs_arkit_shape_keys import a2fBlendshapesToShapeKeys  # noqa: E402
+from shapekey_analysis import (  # noqa: E402
+    read_coordinates,
+    read_effective_deltas,
+    read_triangles,
+)
+
+# Candidate triangles checked for every dependent vertex
+candidate_triangles = 8
+# Dependent vertices farther from the head surface (in meters) fade out and don't move
+# beyond `max_distance` (beard tips, hair strands)
+falloff_start = 0.005
+max_distance = 0.03
+mapping_cache_dir = os.path.join(default_cache_dir, "transfer")
+
+
+def closest_barycentric(points, a, b, c):
+    """
+    Barycentric coordinates of the closest points on triangles (a, b, c) to `points`,
+    vectorized version of "closest point on triangle" from Ericson's Real-Time Collision
+    Detection. All arguments are (..., 3) arrays, returns (..., 3) weights.
+    """
+    ab = b - a
+    ac = c - a
+    ap = points - a
+    bp = points - b
+    cp = points - c
+    d1 = np.einsum("...i,...i", ab, ap)
+    d2 = np.einsum("...i,...i", ac, ap)
+    d3 = np.einsum("...i,...i", ab, bp)
+    d4 = np.einsum("...i,...i", ac, bp)
+    d5 = np.einsum("...i,...i", ab, cp)
+    d6 = np.einsum("...i,...i", ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = va + vb + vc
+        v = np.nan_to_num(vb / denominator)
+        w = np.nan_to_num(vc / denominator)
+        weights = np.stack([1.0 - v - w, v, w], axis=-1)
+
+        def set_region(mask, u, v, w):
+            weights[mask] = np.stack([u, v, w], axis=-1)[mask]
+
+        # Regions in reverse order of Ericson's checks, so earlier checks win
+        edge = np.nan_to_num((d4 - d3) / ((d4 - d3) + (d5 - d6)))
+        zero = np.zeros_like(d1)
+        one = np.ones_like(d1)
+        set_region((va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0), zero, 1.0 - edge, edge)
+        edge = np.nan_to_num(d2 / (d2 - d6))
+        set_region((vb <= 0) & (d2 >= 0) & (d6 <= 0), 1.0 - edge, zero, edge)
+        set_region((d6 >= 0) & (d5 <= d6), zero, zero, one)
+        edge = np.nan_to_num(d1 / (d1 - d3))
+        set_region((vc <= 0) & (d1 >= 0) & (d3 <= 0), 1.0 - edge, edge, zero)
+        set_region((d3 >= 0) & (d4 <= d3), zero, one, zero)
+        set_region((d1 <= 0) & (d2 <= 0), one, zero, zero)
+    return weights
+
+
+def build_surface_mapping(head_coordinates, head_triangles, points):
+    """
+    Map points to the closest point on the head surface.
+
+    Returns:
+        dict: triangles (M, 3) head vertex indices, weights (M, 3) barycentric weights,
+            distances (M,) distance to the head surface.
+    """
+    corners = head_coordinates[head_triangles]
+    centers = corners.mean(axis=1)
+    tree = kdtree.KDTree(len(centers))
+    for index, center in enumerate(centers):
+        tree.insert(center, index)
+    tree.balance()
+
+    count = min(candidate_triangles, len(centers))
+    candidates = np.empty((len(points), count), dtype=np.int64)
+    for index, point in enumerate(points):
+        found = [found_index for _, found_index, _ in tree.find_n(point, count)]
+        candidates[index] = found + found[-1:] * (count - len(found))
+
+    candidate_corners = corners[candidates]  # (M, C, 3, 3)
+    candidate_points = np.broadcast_to(points[:, np.newaxis], candidates.shape + (3,))
+    weights = closest_barycentric(
+        candidate_points,
+        candidate_corners[:, :, 0],
+        candidate_corners[:, :, 1],
+        candidate_corners[:, :, 2],
+    )
+    closest = np.einsum("mcj,mcjk->mck", weights, candidate_corners)
+    distances = np.linalg.norm(closest - candidate_points, axis=2)
+    best = distances.argmin(axis=1)
+    rows = np.arange(len(points))
+
+    return {
+        "triangles": head_triangles[candidates[rows, best]],
+        "weights": weights[rows, best].astype(np.float32),
+        "distances": distances[rows, best].astype(np.float32),
+    }
+
+
+def _mapping_key(*arrays):
+    digest = hashlib.sha256()
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(repr((candidate_triangles,)).encode())
+    return digest.hexdigest()
+
+
+def get_surface_mapping(head_coordinates, head_triangles, points):
+    """`build_surface_mapping`, cached on disk by the content of the meshes."""
+    path = os.path.join(
+        mapping_cache_dir, f"{_mapping_key(head_coordinates, head_triangles, points)}.npz"
+    )
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            return {name: cached[name] for name in cached.files}
+    mapping = build_surface_mapping(head_coordinates, head_triangles, points)
+    os.makedirs(mapping_cache_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **mapping)
+    os.replace(tmp_path, path)
+    return mapping
+
+
+def _to_matrix(matrix):
+    return np.array([list(row) for row in matrix], dtype=np.float64)
+
+
+def transfer_shapekeys(head, targets, key_names):
+    """
+    Transfer keys from the head to dependent mesh objects (missing keys are added,
+    existing ones are overwritten).
+
+    Args:
+        head (bpy.types.Object): Source mesh object with shape keys.
+        targets (list[bpy.types.Object]): Dependent mesh objects.
+        key_names (list[str]): Keys to transfer (keys missing on the head are skipped).
+
+    Returns:
+        dict[str, list[str]]: Transferred key names by target object name.
+    """
+    shape_keys, head_deltas = read_effective_deltas(head)
+    head_coordinates = shape_keys["coordinates"][0]
+    head_triangles = read_triangles(head.data)
+    index_by_name = {name: index for index, name in enumerate(shape_keys["names"])}
+    missing = [name for name in key_names if name not in index_by_name]
+    if missing:
+        print(f"Keys not found on '{head.name}', skipped: {missing}")
+    key_names = [name for name in key_names if name in index_by_name]
+    # Deltas are against each key's relative key: write relative keys first, so a key can be
+    # relative to the same (transferred) key on the target
+    relative_names = relative_key_names(shape_keys, key_names)
+    key_names = sorted(key_names, key=lambda name: _relative_depth(name, relative_names))
+
+    head_world = _to_matrix(head.matrix_world)
+    transferred = {}
+    for target in targets:
+        # Work in the head's local space, write deltas in the target's local space
+        to_head = np.linalg.inv(head_world) @ _to_matrix(target.matrix_world)
+        points = read_coordinates(target.data.vertices).astype(np.float64)
+        points = points @ to_head[:3, :3].T + to_head[:3, 3]
+        mapping = get_surface_mapping(head_coordinates, head_triangles, points)
+        delta_to_target = np.linalg.inv(to_head[:3, :3]).T
+
+        falloff = np.clip(
+            (max_distance - mapping["distances"]) / (max_distance - falloff_start), 0.0, 1.0
+        )
+        weights = mapping["weights"] * falloff[:, np.newaxis]
+
+        if not target.data.shape_keys:
+            target.shape_key_add(name="Basis", from_mix=False)
+        key_blocks = target.data.shape_keys.key_blocks
+        basis = read_coordinates(key_blocks[0].data)
+
+        written = {}
+        for name in key_names:
+            corner_deltas = head_deltas[index_by_name[name]][mapping["triangles"]]  # (M, 3, 3)
+            deltas = np.einsum("mj,mjk->mk", weights, corner_deltas) @ delta_to_target
+            key_block = key_blocks.get(name) or target.shape_key_add(name=name, from_mix=False)
+            relative_name = relative_names.get(name)
+            if relative_name in written:
+                key_block.relative_key = key_blocks[relative_name]
+                reference = written[relative_name]
+            else:
+                key_block.relative_key = key_blocks[0]
+                reference = basis
+            key_block.vertex_group = ""
+            coordinates = (reference + deltas).astype(np.float32)
+            key_block.data.foreach_set("co", coordinates.reshape(-1))
+            written[name] = coordinates
+        target.data.update()
+        transferred[target.name] = key_names
+        print(f"- {target.name}: transferred {len(key_names)} keys")
+    return transferred
+
+
+def relative_key_names(shape_keys, key_names):
+    """Relative key of every key to transfer that is itself transferred (not the basis)."""
+    names = shape_keys["names"]
+    transferred = set(key_names)
+    relative_names = {}
+    for name in key_names:
+        relative_index = shape_keys["relative_indices"][names.index(name)]
+        relative_name = names[relative_index] if relative_index > 0 else None
+        if relative_name in transferred and relative_name != name:
+            relative_names[name] = relative_name
+    return relative_names
+
+
+def _relative_depth(name, relative_names):
+    depth = 0
+    seen = {name}
+    while name in relative_names and relative_names[name] not in seen:
+        name = relative_names[name]
+        seen.add(name)
+        depth += 1
+    return depth
+
+
+def arkit_shape_key_names():
+    """Unique non-empty shape keys mapped from the 52 ARKit (A2F) blendshapes."""
+    return list(dict.fromkeys(name for name in a2fBlendshapesToShapeKeys.values() if name))
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    head_name = args[args.index("--head") + 1] if "--head" in args else None
+    target_names = args[args.index("--targets") + 1].split(",") if "--targets" in args else []
+    head_object = bpy.data.objects.get(head_name) if head_name else bpy.context.object
+    if head_object is None or head_object.type != "MESH" or not head_object.data.shape_keys:
+        print("Select the head mesh (with shape keys) or pass --head NAME.")
+        sys.exit(1)
+    target_objects = [bpy.data.objects[name] for name in target_names] or [
+        obj for obj in bpy.context.selected_objects if obj.type == "MESH" and obj != head_object
+    ]
+    transfer_shapekeys(head_object, target_objects, arkit_shape_key_names())
@@ -1,17 +1,105 @@
 import bpy
+from mathutils import Matrix
 
-# Iterate over all objects in the scene
-for obj in bpy.data.objects:
-    # Check if the object has an Armature modifier
-    has_armature_modifier = False
+# Unparent all skinned meshes (garments, hair, head...) and bake their world transforms
+# into mesh data, without calling bpy.ops per object.
+# `bpy.ops.object.transform_apply` depends on selection/context and triggers a full scene update
+# on every call, so with hundreds of garment meshes it was very slow (and it applied transforms
+# to whatever was selected, not to the object in the loop).
+# Works headless: blender -b avatar.blend --python unparent_skinned_meshes.py
+
+
+def is_skinned(obj):
+    """Object is deformed by an armature modifier or is directly parented to an armature."""
+    if obj.type != "MESH":
+        return False
     for modifier in obj.modifiers:
         if modifier.type == "ARMATURE":
-            has_armature_modifier = True
-            break
-
-    # If the object has an armature modifier or is directly parented to an armature
-    if (has_armature_modifier or obj.find_armature()) and obj.parent:
-        # Unparent the object but keep transformations
-        obj.parent = None
-        # Apply all transformations (location, rotation, scale)
-        bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
+            return True
+    return obj.find_armature() is not None
+
+
+def matrices_equal(a, b, tolerance=1e-6):
+    return all(abs(a[row][col] - b[row][col]) <= tolerance for row in range(4) for col in range(4))
+
+
+def group_by_matrix(objects, world_matrices):
+    """Split objects sharing one mesh datablock into groups with (almost) the same world matrix."""
+    groups = []  # list of (matrix, [objects])
+    for obj in objects:
+        matrix = world_matrices[obj.name]
+        for group_matrix, group_objects in groups:
+            if matrices_equal(group_matrix, matrix):
+                group_objects.append(obj)
+                break
+        else:
+            groups.append((matrix, [obj]))
+    return groups
+
+
+def unparent_skinned_meshes(objects=None):
+    """
+    Clear parents of all skinned mesh objects, keeping their world transforms,
+    and apply location/rotation/scale directly to the mesh data (with shape keys).
+
+    Args:
+        objects (iterable[bpy.types.Object], optional): Objects to process.
+            Defaults to all objects in bpy.data.
+
+    Returns:
+        list[str]: Names of the unparented objects.
+    """
+    if objects is None:
+        objects = bpy.data.objects
+
+    # One pass: find all skinned objects with a parent
+    skinned = [obj for obj in objects if obj.parent and is_skinned(obj)]
+    if not skinned:
+        print("No parented skinned meshes found.")
+        return []
+
+    # Single depsgraph update, so matrix_world is valid for all objects at once
+    bpy.context.view_layer.update()
+    world_matrices = {obj.name: obj.matrix_world.copy() for obj in skinned}
+
+    # Group objects by mesh datablock, so a transform shared by several users is applied once
+    users_by_mesh = {}
+    for obj in skinned:
+        users_by_mesh.setdefault(obj.data, []).append(obj)
+
+    identity = Matrix.Identity(4)
+    baked_meshes = 0
+    for mesh, users in users_by_mesh.items():
+        # Users of the mesh outside of our selection would be moved by baking, so they count too
+        other_users = mesh.users - len(users) - (1 if mesh.use_fake_user else 0)
+        groups = group_by_matrix(users, world_matrices)
+
+        for group_index, (matrix, group_objects) in enumerate(groups):
+            # First group keeps the original datablock (if nobody else uses it),
+            # other groups need their own copy because their world matrix differs
+            if group_index == 0 and other_users == 0:
+                target_mesh = mesh
+            else:
+                target_mesh = mesh.copy()
+                for obj in group_objects:
+                    obj.data = target_mesh
+
+            target_mesh.transform(matrix, shape_keys=True)
+            if matrix.is_negative:
+                target_mesh.flip_normals()
+            target_mesh.update()
+            baked_meshes += 1
+
+            for obj in group_objects:
+                # Children of the object keep their world transform too
+                for child in obj.children:
+                    child.matrix_parent_inverse = matrix @ child.matrix_parent_inverse
+                obj.parent = None
+                obj.matrix_world = identity
+
+    print(f"Unparented {len(skinned)} skinned objects, baked {baked_meshes} mesh datablocks.")
+    return [obj.name for obj in skinned]
+
+
+if __name__ == "__main__":
+    unparent_skinned_meshes()
@@ -0,0 +1,162 @@
+import os
+import sys
+
+import bpy
+import numpy as np
+
+# Validate shape keys before export, so broken avatars never reach the web build.
+# Exits with status 1 if any error is found (warnings don't fail the run).
+# Headless:
+#   blender -b avatar.blend --python-exit-code 1 --python validate_shapekeys.py -- --head Head
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from facs_arkit_shape_keys import (  # noqa: E402
+    a2fBlendshapesToShapeKeys,
+    a2fEmotionNamesToShapeKeys,
+)
+from shapekey_analysis import (  # noqa: E402
+    count_affected_vertices,
+    key_deltas,
+    read_shape_keys,
+    read_vertex_group_weights,
+    resolve_relative_chains,
+)
+
+# Coordinates above this (in meters) are treated as corrupted data
+max_coordinate = 1000.0
+
+
+def find_head_mesh(head_name=None):
+    """Return the head mesh object: by name, or the mesh with the most shape keys."""
+    if head_name:
+        obj = bpy.data.objects.get(head_name)
+        if obj is None or obj.type != "MESH" or not obj.data.shape_keys:
+            return None
+        return obj
+    meshes = [obj for obj in bpy.data.objects if obj.type == "MESH" and obj.data.shape_keys]
+    if not meshes:
+        return None
+    return max(meshes, key=lambda obj: len(obj.data.shape_keys.key_blocks))
+
+
+def check_mapping_targets(key_names):
+    """Every non-empty target of the A2F mapping tables must exist on the head mesh."""
+    errors = []
+    warnings = []
+    existing = set(key_names)
+    for table_name, table in (
+        ("a2fBlendshapesToShapeKeys", a2fBlendshapesToShapeKeys),
+        ("a2fEmotionNamesToShapeKeys", a2fEmotionNamesToShapeKeys),
+    ):
+        sources_by_target = {}
+        for source, target in table.items():
+            if not target:
+                continue
+            sources_by_target.setdefault(target, []).append(source)
+            if target not in existing:
+                errors.append(f"{table_name}['{source}'] -> '{target}' not found on head mesh")
+        for target, sources in sources_by_target.items():
+            if len(sources) > 1:
+                warnings.append(f"{table_name}: {sources} share one shape key '{target}'")
+    return errors, warnings
+
+
+def check_shape_keys(obj):
+    """Vectorized checks over all key blocks of one mesh object."""
+    errors = []
+    warnings = []
+    shape_keys = read_shape_keys(obj.data)
+    names = shape_keys["names"]
+    coordinates = shape_keys["coordinates"]
+
+    # NaN/inf or huge coordinates
+    broken_vertices = np.count_nonzero(
+        ~np.isfinite(coordinates).all(axis=2) | (np.abs(coordinates) > max_coordinate).any(axis=2),
+        axis=1,
+    )
+    for index in np.flatnonzero(broken_vertices):
+        errors.append(
+            f"'{names[index]}' has {broken_vertices[index]} NaN or huge (> {max_coordinate}) "
+            "coordinates"
+        )
+
+    if not shape_keys["use_relative"]:
+        warnings.append("absolute shape keys, relative_key chains not checked")
+        return errors, warnings
+
+    relative_indices = shape_keys["relative_indices"]
+    valid_chains = resolve_relative_chains(relative_indices)
+    for index in np.flatnonzero(~valid_chains):
+        relative_name = names[relative_indices[index]] if relative_indices[index] >= 0 else None
+        errors.append(
+            f"'{names[index]}' relative_key chain (via '{relative_name}') "
+            f"doesn't reach '{names[0]}'"
+        )
+
+    # Vertex group masks: missing groups, or groups with zero weight on every moved vertex
+    with np.errstate(invalid="ignore", over="ignore"):
+        deltas = key_deltas(np.nan_to_num(coordinates), relative_indices)
+    moved = np.abs(deltas).max(axis=2) > 0
+    group_names = [group for group in shape_keys["vertex_groups"] if group]
+    weights = read_vertex_group_weights(obj, group_names)
+    for index, group in enumerate(shape_keys["vertex_groups"]):
+        if not group:
+            continue
+        if group not in weights:
+            errors.append(f"'{names[index]}' uses missing vertex group '{group}'")
+        elif moved[index].any() and not (weights[group][moved[index]] > 0).any():
+            errors.append(
+                f"'{names[index]}' vertex group '{group}' masks out all {moved[index].sum()} "
+                "moved vertices"
+            )
+
+    affected = count_affected_vertices(deltas)
+    affected[0] = 1  # reference key never moves
+    for index in np.flatnonzero(affected == 0):
+        warnings.append(f"'{names[index]}' doesn't move any vertex")
+
+    return errors, warnings
+
+
+def validate_shapekeys(head_name=None):
+    """
+    Run all checks on the head mesh (mapping targets) and every mesh with shape keys.
+
+    Returns:
+        int: Number of errors found.
+    """
+    head = find_head_mesh(head_name)
+    if head is None:
+        print(f"ERROR: head mesh '{head_name or '(any mesh with shape keys)'}' not found.")
+        return 1
+
+    error_count = 0
+    head_key_names = [key_block.name for key_block in head.data.shape_keys.key_blocks]
+    results = [(f"Mapping tables -> {head.name}", check_mapping_targets(head_key_names))]
+    for obj in bpy.data.objects:
+        if obj.type == "MESH" and obj.data.shape_keys:
+            results.append((obj.name, check_shape_keys(obj)))
+
+    for title, (errors, warnings) in results:
+        if not errors and not warnings:
+            continue
+        print(f"\n{title}:")
+        for message in errors:
+            print(f"- ERROR: {message}")
+        for message in warnings:
+            print(f"- warning: {message}")
+        error_count += len(errors)
+
+    print(f"\nShape key validation finished with {error_count} errors.")
+    return error_count
+
+
+if __name__ == "__main__":
+    # Blender passes script arguments after "--"
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    head_name = args[args.index("--head") + 1] if "--head" in args else None
+    if validate_shapekeys(head_name):
+        sys.exit(1)
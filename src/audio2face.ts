@@ -17,12 +17,14 @@ export interface Audio2FaceExportData {
   joints: string[];
   rotations: number[][][]; // A 3D array representing rotation quaternions for each joint in each frame
   translations: number[][][]; // A 3D array representing translation vectors for each joint in each frame
+  meshes?: ArkitIndexMap['meshes']; // morph target indices of clips retargeted by Blender/clip_cache.py
 }
 
 interface PrecomputedTarget {
   target: MorphTarget;
   name: string;
-  influences: Uint16Array;
+  influences: Uint16Array | Float32Array;
+  scale: number; // influence = influences[frameIndex] * scale
 }
 
 export function precomputeBlendShapes(
@@ -42,6 +44,7 @@ export function precomputeBlendShapes(
             target,
             name: target.name,
             influences: new Uint16Array(frameCount),
+            scale: 1 / 10000,
           });
         }
       }
@@ -67,13 +70,87 @@ export function precomputeBlendShapes(
   return targets;
 }
 
+// Sidecar written by Blender/reorder_arkit_shapekeys.py
+export interface ArkitIndexMap {
+  version: number;
+  facsNames: string[]; // ARKit names in A2F order
+  meshes: Record<
+    string,
+    {
+      objects: string[]; // Blender object (Babylon mesh) names using this mesh
+      targetIndices: number[]; // morph target index for each of facsNames, -1 if missing
+    }
+  >;
+}
+
+/**
+ * Same as precomputeBlendShapes, but binds A2F weights to morph targets by index
+ * (from the ARKit index map), so target names are only compared once per clip column.
+ * Columns whose facsNames entry isn't in indexMap.facsNames (e.g. viseme clips) are skipped.
+ * Influences are stored as floats, so negative weights and weights > 6.5535 don't wrap.
+ */
+export function precomputeBlendShapesByIndex(
+  avatarContainer: AssetContainer,
+  weightMat: Audio2FaceExportData['weightMat'],
+  facsNames: Audio2FaceExportData['facsNames'],
+  indexMap: ArkitIndexMap
+): PrecomputedTarget[] {
+  const targets: PrecomputedTarget[] = [];
+  const frameCount = weightMat.length;
+  const entries = Object.values(indexMap.meshes);
+
+  // Clip column -> pose index of the index map
+  const poseIndexByName = new Map(
+    indexMap.facsNames.map((name, index) => [name, index] as [string, number])
+  );
+  const columns: [number, number][] = [];
+  facsNames.forEach((name, column) => {
+    const poseIndex = poseIndexByName.get(name);
+    if (poseIndex !== undefined) columns.push([column, poseIndex]);
+  });
+
+  avatarContainer.meshes.forEach((mesh) => {
+    const manager = mesh.morphTargetManager;
+    // glTF primitives are loaded as "<node name>_primitive<N>" meshes
+    const entry = entries.find((e) =>
+      e.objects.some(
+        (name) => mesh.name === name || mesh.name.startsWith(`${name}_primitive`)
+      )
+    );
+    if (!manager || !entry) return;
+
+    columns.forEach(([column, poseIndex]) => {
+      const targetIndex = entry.targetIndices[poseIndex] ?? -1;
+      const target = targetIndex >= 0 ? manager.getTarget(targetIndex) : null;
+      if (!target) return;
+      const influences = new Float32Array(frameCount);
+      for (let frameIndex = 0; frameIndex < frameCount; frameIndex++) {
+        influences[frameIndex] = weightMat[frameIndex][column];
+      }
+      targets.push({ target, name: target.name, influences, scale: 1 });
+    });
+  });
+
+  return targets;
+}
+
+/**
+ * Index map of a clip retargeted to an avatar (Blender/clip_cache.py), for
+ * precomputeBlendShapesByIndex without loading arkit_index_map.json. Undefined for other clips.
+ */
+export function clipIndexMap(clip: Audio2FaceExportData): ArkitIndexMap | undefined {
+  return clip.meshes
+    ? { version: 1, facsNames: clip.facsNames, meshes: clip.meshes }
+    : undefined;
+}
+
 export function applyPrecomputedBlendShapes(
   precomputed: PrecomputedTarget[],
   frameIndex: number
 ): void {
   for (let i = 0; i < precomputed.length; i++) {
     const targetData = precomputed[i];
-    const newInfluence = targetData.influences[frameIndex] / 10000; // Convert back to float from fixed-point Uint16Array
+    const newInfluence = targetData.influences[frameIndex] * targetData.scale; // scale undoes the Uint16Array fixed-point
     if (Math.abs(targetData.target.influence - newInfluence) > 0.001) {
       targetData.target.influence = newInfluence;
     }
@@ -225,3 +302,205 @@ export const allMorphTargets = [
   'viseme_nn',
   'viseme_sil',
 ];
+
+// Dirty-target event stream written by Blender/clip_events.py (.a2fe):
+// per frame only the targets whose value changed more than the deadband.
+export interface BlendShapeEventStream {
+  names: string[];
+  fps: number;
+  frameCount: number;
+  keyframeInterval: number;
+  frameOffsets: Uint32Array; // first event of every frame (frameCount + 1 entries)
+  keyframes: Float32Array; // full state after every keyframeInterval-th frame
+  targets: Uint16Array;
+  values: Float32Array;
+}
+
+const halfToFloat = (half: number): number => {
+  const exponent = (half >> 10) & 0x1f;
+  const fraction = half & 0x3ff;
+  const sign = half & 0x8000 ? -1 : 1;
+  if (exponent === 0) return sign * 2 ** -14 * (fraction / 1024);
+  if (exponent === 0x1f) return fraction ? NaN : sign * Infinity;
+  return sign * 2 ** (exponent - 15) * (1 + fraction / 1024);
+};
+
+export function decodeBlendShapeEventStream(
+  buffer: ArrayBuffer
+): BlendShapeEventStream {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== 'A2FE' || view.getUint16(4, true) !== 1) {
+    throw new Error('Not a blend shape event stream (version 1)');
+  }
+  const targetCount = view.getUint16(6, true);
+  const fps = view.getFloat32(8, true);
+  const frameCount = view.getUint32(12, true);
+  const keyframeInterval = view.getUint32(16, true);
+  const eventCount = view.getUint32(20, true);
+  const namesLength = view.getUint32(24, true);
+  let offset = 28;
+  const names: string[] = JSON.parse(
+    new TextDecoder().decode(new Uint8Array(buffer, offset, namesLength))
+  );
+  offset += namesLength;
+
+  const frameOffsets = new Uint32Array(buffer, offset, frameCount + 1);
+  offset += frameOffsets.byteLength;
+  const readHalfs = (count: number): Float32Array => {
+    const halfs = new Uint16Array(buffer, offset, count);
+    offset += halfs.byteLength + ((4 - (halfs.byteLength % 4)) % 4);
+    return Float32Array.from(halfs, halfToFloat);
+  };
+  const keyframeCount = Math.ceil(frameCount / keyframeInterval);
+  const keyframes = readHalfs(keyframeCount * targetCount);
+  const targets = new Uint16Array(buffer, offset, eventCount);
+  offset += targets.byteLength + ((4 - (targets.byteLength % 4)) % 4);
+  const values = readHalfs(eventCount);
+
+  return {
+    names,
+    fps,
+    frameCount,
+    keyframeInterval,
+    frameOffsets,
+    keyframes,
+    targets,
+    values,
+  };
+}
+
+/**
+ * Morph targets driven by every stream target (all meshes with a target of that name),
+ * matched once at load time.
+ */
+export function bindEventStreamTargets(
+  avatarContainer: AssetContainer,
+  stream: BlendShapeEventStream
+): MorphTarget[][] {
+  return stream.names.map((name) =>
+    avatarContainer.morphTargetManagers.flatMap((manager) => {
+      const target = manager?.getTargetByName(name);
+      return target ? [target] : [];
+    })
+  );
+}
+
+// Apply only the events of one frame, work is proportional to the changing targets.
+export function applyBlendShapeEvents(
+  stream: BlendShapeEventStream,
+  boundTargets: MorphTarget[][],
+  frameIndex: number
+): void {
+  const end = stream.frameOffsets[frameIndex + 1];
+  for (let i = stream.frameOffsets[frameIndex]; i < end; i++) {
+    const targets = boundTargets[stream.targets[i]];
+    for (let j = 0; j < targets.length; j++) {
+      targets[j].influence = stream.values[i];
+    }
+  }
+}
+
+// Jump to any frame: restore the previous keyframe, then apply the events after it.
+export function seekBlendShapeEvents(
+  stream: BlendShapeEventStream,
+  boundTargets: MorphTarget[][],
+  frameIndex: number
+): void {
+  const keyframeIndex = Math.floor(frameIndex / stream.keyframeInterval);
+  const state = stream.keyframes.subarray(
+    keyframeIndex * stream.names.length,
+    (keyframeIndex + 1) * stream.names.length
+  );
+  boundTargets.forEach((targets, i) => {
+    targets.forEach((target) => (target.influence = state[i]));
+  });
+  for (
+    let frame = keyframeIndex * stream.keyframeInterval + 1;
+    frame <= frameIndex;
+    frame++
+  ) {
+    applyBlendShapeEvents(stream, boundTargets, frame);
+  }
+}
+
+/**
+ * Decodes a binary clip written by Blender/clip_encoder.py (.a2fc): every channel has its own
+ * offset, scale and bit depth (0, 8 or 16), value = offset + code * scale.
+ * Returns the same shape as the A2F JSON export, so it's a drop-in replacement.
+ */
+export function decodeBinaryClip(buffer: ArrayBuffer): Audio2FaceExportData {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== 'A2FC' || view.getUint16(4, true) !== 1) {
+    throw new Error('Not a binary A2F clip (version 1)');
+  }
+  const channelCount = view.getUint16(6, true);
+  const exportFps = view.getFloat32(8, true);
+  const numFrames = view.getUint32(12, true);
+  const metadataLength = view.getUint32(16, true);
+  let offset = 20;
+  const metadata: {
+    facsNames: string[];
+    joints: string[];
+    trackPath: string;
+    meshes?: ArkitIndexMap['meshes'];
+  } = JSON.parse(
+    new TextDecoder().decode(new Uint8Array(buffer, offset, metadataLength))
+  );
+  offset += metadataLength;
+
+  const channels: Float32Array[] = [];
+  let dataOffset = offset + channelCount * 12;
+  for (let c = 0; c < channelCount; c++) {
+    const channelOffset = view.getFloat32(offset + c * 12, true);
+    const scale = view.getFloat32(offset + c * 12 + 4, true);
+    const bits = view.getUint8(offset + c * 12 + 8);
+    const values = new Float32Array(numFrames);
+    if (bits === 0) {
+      values.fill(channelOffset);
+    } else {
+      const codes =
+        bits === 8
+          ? new Uint8Array(buffer, dataOffset, numFrames)
+          : new Uint16Array(buffer, dataOffset, numFrames);
+      for (let f = 0; f < numFrames; f++) {
+        values[f] = channelOffset + codes[f] * scale;
+      }
+      dataOffset += codes.byteLength + ((4 - (codes.byteLength % 4)) % 4);
+    }
+    channels.push(values);
+  }
+
+  const numPoses = metadata.facsNames.length;
+  const jointCount = metadata.joints.length;
+  const frameValues = (first: number, count: number, f: number) =>
+    Array.from({ length: count }, (_, i) => channels[first + i][f]);
+  const weightMat: number[][] = [];
+  const rotations: number[][][] = [];
+  const translations: number[][][] = [];
+  for (let f = 0; f < numFrames; f++) {
+    weightMat.push(frameValues(0, numPoses, f));
+    rotations.push(
+      metadata.joints.map((_, j) => frameValues(numPoses + j * 4, 4, f))
+    );
+    translations.push(
+      metadata.joints.map((_, j) =>
+        frameValues(numPoses + jointCount * 4 + j * 3, 3, f)
+      )
+    );
+  }
+
+  return {
+    exportFps,
+    trackPath: metadata.trackPath,
+    numPoses,
+    numFrames,
+    facsNames: metadata.facsNames,
+    weightMat,
+    joints: metadata.joints,
+    rotations,
+    translations,
+    meshes: metadata.meshes,
+  };
+}